@@ -0,0 +1,64 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""Benchmark conversions between all pairs of twoport classes.
+
+Prints one matrix with the time of each conversion (rows are source and
+columns target classes) and one with the time of the generic
+permutation matrix conversion in :func:`convert` for the same pair. Run
+as::
+
+    python benchmarks/bench_conversions.py [nbias] [nfreq]
+"""
+from __future__ import print_function
+import sys
+import timeit
+
+import numpy as np
+
+from hftools.dataset import hfarray
+import hftools.networks.multiports as mp
+
+classes = [mp.SArray, mp.ZArray, mp.YArray, mp.GArray, mp.HArray,
+           mp.ABCDArray, mp.TArray, mp.TpArray]
+
+
+def best_time(func, number=5, repeat=3):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def print_matrix(title, times):
+    print(title)
+    print("%6s" % "" + "".join("%8s" % cls.shortname for cls in classes))
+    for source, row in zip(classes, times):
+        print("%6s" % source.shortname + "".join("%8.2f" % (t * 1e3)
+                                                for t in row))
+
+
+def main(nbias=100, nfreq=1001):
+    shape = (nbias, nfreq, 2, 2)
+    data = 0.1 * (np.random.randn(*shape) + 1j * np.random.randn(*shape))
+    data = data + np.identity(2)
+    engine = []
+    generic = []
+    for source in classes:
+        x = source(data)
+        engine.append([best_time(lambda: target(x)) for target in classes])
+        row = []
+        for target in classes:
+            P = target(x).P
+            view = x.view(type=hfarray)
+            row.append(best_time(lambda: mp.convert(x.P, P, view)))
+        generic.append(row)
+    print("%d bias x %d freq twoports, times in ms" % (nbias, nfreq))
+    print_matrix("conversion engine", engine)
+    print_matrix("generic convert", generic)
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,77 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""Benchmark hdf5 v0.2 storage layouts.
+
+Measures write throughput, file size and the latency of reading a single
+frequency sweep with a lazy read. Run as::
+
+    python benchmarks/bench_hdf5.py [nbias] [nfreq]
+"""
+from __future__ import print_function
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+from hftools.dataset import DataBlock, hfarray, DimSweep, DimMatrix_i,\
+    DimMatrix_j
+from hftools.file_formats.hdf5 import v_02
+
+layouts = [("contiguous", dict()),
+           ("chunks=auto", dict(chunks="auto")),
+           ("gzip", dict(compression="gzip")),
+           ("gzip+shuffle", dict(compression="gzip", shuffle=True)),
+           ("lzf+shuffle", dict(compression="lzf", shuffle=True)),
+           ]
+if v_02.hdf5plugin is not None:  # pragma: no cover
+    layouts.append(("lz4+shuffle", dict(compression="lz4", shuffle=True)))
+
+
+def make_datablock(nbias=200, nfreq=801):
+    db = DataBlock()
+    dims = (DimSweep("Vgs", nbias), DimSweep("freq", nfreq),
+            DimMatrix_i("i", 2), DimMatrix_j("j", 2))
+    # smooth data with some noise, compresses like measured data
+    f = np.linspace(0, 1, nfreq)[:, None, None]
+    S = np.exp(-2j * np.pi * f * np.arange(1, 5).reshape(2, 2))
+    S = S * np.linspace(0.5, 1, nbias)[:, None, None, None]
+    S = S + 1e-4 * np.random.randn(*S.shape)
+    db.S = hfarray(np.round(S, 6), dims=dims)
+    return db
+
+
+def main(nbias=200, nfreq=801, repeat=3):
+    db = make_datablock(nbias, nfreq)
+    nbytes = db.S.nbytes
+    tmpdir = tempfile.mkdtemp()
+    print("S: %d bias x %d freq, %.1f MB" % (nbias, nfreq, nbytes / 1e6))
+    print("%-14s %10s %10s %12s" % ("layout", "MB/s", "size MB",
+                                    "slice ms"))
+    try:
+        for name, kw in layouts:
+            fname = os.path.join(tmpdir, "bench.hdf5")
+            write = timeit.Timer(lambda: v_02.save_hdf5(db, fname, **kw))
+            best = min(write.repeat(repeat=repeat, number=1))
+            size = os.path.getsize(fname)
+            lazy = v_02.read_hdf5(fname, lazy=True)
+            read = timeit.Timer(lambda: lazy.S[nbias // 2])
+            latency = min(read.repeat(repeat=repeat, number=10)) / 10
+            print("%-14s %10.1f %10.2f %12.3f" % (name, nbytes / best / 1e6,
+                                                  size / 1e6,
+                                                  latency * 1e3))
+            lazy.vardata["S"].file.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
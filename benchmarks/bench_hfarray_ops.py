@@ -0,0 +1,66 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""Microbenchmark of hfarray binary operators.
+
+For each operator the time of the hfarray operation is compared with the
+same operation on plain ndarrays, both when the operands have identical
+dims (fast path) and when the dims have to be broadcast. Run as::
+
+    python benchmarks/bench_hfarray_ops.py [nfreq]
+"""
+from __future__ import print_function
+import operator
+import sys
+import timeit
+
+import numpy as np
+
+from hftools.dataset import hfarray, DimSweep, DimRep, DimMatrix_i,\
+    DimMatrix_j
+
+operators = [("+", operator.add),
+             ("-", operator.sub),
+             ("*", operator.mul),
+             ("/", operator.truediv),
+             ("**", operator.pow),
+             ("==", operator.eq),
+             ("&", operator.and_),
+             ("|", operator.or_),
+             ("^", operator.xor),
+             ]
+
+
+def best_time(func, number=2000, repeat=3):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main(nfreq=11):
+    fi = DimSweep("freq", nfreq)
+    dims = (fi, DimMatrix_i("i", 2), DimMatrix_j("j", 2))
+    data = np.arange(1, 4 * nfreq + 1).reshape(nfreq, 2, 2)
+    a = hfarray(data, dims=dims)
+    b = hfarray(data[::-1].copy(), dims=dims)
+    c = hfarray(np.arange(1, 4), dims=(DimRep("bias", 3),))
+    na, nb = np.array(a), np.array(b)
+    nc = np.array(c)[:, None, None, None]
+    print("freq=%d, times in us, overhead = hfarray / ndarray" % nfreq)
+    print("%-4s %10s %10s %8s %12s %8s" % ("op", "ndarray", "same dims",
+                                          "overh.", "broadcast", "overh."))
+    for name, op in operators:
+        t_np = best_time(lambda: op(na, nb))
+        t_same = best_time(lambda: op(a, b))
+        t_np_bc = best_time(lambda: op(na, nc))
+        t_bc = best_time(lambda: op(a, c))
+        print("%-4s %10.2f %10.2f %8.1f %12.2f %8.1f" %
+              (name, t_np * 1e6, t_same * 1e6, t_same / t_np,
+               t_bc * 1e6, t_bc / t_np_bc))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
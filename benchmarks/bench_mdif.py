@@ -0,0 +1,66 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""Benchmark reading of large MDIF files.
+
+Generates MDIF files with complex S-parameter columns and a two line
+record layout and reports the read time per row for growing block sizes.
+The time per row should stay roughly constant. Run as::
+
+    python benchmarks/bench_mdif.py [nblocks] [maxrows]
+"""
+from __future__ import print_function
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+from hftools.file_formats import read_mdif
+
+
+def make_mdif(filename, nblocks=4, nrows=50000):
+    sparams = ["S[%d,%d](complex)" % (i, j) for i in (1, 2) for j in (1, 2)]
+    freq = np.linspace(1e9, 10e9, nrows)
+    with open(filename, "w") as fil:
+        for block in range(nblocks):
+            fil.write("VAR Pin(real) = %d\n" % block)
+            fil.write("BEGIN LP\n")
+            fil.write("% freq(real) Gamma(complex) Pout(real)\n")
+            fil.write("% " + " ".join(sparams) + "\n")
+            data = np.random.randn(nrows, 11)
+            for f, row in zip(freq, data):
+                fil.write("%.9e %s\n" % (f, " ".join(["%.6e" % x
+                                                      for x in row[:3]])))
+                fil.write(" ".join(["%.6e" % x for x in row[3:]]) + "\n")
+            fil.write("END\n")
+
+
+def main(nblocks=4, maxrows=50000, repeat=3):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmpdir, "bench.mdif")
+        print("%d blocks, records of two lines" % nblocks)
+        print("%8s %10s %12s" % ("rows", "time s", "us/row"))
+        nrows = maxrows // 8
+        while nrows <= maxrows:
+            make_mdif(filename, nblocks, nrows)
+            timer = timeit.Timer(lambda: read_mdif(filename, verbose=False,
+                                                   multiple_files=False))
+            best = min(timer.repeat(repeat=repeat, number=1))
+            print("%8d %10.3f %12.2f" % (nrows, best,
+                                         best / nrows / nblocks * 1e6))
+            nrows *= 2
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,51 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""Benchmark construction overhead of the multiport classes.
+
+Reports the time to construct an SArray from an ndarray, to slice it,
+to access an element by name and, for twoports, to convert it to a
+ZArray for growing number of ports. Construction and slicing should not
+depend on the number of ports. Run as::
+
+    python benchmarks/bench_multiports.py [nfreq]
+"""
+from __future__ import print_function
+import sys
+import timeit
+
+import numpy as np
+
+from hftools.networks.multiports import SArray, ZArray
+
+
+def best_time(func, number=200, repeat=3):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main(nfreq=101):
+    print("freq=%d, times in us" % nfreq)
+    print("%6s %10s %10s %10s %10s" % ("ports", "create", "slice",
+                                       "s11", "to Z"))
+    for nports in (2, 4, 8, 16):
+        data = 0.1 * np.random.randn(nfreq, nports, nports)
+        S = SArray(data)
+        t_create = best_time(lambda: SArray(data))
+        t_slice = best_time(lambda: S[:nfreq // 2])
+        t_attr = best_time(lambda: S.s11)
+        if nports == 2:
+            t_conv = "%10.1f" % (best_time(lambda: ZArray(S), number=20) * 1e6)
+        else:
+            t_conv = "%10s" % "-"
+        print("%6d %10.1f %10.1f %10.1f %s" % (nports, t_create * 1e6,
+                                               t_slice * 1e6, t_attr * 1e6,
+                                               t_conv))
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:2]])
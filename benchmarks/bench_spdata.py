@@ -0,0 +1,59 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""Benchmark reading of sp-data files.
+
+Compares typed column conversion with converting every value using
+to_numeric. Run as::
+
+    python benchmarks/bench_spdata.py [nblocks] [nrows]
+"""
+from __future__ import print_function
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+from hftools.file_formats import read_spdata
+
+
+def make_spdata(filename, nblocks=20, nrows=2000):
+    header = ["freq"] + ["%s(S%d%d)" % (part, i, j)
+                         for i in (1, 2) for j in (1, 2)
+                         for part in ("Re", "Im")]
+    freq = np.linspace(1e9, 10e9, nrows)
+    with open(filename, "w") as fil:
+        for block in range(nblocks):
+            fil.write("!@Vgs=%d\n" % block)
+            fil.write("\t".join(header) + "\n")
+            data = np.random.randn(nrows, len(header) - 1)
+            for f, row in zip(freq, data):
+                fil.write("%.9e\t" % f)
+                fil.write("\t".join(["%.6e" % x for x in row]) + "\n")
+
+
+def main(nblocks=20, nrows=2000, repeat=3):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmpdir, "bench.txt")
+        make_spdata(filename, nblocks, nrows)
+        print("%d blocks of %d rows" % (nblocks, nrows))
+        for typed in (False, True):
+            timer = timeit.Timer(lambda: read_spdata(filename,
+                                                     typed_columns=typed))
+            best = min(timer.repeat(repeat=repeat, number=1))
+            print("typed_columns=%-5s %8.3f s" % (typed, best))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == "__main__":
+    main(*[int(x) for x in sys.argv[1:3]])
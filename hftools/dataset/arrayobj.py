@@ -21,7 +21,8 @@ from numpy import ndarray, array, linspace, arange, newaxis,\
 import numpy.lib.stride_tricks as np_stride_tricks
 
 from hftools.dataset.dim import DimSweep, DimRep, DimMatrix_i, DimMatrix_j,\
-    _DiagAxis, dims_has_complex, DimBase, DimAnonymous, DiagAxis, CPLX
+    _DiagAxis, dims_has_complex, DimBase, DimAnonymous, DiagAxis, CPLX,\
+    ComplexDiagAxis, ComplexIndepAxis, ComplexDerivAxis
 from hftools.utils import is_numlike, is_integer, warn, deprecate, isnumber
 from hftools.core import HFArrayShapeDimsMismatchError, HFArrayError,\
     DimensionMismatchError
@@ -338,6 +339,35 @@ def ismatrix(a):
     return False
 
 
+_complex_dims = (ComplexDiagAxis, ComplexIndepAxis, ComplexDerivAxis)
+
+
+def dims_match_exactly(A, B):
+    u"""Return True if *A* and *B* have the same type and dims that
+    make_same_dims would leave unchanged, i.e. dims with pairwise the same
+    name and class, sorted in union order and without complex dims.
+    """
+    if type(A) is not type(B):
+        return False
+    adims = A._dims
+    bdims = B._dims
+    if adims is not bdims:
+        if len(adims) != len(bdims):
+            return False
+        for x, y in zip(adims, bdims):
+            if x is not y and (x.__class__ is not y.__class__ or
+                               x.name != y.name):
+                return False
+    prio = None
+    for dim in adims:
+        if prio is not None and dim.sortprio < prio:
+            return False
+        if isinstance(dim, _complex_dims):
+            return False
+        prio = dim.sortprio
+    return True
+
+
 def check_instance(func):
     def a(self, other):
         try:
@@ -347,6 +377,8 @@ def check_instance(func):
             pass
         if isnumber(other):
             a, b = self, other
+        elif dims_match_exactly(self, other):
+            a, b = self, other
         else:
             a, b = make_same_dims(self, self.__class__(other))
         return func(a, b)
@@ -458,6 +490,15 @@ class _hfarray(ndarray):
         self.__dict__["outputformat"] = getattr(obj, "outputformat", "%.16e")
         self.__dict__["unit"] = getattr(obj, "unit", None)
 
+    def __reduce__(self):
+        reconstruct, args, state = ndarray.__reduce__(self)
+        return reconstruct, args, (state, self.__dict__.copy())
+
+    def __setstate__(self, state):
+        ndstate, attributes = state
+        ndarray.__setstate__(self, ndstate)
+        self.__dict__.update(attributes)
+
     def verify_dimension(self):
         u"""Internal function that checks to see if the arrays dimensions match
            those of the *dims* specification.
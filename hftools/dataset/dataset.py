@@ -19,6 +19,7 @@ TODO:
 """
 import itertools
 import re
+from collections import OrderedDict
 
 import numpy as np
 import numpy.random as rnd
@@ -28,8 +29,9 @@ from hftools.dataset.arrayobj import hfarray, ismatrix,\
     remove_rep, _hfarray
 from hftools.dataset.dim import DimBase, DimSweep, DimRep,\
     DimMatrix_i, DimMatrix_j, DiagAxis
-from hftools.utils import warn, stable_uniq
+from hftools.utils import warn, hypercube_index
 from hftools.dataset.helper import guess_unit_from_varname
+from hftools.dataset.interpolation import get_interpolator
 from hftools.py3compat import cast_unicode, cast_str, string_types
 
 
@@ -81,10 +83,182 @@ def convert_matrices_to_elements(db, formatelement=None):
     return out
 
 
+class DataDictView(object):
+    """Read only view of the keys, values or items of a DataDict in
+    order. Supports len, iteration, membership, indexing and comparison
+    with lists.
+    """
+    def __init__(self, datadict, kind):
+        self._datadict = datadict
+        self._kind = kind
+
+    def _keys(self):
+        return self._datadict._keys()
+
+    def _item(self, key):
+        if self._kind == "keys":
+            return key
+        value = dict.__getitem__(self._datadict, key)
+        if self._kind == "values":
+            return value
+        return key, value
+
+    def _list(self):
+        keys = list(self._keys())
+        if self._kind == "keys":
+            return keys
+        return [self._item(k) for k in keys]
+
+    def __len__(self):
+        return len(self._keys())
+
+    def __iter__(self):
+        for key in self._keys():
+            if key in self._datadict:
+                yield self._item(key)
+
+    def __contains__(self, item):
+        if self._kind == "keys":
+            return item in self._datadict
+        elif self._kind == "items":
+            try:
+                key, value = item
+            except (TypeError, ValueError):
+                return False
+            if key not in self._datadict:
+                return False
+            return self._item(key) == (key, value)
+        return any(x is item or x == item for x in self)
+
+    def __getitem__(self, index):
+        keys = self._keys()
+        if isinstance(index, slice):
+            return [self._item(k) for k in keys[index]]
+        return self._item(keys[index])
+
+    def __eq__(self, other):
+        return self._list() == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return list(self._list()) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self._list())
+
+    def __repr__(self):
+        return repr(self._list())
+
+
+class DataDictOrder(DataDictView):
+    """Keys of a DataDict that have an explicit order, see DataDict.order.
+
+    Keys can be moved with insert, deleting a key from the order moves it
+    to the keys without explicit order.
+    """
+    def __init__(self, datadict):
+        DataDictView.__init__(self, datadict, "keys")
+
+    def _keys(self):
+        return self._datadict._keys()[:self._datadict._nordered]
+
+    def __contains__(self, key):
+        return self._datadict._is_ordered(key)
+
+    def index(self, key):
+        return self._keys().index(key)
+
+    def insert(self, index, key):
+        self._datadict._insert_key(index, key)
+
+    def append(self, key):
+        self._datadict._insert_key(len(self), key)
+
+    def __delitem__(self, index):
+        self._datadict._unorder_key(self._keys()[index])
+
+
 class DataDict(dict):
+    """Dictionary that keeps the order of its keys.
+
+    Keys set by item or attribute assignment, or setdefault, get an
+    explicit order, the *order* attribute. The other keys, from the
+    constructor or update, follow in the order they were added. Every key
+    maps to a sequence number, (0, n) for ordered keys and (1, n) for the
+    rest, so adding, deleting and renaming keys do not touch the other
+    keys. The sorted key list is cached and rebuilt on the first iteration
+    after a change. keys, values and items return DataDictView objects.
+    Assigning a list of keys to *order* makes that the explicit order.
+    """
+    _internal = ("_seq", "_counter", "_nordered", "_keycache")
+
     def __init__(self, *k, **kw):
-        dict.__init__(self, *k, **kw)
-        self.__dict__["order"] = []
+        dict.__init__(self)
+        self.__dict__["_seq"] = {}
+        self.__dict__["_counter"] = 0
+        self.__dict__["_nordered"] = 0
+        self.__dict__["_keycache"] = []
+        self.update(*k, **kw)
+
+    def _keys(self):
+        """Keys in order, the list is replaced, never changed, on updates"""
+        if self._keycache is None:
+            self.__dict__["_keycache"] = sorted(self._seq,
+                                                key=self._seq.__getitem__)
+        return self._keycache
+
+    def _is_ordered(self, key):
+        return self._seq.get(key, (1,))[0] == 0
+
+    def _set_seq(self, key, group):
+        """Place *key* last among the ordered (0) or unordered (1) keys"""
+        counter = self._counter
+        self._seq[key] = (group, counter)
+        self.__dict__["_counter"] = counter + 1
+        self.__dict__["_keycache"] = None
+
+    def _insert_key(self, index, key):
+        """Move *key* to position *index* of the explicit order"""
+        if key not in self:
+            raise KeyError(key)
+        if not self._is_ordered(key) and index >= self._nordered:
+            self._set_seq(key, 0)
+            self.__dict__["_nordered"] += 1
+            return
+        keys = [k for k in self.order if k != key]
+        keys.insert(index, key)
+        for idx, name in enumerate(keys):
+            self._seq[name] = (0, idx - len(keys))
+        self.__dict__["_nordered"] = len(keys)
+        self.__dict__["_keycache"] = None
+
+    def _unorder_key(self, key):
+        """Drop *key* from the explicit order"""
+        self.order = [k for k in self.order if k != key]
+
+    @property
+    def order(self):
+        return DataDictOrder(self)
+
+    @order.setter
+    def order(self, names):
+        seq = {}
+        keys = []
+        for name in list(names):
+            if name in self and name not in seq:
+                seq[name] = (0, len(keys))
+                keys.append(name)
+        rest = [k for k in dict.keys(self) if k not in seq]
+        for name in rest:
+            seq[name] = (1, len(seq))
+        self.__dict__["_seq"] = seq
+        self.__dict__["_counter"] = len(seq)
+        self.__dict__["_nordered"] = len(keys)
+        self.__dict__["_keycache"] = keys + rest
 
     @property
     def outputformat(self):
@@ -110,8 +284,9 @@ class DataDict(dict):
     def __delitem__(self, key):
         if key in self:
             dict.__delitem__(self, key)
-        if key in self.order:
-            del self.order[self.order.index(key)]
+            if self._seq.pop(key)[0] == 0:
+                self.__dict__["_nordered"] -= 1
+            self.__dict__["_keycache"] = None
 
     def __setattr__(self, key, value):
         try:
@@ -123,22 +298,78 @@ class DataDict(dict):
         self.__setitem__(key, value)
 
     def __setitem__(self, key, value):
+        if not self._is_ordered(key):
+            self._set_seq(key, 0)
+            self.__dict__["_nordered"] += 1
         dict.__setitem__(self, key, value)
-        if key not in self.order:
-            self.order.append(key)
 
     def setdefault(self, key, value):
-        a = dict.setdefault(self, key, value)
-        if key not in self.order:
-            self.order.append(key)
-        return a
+        if key not in self:
+            self[key] = value
+        elif not self._is_ordered(key):
+            self._insert_key(self._nordered, key)
+        return dict.__getitem__(self, key)
+
+    def update(self, *k, **kw):
+        if len(k) > 1:
+            raise TypeError("update expected at most 1 arguments, got %d" %
+                            len(k))
+        items = []
+        if k:
+            other = k[0]
+            if hasattr(other, "keys"):
+                items = [(key, other[key]) for key in other.keys()]
+            else:
+                items = other
+        for key, value in itertools.chain(items, kw.items()):
+            if key not in self:
+                self._set_seq(key, 1)
+            dict.__setitem__(self, key, value)
+
+    def pop(self, key, *default):
+        if key not in self:
+            return dict.pop(self, key, *default)
+        value = dict.__getitem__(self, key)
+        self.__delitem__(key)
+        return value
+
+    def popitem(self):
+        if not self:
+            raise KeyError("popitem(): dictionary is empty")
+        key = self._keys()[-1]
+        value = dict.__getitem__(self, key)
+        self.__delitem__(key)
+        return key, value
+
+    def clear(self):
+        dict.clear(self)
+        self.order = []
+
+    def __reduce__(self):
+        state = dict((k, v) for k, v in self.__dict__.items()
+                     if k not in self._internal)
+        state["order"] = self.order[:]
+        return (self.__class__, (list(self.items()),), state)
+
+    def __setstate__(self, state):
+        state = dict(state)
+        order = state.pop("order", None)
+        self.__dict__.update(state)
+        if order is not None:
+            self.order = order
 
     def rename(self, oldname, newname):
         vdata = self[oldname]
-        if newname not in self.order:
-            self.order[self.order.index(oldname)] = newname
-        del self[oldname]
-        self[newname] = vdata
+        if oldname == newname:
+            return
+        if self._is_ordered(oldname) and not self._is_ordered(newname):
+            self._seq[newname] = self._seq.pop(oldname)
+            self.__dict__["_keycache"] = None
+            dict.__delitem__(self, oldname)
+            dict.__setitem__(self, newname, vdata)
+        else:
+            del self[oldname]
+            self[newname] = vdata
 
     def view(self):
         out = self.__class__([(k, v.view()) for k, v in self.items()])
@@ -151,28 +382,24 @@ class DataDict(dict):
         return out
 
     def keys(self):
-        return [v for v in self]
+        return DataDictView(self, "keys")
 
     def iteritems(self):
         for v in self:
             yield v, self[v]
 
     def values(self):
-        return [self[v] for v in self]
+        return DataDictView(self, "values")
 
     def items(self):
-        return [(v, self[v]) for v in self]
+        return DataDictView(self, "items")
 
     def __iter__(self):
-        out = self.order[:]
-        for k in dict.keys(self):
-            if k not in out:
-                out.append(k)
-        for k in out:
-            yield k
+        return iter(self._keys())
 
     def __dir__(self):  # pragma: no cover
-        return self.order + dir(type(self)) + list(self.__dict__.keys())
+        return (list(self._keys()) + dir(type(self)) +
+                list(self.__dict__.keys()))
 
 reg_matrix_name = re.compile("([_A-Za-z]([_A-Za-z0-9]*"
                              "[_A-Za-z])?)([0-9][0-9])")
@@ -193,6 +420,23 @@ def change_dim(ds, olddimclass=DimSweep, newdimclass=DiagAxis):
     return ds
 
 
+def filter_index(mask):
+    """Return index selecting the True elements of boolean *mask*. Evenly
+    spaced selections give a slice, otherwise an integer array.
+    """
+    idx = np.flatnonzero(mask)
+    if len(idx) == 0:
+        return slice(0, 0)
+    start, stop = int(idx[0]), int(idx[-1]) + 1
+    if stop - start == len(idx):
+        return slice(start, stop)
+    step = int(idx[1] - idx[0])
+    if stop - 1 - start == step * (len(idx) - 1) and\
+       (np.diff(idx) == step).all():
+        return slice(start, stop, step)
+    return idx
+
+
 class DataBlock(object):
     def __init__(self):
         self.__dict__["_blockname"] = None
@@ -208,6 +452,12 @@ class DataBlock(object):
         self.__dict__["_outputformat"] = "%.16e"
         self.__dict__["_xname"] = None
 
+    def __getstate__(self):
+        return self.__dict__.copy()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
     def keep_variables(self, vars):
         db = DataBlock()
         db.blockname = self.blockname
@@ -403,52 +653,67 @@ class DataBlock(object):
         out.xname = self.xname
         return out
 
-    def filter(self, boolarray):
-        if boolarray.squeeze().ndim > 1:
-            raise ValueError("filter can only use array with one dimension")
-        if boolarray.dtype != np.dtype(bool):
-            if boolarray.dims[0].name not in self.ivardata:
-                out = self.copy()
-                msg = "Filter warning: DataBlock does not contain dimension %r"
-                msg = msg % boolarray.dims[0]
-                warn(msg)
-                return out
-            localdim = self.ivardata[boolarray.dims[0].name]
-            intersection = set(localdim.data).intersection(boolarray)
-            barray = boolarray.astype(bool)
-            barray[...] = False
-            for f in intersection:
-                barray[boolarray == f] = True
-            boolarray = barray
+    def filter(self, *filters):
+        """Return DataBlock with the elements along the dims of *filters*
+        selected.
+
+        Each filter is a one dimensional hfarray. A boolean filter selects
+        the elements where it is True. Any other filter selects the
+        elements of the dim with the same name whose values are found in
+        the filter. All filters are applied in one pass over the variables
+        and evenly spaced selections are made with slices, giving views of
+        the data. Several filters on the same dim are combined with and.
+        """
+        masks = OrderedDict()
+        for boolarray in filters:
+            if boolarray.squeeze().ndim > 1:
+                msg = "filter can only use array with one dimension"
+                raise ValueError(msg)
+            if boolarray.dtype != np.dtype(bool):
+                if boolarray.dims[0].name not in self.ivardata:
+                    msg = ("Filter warning: DataBlock does not contain "
+                           "dimension %r" % boolarray.dims[0])
+                    warn(msg)
+                    continue
+                olddim = self.ivardata[boolarray.dims[0].name]
+                mask = np.in1d(olddim.data, np.asarray(boolarray))
+            else:
+                olddim = boolarray.dims[0]
+                mask = np.asarray(boolarray).ravel()
+            if olddim.name in masks:
+                olddim, oldmask = masks[olddim.name]
+                mask = oldmask & mask
+            masks[olddim.name] = (olddim, mask)
+        selection = []
+        for name, (olddim, mask) in masks.items():
+            index = filter_index(mask)
+            newdim = olddim.__class__(olddim, data=olddim.data[index])
+            selection.append((name, newdim, index))
+        if not selection:
+            return self.copy()
+        # slices first, they only make views
+        selection.sort(key=lambda x: not isinstance(x[2], slice))
 
         out = DataBlock()
         out.blockname = self.blockname
         out.comments = self.comments
         out.xname = self.xname
 
-        olddim = boolarray.dims[0]
-        newdim = olddim.__class__(olddim, data=olddim.data[boolarray])
-
-        for v in self.vardata.keys():
-            data = self.vardata[v].view()
-            try:
-                i = data.dims_index(boolarray.dims[0])
-            except IndexError:  # This variable does not sweep in boolarray dim
-                out[v] = data
-                continue
-            newinfo = list(data.dims)
-            reorder = list(range(data.ndim))
-            del newinfo[i]
-            del reorder[i]
-            reorder = tuple([i] + reorder)
-            newinfo = tuple([newdim] + newinfo)
-            data = data.transpose(*reorder)
-            utdata = hfarray(array(data)[boolarray], dims=newinfo,
-                             unit=data.unit,
-                             outputformat=data.outputformat)
-            dimorder = [x.name for x in self.vardata[v].dims]
-            utdata = utdata.reorder_dimensions(*dimorder)
-            out[v] = utdata
+        for v, data in self.vardata.items():
+            dims = list(data.dims)
+            utdata = np.asarray(data)
+            for name, newdim, index in selection:
+                try:
+                    i = data.dims_index(name)
+                except IndexError:  # Variable does not sweep in this dim
+                    continue
+                if isinstance(index, slice):
+                    utdata = utdata[(slice(None),) * i + (index,)]
+                else:
+                    utdata = utdata.take(index, axis=i)
+                dims[i] = newdim
+            out[v] = hfarray(utdata, dims=tuple(dims), unit=data.unit,
+                             outputformat=data.outputformat, copy=False)
         out.xname = self.xname
         return out
 
@@ -660,28 +925,35 @@ class DataBlock(object):
         return out
 
     def hyper(self, dimnames, replacedim, indexed=False, all=True):
+        """Reshape variables along *replacedim* into a hypercube with one
+        DimSweep for each variable in *dimnames*, holding its sorted unique
+        values. Raises HFToolsHyperCubeError if the values do not form a
+        complete grid. Data already in grid order is reshaped without
+        copying.
+        """
         if isinstance(replacedim, string_types):
             replacedim = self.ivardata[replacedim]
         out = DataBlock()
         out.blockname = self.blockname
+        axes, cells = hypercube_index([np.asarray(self[x]) for x in dimnames],
+                                      list(dimnames))
         dims = []
-        sortdata = []
-        for x in dimnames:
+        for x, axis in zip(dimnames, axes):
             if indexed:
                 newname = "%s_index" % x
             else:
                 newname = x
-            dims.append(DimSweep(newname, stable_uniq(self[x]),
+            dims.append(DimSweep(newname, axis,
                                  unit=self[x].unit,
                                  outputformat=self[x].outputformat))
-            sortdata.append(self[x])
         dims = tuple(dims)
         dims_shape = tuple(len(x.data) for x in dims)
 
-        sortdata.append(range(len(sortdata[0])))
-
-        sortorder = sorted(zip(*sortdata))
-        sortorderidx = [x[-1] for x in sortorder]
+        if (cells[1:] > cells[:-1]).all():
+            sortorderidx = None
+        else:
+            sortorderidx = np.empty_like(cells)
+            sortorderidx[cells] = np.arange(len(cells))
 
         for dim in dims:
             out.ivardata[dim.name] = dim
@@ -696,7 +968,9 @@ class DataBlock(object):
             if k in out.ivardata:
                 continue
             i = v.dims_index(replacedim)
-            v = hfarray(v.take(sortorderidx, axis=i), copy=False, order="C")
+            if sortorderidx is not None:
+                v = v.take(sortorderidx, axis=i)
+            v = hfarray(v, copy=False, order="C")
             new_shape = v.shape[:i] + dims_shape + v.shape[i + 1:]
             v.shape = new_shape
             v.dims = v.dims[:i] + dims + v.dims[i + 1:]
@@ -725,6 +999,12 @@ class DataBlock(object):
 
 
 def interpolate(newx, y, defaultmode=None):
+    """Interpolate *y* to the dim *newx* (or a one dimensional hfarray).
+
+    The mode is taken from y.interpolationmode if present, otherwise
+    *defaultmode*, see :mod:`hftools.dataset.interpolation`. If *y* does
+    not have a dim matching *newx* it is returned unchanged.
+    """
     mode = getattr(y, "interpolationmode", defaultmode)
     if isinstance(newx, (_hfarray,)):
         if len(newx.dims) != 1:
@@ -737,30 +1017,12 @@ def interpolate(newx, y, defaultmode=None):
     olddims = y.dims
     dimidx = olddims.matching_index(newx)
     newdims = olddims[:dimidx] + (newx,) + olddims[dimidx + 1:]
-    if mode in [None, "none"]:
-        bools = np.array(newx.data)[:, None] == np.array(oldx.data)[None, :]
-        boolarray = hfarray(bools.any(axis=0),
-                            dims=(oldx,),
-                            unit=y.unit,
-                            outputformat=y.outputformat)
-        if boolarray.sum() != len(newx.data):
-            raise ValueError("Missing x-values")
-        data = np.array(y, copy=False)[boolarray]
-    elif mode in ["linear"]:
-        data = interp1d(y.dims[dimidx].data, y, axis=dimidx)(newx.data)
-    else:
-        raise ValueError("Interpolation mode %r unknown" % mode)
+    interpolator = get_interpolator(oldx.data, newx.data, mode)
+    data = interpolator(y, axis=dimidx)
     return hfarray(data, dims=newdims, unit=y.unit,
                    outputformat=y.outputformat)
 
 
-try:
-    from scipy.interpolate import interp1d
-except ImportError:  # pragma: no cover
-    def interp1d(*k, **kw):
-        raise ImportError("Need scipy to do linear interpolation")
-
-
 if __name__ == '__main__':
 
     """
@@ -44,6 +44,40 @@ def flatten(sequence):
             yield item
 
 
+_fast_kinds = {"b": np.bool_, "i": np.int64, "u": np.int64,
+               "f": np.float64, "c": np.complex128}
+
+
+def dim_data_array(dim_data):
+    """Return read-only array with the data for a dim.
+
+    Numeric arrays are converted to bool, int64, float64 or complex128
+    directly. Other data is flattened and converted as a sequence of python
+    values. Read-only arrays of the right type, e.g. the data of another
+    dim, are used without copying.
+    """
+    if isinstance(dim_data, np.ndarray) and dim_data.dtype.kind in _fast_kinds:
+        dtype = _fast_kinds[dim_data.dtype.kind]
+        if (not dim_data.flags.writeable and dim_data.ndim == 1 and
+                dim_data.dtype == dtype and type(dim_data) is np.ndarray):
+            return dim_data
+        data = np.array(dim_data, dtype=dtype).reshape(-1)
+    else:
+        if hasattr(dim_data, "tolist"):
+            dim_data = [dim_data.tolist()]
+        if not isinstance(dim_data, (list, tuple)):
+            dim_data = list(dim_data)
+        dim_data = tuple(flatten(dim_data))
+        if len(dim_data) == 0:
+            data = np.array([])
+        elif isinstance(dim_data[0], (np.datetime64, datetime.datetime)):
+            data = np.asarray(dim_data, np.dtype("datetime64[us]"))
+        else:
+            data = np.asarray(dim_data)
+    data.flags.writeable = False
+    return data
+
+
 class DimBase(object):
     sortprio = 0
 
@@ -70,27 +104,18 @@ class DimBase(object):
             dim_outputformat = outputformat
 
         if isinstance(dim_data, integer_types):
-            dim_data = list(range(dim_data))
+            dim_data = np.arange(dim_data)
 
-        if hasattr(dim_data, "tolist"):
-            dim_data = [dim_data.tolist()]
-        if not isinstance(dim_data, (list, tuple)):
-            dim_data = list(dim_data)
-
-        self._data = tuple(flatten(dim_data))
+        self._data = dim_data_array(dim_data)
         self._name = dim_name
         self._unit = dim_unit
         self._outputformat = dim_outputformat
+        self._hash = None
 
     @property
     def data(self):
-        if len(self._data) == 0:
-            d = np.array([])
-        elif isinstance(self._data[0], (np.datetime64, datetime.datetime)):
-            d = np.asarray(self._data, np.dtype("datetime64[us]"))
-        else:
-            d = np.asarray(self._data)
-        return d
+        """Read-only view of the data of the dim"""
+        return self._data.view()
 
     @property
     def name(self):
@@ -103,50 +128,80 @@ class DimBase(object):
     @property
     def outputformat(self):
         if self._outputformat is None:
-            if is_integer(self._data[0]):
+            first = self._data.item(0)
+            if is_integer(first):
                 return "%d"
-            elif is_numlike(self._data[0]):
+            elif is_numlike(first):
                 return "%.16e"
             else:
                 return "%s"
         return self._outputformat
 
     def fullsize(self):
-        return self.data.shape[0]
+        return self._data.shape[0]
 
     def __hfarray__(self):
         return (self.data, (self,))
 
     def __lt__(self, other):
-        a = (self.sortprio, self.name, self.__class__, self._data,
-             self._unit, self._outputformat)
+        a = (self.sortprio, self.name, self.__class__,
+             tuple(self._data.tolist()), self._unit, self._outputformat)
         try:
-            b = (other.sortprio, other.name, other.__class__, other._data,
-                 other._unit, self._outputformat)
+            b = (other.sortprio, other.name, other.__class__,
+                 tuple(other._data.tolist()), other._unit,
+                 self._outputformat)
         except AttributeError:
             a = self.name
             b = other
         return a < b
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_hash"] = None  # hash of str is not stable between processes
+        return state
+
+    def _fingerprint(self):
+        data = self._data
+        if len(data) == 0:
+            return (0,)
+        return (len(data), data.item(0), data.item(len(data) // 2),
+                data.item(-1))
+
+    def _data_equal(self, other):
+        a = self._data
+        b = other._data
+        if a is b:
+            return True
+        if a.shape != b.shape:
+            return False
+        numeric = "biufc"
+        if a.dtype.kind != b.dtype.kind and (a.dtype.kind not in numeric or
+                                             b.dtype.kind not in numeric):
+            return False
+        if self._fingerprint() != other._fingerprint():
+            return False
+        return bool(np.array_equal(a, b))
+
     def __eq__(self, other):
-        a = (self.sortprio, self.name, self.__class__, self._data,
-             self._unit, self._outputformat)
         try:
-            b = (other.sortprio, other.name, other.__class__, other._data,
-                 other._unit, self._outputformat)
+            a = (self.sortprio, self.name, self.__class__, self._unit)
+            b = (other.sortprio, other.name, other.__class__, other._unit)
+            other._data
         except AttributeError:
-            a = self.name
-            b = other
-        return a == b
+            return self.name == other
+        return a == b and self._data_equal(other)
 
     def __repr__(self):
         return "%s(%r, shape=%r)" % (self.__class__.__name__,
                                      self.name,
-                                     self.data.shape)
+                                     self._data.shape)
 
     def __hash__(self):
-        return hash((self.sortprio, self.name, self.__class__, self._data,
-                     self._unit, self._outputformat))
+        if self._hash is None:
+            self._hash = hash((self.sortprio, self.name, self.__class__,
+                               tuple(self._data.tolist()), self._unit,
+                               self._outputformat))
+        return self._hash
 
     def __getitem__(self, index):
         if isinstance(index, slice) and (index == slice(None, None, None)):
@@ -0,0 +1,155 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""
+Interpolation
+=============
+
+Interpolation along one axis written as a gather and a weighted sum,
+y_new[i] = sum(w[i, k] * y[idx[i, k]]). The indices and weights only depend
+on the old and new grids so an :class:`Interpolator` is built once and
+applied to any number of arrays. :func:`get_interpolator` keeps the most
+recently used interpolators in an LRU cache.
+
+Modes:
+
+    ========  ==========================================================
+    none      exact lookup, all new points must be present in the grid
+    nearest   nearest point
+    linear    linear interpolation
+    cubic     cubic Lagrange interpolation on the four nearest points
+    magphase  linear interpolation of magnitude and unwrapped phase
+    ========  ==========================================================
+
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+modes = ("none", "nearest", "linear", "cubic", "magphase")
+
+
+def _linear(oldx, newx):
+    idx = np.clip(np.searchsorted(oldx, newx, side="right") - 1,
+                  0, len(oldx) - 2)
+    w = (newx - oldx[idx]) / (oldx[idx + 1] - oldx[idx])
+    return (np.column_stack((idx, idx + 1)),
+            np.column_stack((1 - w, w)))
+
+
+def _cubic(oldx, newx):
+    idx = np.clip(np.searchsorted(oldx, newx, side="right") - 2,
+                  0, len(oldx) - 4)
+    idx = idx[:, np.newaxis] + np.arange(4)
+    nodes = oldx[idx]
+    w = np.ones(idx.shape)
+    for j in range(4):
+        for m in range(4):
+            if m != j:
+                w[:, j] *= ((newx - nodes[:, m]) /
+                            (nodes[:, j] - nodes[:, m]))
+    return idx, w
+
+
+def _nearest(oldx, newx):
+    idx = np.clip(np.searchsorted(oldx, newx), 1, len(oldx) - 1)
+    left = newx - oldx[idx - 1] <= oldx[idx] - newx
+    return (idx - left)[:, np.newaxis], np.ones((len(newx), 1))
+
+
+class Interpolator(object):
+    """Interpolation from grid *oldx* to *newx* with *mode*.
+
+    Points of *newx* outside *oldx* raise ValueError or, if
+    *bounds_error* is False, give nan.
+    """
+    def __init__(self, oldx, newx, mode="linear", bounds_error=True):
+        if mode is None:
+            mode = "none"
+        if mode not in modes:
+            raise ValueError("Interpolation mode %r unknown" % mode)
+        if mode == "cubic" and len(oldx) < 4:
+            raise ValueError("cubic interpolation needs at least 4 points,"
+                             " got %d" % len(oldx))
+        order = np.argsort(oldx, kind="mergesort")
+        oldx = np.asarray(oldx)[order]
+        newx = np.asarray(newx)
+        self.mode = mode
+        self.nold = len(oldx)
+        self.nnew = len(newx)
+        outside = (newx < oldx[0]) | (newx > oldx[-1])
+        if mode == "none":
+            idx = np.clip(np.searchsorted(oldx, newx), 0, len(oldx) - 1)
+            if (oldx[idx] != newx).any():
+                raise ValueError("Missing x-values")
+            idx, w = idx[:, np.newaxis], np.ones((len(newx), 1))
+        elif outside.any() and bounds_error:
+            raise ValueError("Can not interpolate outside of %r - %r" %
+                             (oldx[0], oldx[-1]))
+        elif len(oldx) == 1 or mode == "nearest":
+            if len(oldx) == 1:
+                idx = np.zeros((len(newx), 1), dtype=int)
+                w = np.ones((len(newx), 1))
+            else:
+                idx, w = _nearest(oldx, newx)
+        elif mode == "cubic":
+            idx, w = _cubic(oldx.astype(float), newx.astype(float))
+        else:
+            idx, w = _linear(oldx.astype(float), newx.astype(float))
+        w[outside] = np.nan
+        self.order = order
+        self.idx = order[idx]
+        self.w = w
+
+    def __call__(self, y, axis=0):
+        """Interpolate ndarray *y* along *axis*
+        """
+        y = np.asarray(y)
+        if y.shape[axis] != self.nold:
+            raise ValueError("Expected %d values along axis %d got %d" %
+                             (self.nold, axis, y.shape[axis]))
+        if self.mode == "magphase" and np.iscomplexobj(y):
+            mag = self._apply(abs(y), axis)
+            # unwrap along increasing x and restore the stored order
+            phase = np.unwrap(np.take(np.angle(y), self.order, axis=axis),
+                              axis=axis)
+            phase = np.take(phase, np.argsort(self.order), axis=axis)
+            return mag * np.exp(1j * self._apply(phase, axis))
+        return self._apply(y, axis)
+
+    def _apply(self, y, axis):
+        axis = axis % y.ndim
+        ncols = self.idx.shape[1]
+        data = np.take(y, self.idx.ravel(), axis=axis)
+        data = data.reshape(y.shape[:axis] + self.idx.shape +
+                            y.shape[axis + 1:])
+        if ncols == 1 and not np.isnan(self.w).any():
+            return data[(slice(None),) * (axis + 1) + (0,)]
+        w = self.w.reshape(self.w.shape + (1,) * (y.ndim - axis - 1))
+        return (data * w).sum(axis=axis + 1)
+
+
+_interpolators = OrderedDict()
+_max_interpolators = 32
+
+
+def get_interpolator(oldx, newx, mode="linear", bounds_error=True):
+    """Return cached :class:`Interpolator` from *oldx* to *newx*
+    """
+    oldx = np.asarray(oldx)
+    newx = np.asarray(newx)
+    key = (oldx.dtype.str, oldx.tobytes(), newx.dtype.str, newx.tobytes(),
+           mode, bounds_error)
+    try:
+        interpolator = _interpolators.pop(key)
+    except KeyError:
+        interpolator = Interpolator(oldx, newx, mode, bounds_error)
+        if len(_interpolators) >= _max_interpolators:
+            _interpolators.popitem(last=False)
+    _interpolators[key] = interpolator
+    return interpolator
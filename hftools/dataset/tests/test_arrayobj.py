@@ -7,6 +7,7 @@ from __future__ import print_function
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
 import os
+import pickle
 import warnings
 import numpy as np
 
@@ -221,6 +222,40 @@ class Test_make_same_dims(TestCase):
         self.assertEqual(a.dims, (ds.DiagAxis("f", 3), ))
 
 
+class Test_dims_match_exactly(TestCase):
+    def setUp(self):
+        self.fi = ds.DimSweep("f", 3)
+        self.ri = ds.DimRep("r", 2)
+        self.a = aobj.hfarray(np.ones((3, 2)), dims=(self.fi, self.ri))
+
+    def test_same(self):
+        b = aobj.hfarray(np.ones((3, 2)), dims=(ds.DimSweep("f", 3),
+                                                 ds.DimRep("r", 2)))
+        self.assertTrue(aobj.dims_match_exactly(self.a, b))
+
+    def test_other_class(self):
+        b = aobj.hfarray(np.ones((3, 2)), dims=(ds.DimRep("f", 3), self.ri))
+        self.assertFalse(aobj.dims_match_exactly(self.a, b))
+
+    def test_unsorted(self):
+        b = aobj.hfarray(np.ones((2, 3)), dims=(self.ri, self.fi))
+        self.assertFalse(aobj.dims_match_exactly(b, b))
+        res = b + b
+        self.assertEqual(res.dims, (self.fi, self.ri))
+
+    def test_complex(self):
+        b = aobj.hfarray(np.ones((3, 2)),
+                         dims=(self.fi, ds.ComplexDiagAxis("cplx", 2)))
+        self.assertFalse(aobj.dims_match_exactly(b, b))
+
+    def test_same_as_make_same_dims(self):
+        b = aobj.hfarray(np.arange(6.).reshape(3, 2), dims=(self.fi, self.ri))
+        res = self.a + b
+        x, y = aobj.make_same_dims(self.a, b)
+        self.assertEqual(res.dims, x.dims)
+        self.assertAllclose(res, np.array(x) + np.array(y))
+
+
 class Test_remove_tail(TestCase):
     def setUp(self):
         self.a = aobj.hfarray([1, 2, 3], dims=(ds.DiagAxis("f", 3),))
@@ -1003,6 +1038,17 @@ class Test_add_dim(TestCase):
         facit[1] = self.A
         self.assertAllclose(res, facit)
 
+
+class Test_pickle(TestCase):
+    def test_1(self):
+        ai = aobj.DimSweep("a", [1, 2, 3], unit="Hz")
+        A = aobj.hfarray([1, 2, 3], dims=(ai,), unit="V")
+        res = pickle.loads(pickle.dumps(A, 2))
+        self.assertIsInstance(res, aobj.hfarray)
+        self.assertAllclose(res, A)
+        self.assertEqual(res.dims, A.dims)
+        self.assertEqual(res.unit, "V")
+
 if __name__ == '__main__':
     def test_1(methodname="argsort", **kw):
         v = random_value_array(4, 5)
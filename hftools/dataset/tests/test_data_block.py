@@ -7,6 +7,7 @@
 #-----------------------------------------------------------------------------
 import os
 import pdb
+import pickle
 import warnings
 
 import numpy as np
@@ -18,6 +19,7 @@ import hftools.dataset as ds
 from hftools.dataset import hfarray, DimSweep, DimRep, DimMatrix_i,\
     DimMatrix_j, DataBlockError, DataDict, DataBlock
 from hftools.dataset.comments import Comments
+from hftools.core.exceptions import HFToolsHyperCubeError
 from hftools.testing import random_value_array, random_complex_value_array,\
     random_value_array_from_dims, random_value_array, make_load_tests,\
     random_complex_value_array, random_value_array_from_dims, TestCase
@@ -346,6 +348,58 @@ class Test_filter(TestCase):
         dres = d.filter(hfarray(x))
         self.assertAllclose(dres["Freq[Hz]"], [20, 40])
 
+    def test_view(self):
+        d = DataBlock()
+        fi = DimSweep("f", [10, 20, 30, 40, 50])
+        d["a"] = hfarray([1, 2, 3, 4, 5], dims=(fi,))
+        w = d.filter(d.f >= 20)
+        self.assertAllclose(w.a, [2, 3, 4, 5])
+        self.assertTrue(np.may_share_memory(w.a, d.a))
+        w = d.filter(hfarray(DimSweep("f", [10, 30, 50])))
+        self.assertAllclose(w.a, [1, 3, 5])
+        self.assertTrue(np.may_share_memory(w.a, d.a))
+        w = d.filter(hfarray(DimSweep("f", [10, 20, 50])))
+        self.assertAllclose(w.a, [1, 2, 5])
+        self.assertAllclose(w.f, [10, 20, 50])
+
+    def test_multiple(self):
+        d = DataBlock()
+        fi = DimSweep("f", [10, 20, 30])
+        gi = DimSweep("g", [1, 2, 3, 4])
+        d["a"] = hfarray(np.arange(12).reshape(3, 4), dims=(fi, gi))
+        d["b"] = hfarray([5, 6, 7, 8], dims=(gi,))
+        w = d.filter(d.f != 20, hfarray(DimSweep("g", [2, 3, 7])))
+        self.assertEqual(w.a.dims, (DimSweep("f", [10, 30]),
+                                    DimSweep("g", [2, 3])))
+        self.assertAllclose(w.a, [[1, 2], [9, 10]])
+        self.assertAllclose(w.b, [6, 7])
+
+    def test_same_dim(self):
+        d = DataBlock()
+        fi = DimSweep("f", [1, 2, 3, 4, 5, 6])
+        d["y"] = hfarray([10, 20, 30, 40, 50, 60], dims=(fi,))
+        w = d.filter(d.f >= 2, d.f <= 5)
+        self.assertEqual(w.y.dims, (DimSweep("f", [2, 3, 4, 5]),))
+        self.assertAllclose(w.y, [20, 30, 40, 50])
+        w = d.filter(d.f != 3, hfarray(DimSweep("f", [2, 3, 4])))
+        self.assertAllclose(w.f, [2, 4])
+        self.assertAllclose(w.y, [20, 40])
+
+
+class Test_filter_index(TestCase):
+    def test_slice(self):
+        self.assertEqual(dset.filter_index(np.array([0, 1, 1, 0], bool)),
+                         slice(1, 3))
+        self.assertEqual(dset.filter_index(np.array([1, 0, 1, 0], bool)),
+                         slice(0, 3, 2))
+        self.assertEqual(dset.filter_index(np.array([0, 0, 1], bool)),
+                         slice(2, 3))
+        self.assertEqual(dset.filter_index(np.zeros(3, bool)), slice(0, 0))
+
+    def test_array(self):
+        res = dset.filter_index(np.array([1, 1, 0, 1], bool))
+        self.assertAllclose(res, [0, 1, 3])
+
 
 class Test_sort(TestCase):
     def setUp(self):
@@ -470,6 +524,28 @@ class Test_hyper(TestCase):
         result = self.d.hyper(["a", "b"], "Index", all=True)
         self.assertTrue("y" in result)
 
+    def test_unsorted(self):
+        d = self.d
+        d["a"] = hfarray([3, 1, 2, 3, 1, 2], dims=d.a.dims)
+        d["b"] = hfarray([20, 20, 10, 10, 10, 20], dims=d.b.dims)
+        result = d.hyper(["a", "b"], "Index")
+        self.assertAllclose(result.a, [1, 2, 3])
+        self.assertAllclose(result.b, [10, 20])
+        self.assertAllclose(result.c, [[10.3, 20.1],
+                                       [10.2, 20.3],
+                                       [20.2, 10.1]])
+
+    def test_no_copy(self):
+        result = self.d.hyper(["a", "b"], "Index")
+        self.assertTrue(np.may_share_memory(result.c, self.d.c))
+
+    def test_incomplete(self):
+        d = self.d
+        d["b"] = hfarray([10, 20, 10, 20, 10, 10], dims=d.b.dims)
+        self.assertRaises(HFToolsHyperCubeError, d.hyper, ["a", "b"],
+                          "Index")
+
+
 class Test_guess_units(TestCase):
     def test_1(self):
         d = DataBlock()
@@ -662,6 +738,21 @@ class Test_yield_dim_consistent_datablocks(TestCase):
         self.assertTrue(len(res) == 2)
 
 
+class Test_pickle(TestCase):
+    def test_1(self):
+        db = DataBlock()
+        db.comments = Comments(["Vgs=10"])
+        fi = DimSweep("freq", [1, 2, 3])
+        db.b = hfarray([4, 5, 6], dims=(fi,), unit="V")
+        db.a = hfarray([1, 2, 3], dims=(fi,))
+        res = pickle.loads(pickle.dumps(db, 2))
+        self.assertEqual(res.vardata.keys(), ["b", "a"])
+        self.assertAllclose(res.b, db.b)
+        self.assertEqual(res.b.dims, (fi,))
+        self.assertEqual(res.b.unit, "V")
+        self.assertEqual(res.comments.property["Vgs"], 10)
+
+
 if __name__ == '__main__':
         d = DataBlock()
         d.comments = Comments(["Vgs=10", "Ig=10"])
@@ -194,6 +194,98 @@ class Test_DataDict(TestCase):
         c.order = ["e"]
         self.assertEqual(list(c.iteritems()), [("e", VA(12)), ("a", VA(4))])
 
+    def test_order_insert(self):
+        b = DataDict()
+        b.order = []
+        for k, v in [("a", 1), ("b", 2), ("c", 3), ("d", 4)]:
+            b[k] = v
+        del b.order[b.order.index("b")]
+        self.assertEqual(b.order, ["a", "c", "d"])
+        self.assertEqual(b.keys(), ["a", "c", "d", "b"])
+        b.order.insert(1, "b")
+        self.assertEqual(b.keys(), ["a", "b", "c", "d"])
+        self.assertRaises(KeyError, b.order.insert, 0, "x")
+
+    def test_order_unordered_keys(self):
+        b = DataDict([("a", 1), ("b", 2)])
+        b["c"] = 3
+        self.assertEqual(b.order, ["c"])
+        self.assertEqual(b.keys(), ["c", "a", "b"])
+        b["b"] = 4
+        self.assertEqual(b.keys(), ["c", "b", "a"])
+        b.update(d=5)
+        self.assertEqual(b.keys(), ["c", "b", "a", "d"])
+        del b.order[0]
+        self.assertEqual(b.keys(), ["b", "a", "c", "d"])
+
+    def test_order_rename_insert(self):
+        b = DataDict([("u", 0)])
+        b.a, b.b, b.c = 1, 2, 3
+        b.rename("b", "x")
+        self.assertEqual(b.keys(), ["a", "x", "c", "u"])
+        b.order.insert(0, "c")
+        b.order.insert(1, "u")
+        self.assertEqual(b.order, ["c", "u", "a", "x"])
+        b.d = 4
+        del b["a"]
+        self.assertEqual(b.keys(), ["c", "u", "x", "d"])
+
+    def test_order_set_unknown(self):
+        self.c.order = ["x", "a"]
+        self.assertEqual(self.c.keys(), ["a", "e"])
+
+    def test_rename_existing(self):
+        b = DataDict([("a", 1), ("b", 2), ("c", 3)])
+        b.rename("c", "a")
+        self.assertEqual(b.items(), [("a", 3), ("b", 2)])
+
+    def test_views(self):
+        b = DataDict()
+        b.a, b.b, b.c = 1, 2, 3
+        keys = b.keys()
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(keys[0], "a")
+        self.assertEqual(keys[1:], ["b", "c"])
+        self.assertTrue("b" in keys)
+        self.assertEqual(b.values()[-1], 3)
+        self.assertEqual(keys + ["x"], ["a", "b", "c", "x"])
+        b["d"] = 4
+        self.assertEqual(keys, ["a", "b", "c", "d"])
+
+    def test_view_lookup(self):
+        b = DataDict([("a", 1), ("b", 2), ("c", 3)])
+        self.assertEqual(b.values()[1:], [2, 3])
+        self.assertEqual(b.items()[0], ("a", 1))
+        self.assertTrue(("b", 2) in b.items())
+        self.assertFalse(("b", 3) in b.items())
+        self.assertFalse(("x", 3) in b.items())
+        self.assertFalse("b" in b.items())
+        self.assertTrue(3 in b.values())
+        self.assertFalse(4 in b.values())
+        values = iter(b.values())
+        self.assertEqual(next(values), 1)
+        del b["b"]
+        self.assertEqual(list(values), [3])
+
+    def test_delete_while_iterating(self):
+        b = DataDict([("a", 1), ("b", 2), ("c", 3)])
+        for k in b.keys():
+            del b[k]
+            b[k + "x"] = 0
+        self.assertEqual(b.keys(), ["ax", "bx", "cx"])
+
+    def test_pop_update_clear(self):
+        b = DataDict([("a", 1), ("b", 2)])
+        b.update([("c", 3)], d=4)
+        self.assertEqual(b.pop("a"), 1)
+        self.assertEqual(b.pop("a", None), None)
+        self.assertEqual(b.popitem(), ("d", 4))
+        self.assertEqual(b.keys(), ["b", "c"])
+        b.clear()
+        self.assertEqual(b.keys(), [])
+        b["e"] = 5
+        self.assertEqual(b.keys(), ["e"])
+
     def test_values_1(self):
         c = self.c
         c.order = ["e"]
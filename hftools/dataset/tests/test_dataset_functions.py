@@ -69,6 +69,20 @@ class Test_interpolate(TestCase):
         D = self.d.interpolate(fx, "linear")
         self.assertAllclose(D.y, hfarray([1., 1.05], dims=(fx,)))
 
+    def test_cubic(self):
+        fx = DimSweep("freq", [1.5e9, 2.5e9])
+        self.d.z = hfarray([[1., 2], [3, 4], [5, 6], [7, 8], [9, 10]],
+                           dims=(self.d.y.dims[0], DimRep("k", 2)))
+        D = self.d.interpolate(fx, "cubic")
+        self.assertAllclose(D.y, hfarray([1.05, 1.15], dims=(fx,)))
+        self.assertAllclose(D.z, [[2, 3], [4, 5]])
+
+    def test_interpolationmode(self):
+        fx = DimSweep("freq", [1.4e9])
+        self.d.y.interpolationmode = "nearest"
+        D = self.d.interpolate(fx, "linear")
+        self.assertAllclose(D.y, [1.])
+
     def test_shape_error(self):
         dims = (DimSweep("freq", 2), DimSweep("power", 3))
         x = hfarray(np.zeros((2, 3), ), dims=dims)
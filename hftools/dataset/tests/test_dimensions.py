@@ -6,6 +6,7 @@
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
 import os
+import pickle
 import warnings
 import numpy as np
 
@@ -165,6 +166,37 @@ class Test_Dim(TestCase):
         a = self.cls("a", 10, unit="Hz")
         self.assertRaises(IndexError, lambda x: x[0], a)
 
+    def test_readonly(self):
+        a = self.cls("a", 10)
+        self.assertFalse(a.data.flags.writeable)
+        self.assertRaises(ValueError, a.data.__setitem__, 0, 1)
+        x = hfarray(a)
+        x[0] = 5
+        self.assertEqual(a.data[0], 0)
+
+    def test_shared_data(self):
+        a = self.cls("a", 10)
+        b = self.cls(a, unit="Hz")
+        self.assertTrue(np.may_share_memory(a.data, b.data))
+        self.assertTrue(np.may_share_memory(a.data, a[2:5].data))
+
+    def test_eq_int_float(self):
+        a = self.cls("a", [1, 2, 3])
+        b = self.cls("a", np.array([1., 2., 3.]))
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertFalse(a == self.cls("a", [1, 5, 3]))
+        self.assertFalse(a == self.cls("a", [1, 2]))
+        self.assertFalse(self.cls("a", ["x"]) == self.cls("a", [1]))
+
+    def test_pickle_hash(self):
+        a = self.cls("a", 3)
+        hash(a)
+        b = pickle.loads(pickle.dumps(a, 2))
+        self.assertIsNone(b._hash)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+
 
 class Test_DimSweep(Test_Dim):
     cls = ddim.DimSweep
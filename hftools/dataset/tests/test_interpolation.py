@@ -0,0 +1,108 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+import numpy as np
+
+import hftools.dataset.interpolation as interp
+from hftools.testing import TestCase
+
+
+class Test_Interpolator(TestCase):
+    def setUp(self):
+        self.x = np.array([1., 2, 4, 5, 7])
+
+    def test_none(self):
+        ip = interp.Interpolator(self.x, [5, 1], None)
+        self.assertAllclose(ip(self.x ** 2), [25, 1])
+
+    def test_none_missing(self):
+        self.assertRaises(ValueError, interp.Interpolator, self.x, [1.5],
+                          "none")
+
+    def test_none_strings(self):
+        ip = interp.Interpolator(np.array(["b", "a", "c"]), ["c", "b"],
+                                 "none")
+        self.assertEqual(ip(np.array(["B", "A", "C"])).tolist(), ["C", "B"])
+
+    def test_nearest(self):
+        ip = interp.Interpolator(self.x, [1, 1.4, 1.6, 3, 6.5], "nearest")
+        self.assertAllclose(ip(self.x), [1, 1, 2, 2, 7])
+
+    def test_linear(self):
+        ip = interp.Interpolator(self.x, [1, 1.5, 3, 7], "linear")
+        self.assertAllclose(ip(self.x * 2 + 1), [3, 4, 7, 15])
+
+    def test_linear_unsorted(self):
+        ip = interp.Interpolator(self.x[::-1], [1.5, 3], "linear")
+        self.assertAllclose(ip(self.x[::-1] * 2), [3, 6])
+
+    def test_cubic(self):
+        newx = np.linspace(1, 7, 13)
+        ip = interp.Interpolator(self.x, newx, "cubic")
+        self.assertAllclose(ip(self.x ** 3 - 2 * self.x), newx ** 3 - 2 * newx)
+
+    def test_cubic_short(self):
+        for oldx in [[1.], [1., 2], [1., 2, 3]]:
+            self.assertRaises(ValueError, interp.Interpolator, oldx, [1.5],
+                              "cubic")
+
+    def test_magphase(self):
+        phase = np.array([0, 3, 6, 7.5, 10.5])
+        y = 2 * np.exp(1j * phase)
+        ip = interp.Interpolator(self.x, [1.5, 6], "magphase")
+        self.assertAllclose(ip(y), 2 * np.exp(1j * np.array([1.5, 9])))
+        self.assertAllclose(ip(self.x), [1.5, 6])
+
+    def test_magphase_unsorted(self):
+        phase = np.array([0, 3, 6, 7.5, 10.5])
+        order = [3, 0, 4, 2, 1]
+        y = 2 * np.exp(1j * phase[order])
+        ip = interp.Interpolator(self.x[order], [1.5, 6], "magphase")
+        self.assertAllclose(ip(y), 2 * np.exp(1j * np.array([1.5, 9])))
+
+    def test_axis(self):
+        y = np.arange(30.).reshape(3, 5, 2)
+        ip = interp.Interpolator(self.x, [1.5, 4.5], "linear")
+        res = ip(y, axis=1)
+        self.assertEqual(res.shape, (3, 2, 2))
+        self.assertAllclose(res, (y[:, :-1:2] + y[:, 1::2]) / 2)
+        self.assertAllclose(ip(np.moveaxis(y, 1, -1), axis=-1),
+                            np.moveaxis(res, 1, -1))
+
+    def test_bounds(self):
+        self.assertRaises(ValueError, interp.Interpolator, self.x, [0, 1])
+        ip = interp.Interpolator(self.x, [0, 1, 8], bounds_error=False)
+        res = ip(self.x)
+        self.assertTrue(np.isnan(res[[0, 2]]).all())
+        self.assertAllclose(res[1], 1)
+
+    def test_shape_error(self):
+        ip = interp.Interpolator(self.x, [1])
+        self.assertRaises(ValueError, ip, np.zeros(4))
+
+    def test_unknown_mode(self):
+        self.assertRaises(ValueError, interp.Interpolator, self.x, [1],
+                          "kalle")
+
+
+class Test_get_interpolator(TestCase):
+    def test_cache(self):
+        x = np.array([1., 2, 3])
+        ip = interp.get_interpolator(x, [1.5])
+        self.assertIs(ip, interp.get_interpolator(x.copy(), [1.5]))
+        self.assertIsNot(ip, interp.get_interpolator(x, [1.5], "nearest"))
+
+    def test_lru(self):
+        x = np.array([1., 2, 3])
+        first = interp.get_interpolator(x, [1.25])
+        for idx in range(interp._max_interpolators + 5):
+            interp.get_interpolator(x, [1.25])
+            interp.get_interpolator(x, [1 + idx / 100.])
+        self.assertIs(first, interp.get_interpolator(x, [1.25]))
+        self.assertTrue(len(interp._interpolators) <=
+                        interp._max_interpolators)
@@ -22,6 +22,7 @@ This package contains routines to read and write data.
 .. automodule:: hftools.file_formats.touchstone
 .. automodule:: hftools.file_formats.spdata
 .. automodule:: hftools.file_formats.citi
+.. automodule:: hftools.file_formats.cache
 
 """
 import glob
@@ -35,12 +36,15 @@ from hftools.file_formats.touchstone import read_touchstone, save_touchstone,\
     is_touchstone, TouchstoneError
 from hftools.file_formats.citi import read_citi, save_citi, is_citi,\
     CITIFileError
-from hftools.file_formats.spdata import read_spdata, save_spdata
+from hftools.file_formats.spdata import read_spdata, save_spdata, iter_spdata
+from hftools.file_formats.cache import ReadCache
 from hftools.file_formats.hdf5 import read_hdf5, save_hdf5, is_hdf5,\
-    append_hdf5
+    append_hdf5, HDF5Appender
 from hftools.file_formats.muwave_mat import read_muwave_matlabdata,\
     is_muwave_matlabdata
 from hftools._external import path
+from hftools.py3compat import string_types
+from hftools.utils import deprecate
 
 isfile = [(is_mdif, read_mdif),
           (is_hdf5, read_hdf5),
@@ -53,12 +57,27 @@ glob_pat = re.compile("[*?]")
 
 
 def read_data(filename, merge=True, guess_unit=True,
-              property_to_vars=True, **kw):
+              property_to_vars=True, cache=None, **kw):
     """Guess fileformat of *filename* and read data.
 
     The file format is guessed by looking for distinguishing marks for
     citi, touchstone, and mdif. If non of those are present spdata is assumed.
+
+    Remaining keyword arguments are passed on to the reader, e.g. *workers*
+    and *executor* to read several files in parallel.
+
+    *cache* is either True, to use a :class:`ReadCache` in ``_hfcache`` in
+    the current directory, the name of a cache directory, or a
+    :class:`ReadCache`. Each matching file is then read through the cache.
     """
+    if cache is not None and cache is not False:
+        if cache is True:
+            cache = ReadCache()
+        elif isinstance(cache, string_types):
+            cache = ReadCache(cache)
+        return cache.read(filename, read_data, merge=merge,
+                          guess_unit=guess_unit,
+                          property_to_vars=property_to_vars, **kw)
     if isinstance(filename, (list, tuple)):
         filenames = filename
     else:
@@ -85,6 +104,7 @@ def read_data(filename, merge=True, guess_unit=True,
 @contextmanager
 def read_to_cache(filename, cachename=None, cachedir=None,
                   reread=False, verbose=True):
+    deprecate("read_to_cache is deprecated, use read_data(..., cache=True)")
     if cachedir is None:
         cachedir = path.getcwd() / "_hfcache"
     else:
@@ -106,6 +126,8 @@ def read_to_cache(filename, cachename=None, cachedir=None,
 
 
 def read_from_cache(cachename=None, cachedir=None, reread=False):
+    deprecate("read_from_cache is deprecated, use read_data(..., "
+              "cache=True)")
     if cachedir is None:
         cachedir = path.getcwd() / "_hfcache"
     else:
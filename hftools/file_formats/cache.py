@@ -0,0 +1,256 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+u"""
+Read cache
+==========
+
+    .. autoclass:: ReadCache
+       :members: read, get, invalidate, clear, evict
+
+Parsed data files are cached in a binary (pickle) format. Each cached file
+is stored in its own entry in the cache directory (default ``_hfcache`` in
+the current directory). An entry is keyed on the absolute path of the
+file, its modification time and size, and optionally a hash of its content,
+together with the options used to read it. If any of these change the file
+is read again.
+
+When the total size of the cache exceeds *maxsize* bytes the least
+recently used entries are removed.
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+from hftools.dataset import DataBlock, DimPartial, hfarray
+from hftools.file_formats.merge import merge_blocks
+from hftools.utils import glob
+from hftools import py3compat as py3
+from hftools.py3compat import pickle
+
+ENTRY_EXTENSION = ".hfcache"
+
+
+def file_hash(filename, blocksize=2 ** 20):
+    """Return sha1 hexdigest of the content of *filename*
+    """
+    sha = hashlib.sha1()
+    with open(filename, "rb") as fil:
+        block = fil.read(blocksize)
+        while block:
+            sha.update(block)
+            block = fil.read(blocksize)
+    return sha.hexdigest()
+
+
+def _hexdigest(text):
+    return hashlib.sha1(py3.cast_bytes(text, "utf-8")).hexdigest()
+
+
+def _filled(x, value):
+    return hfarray(np.full(x.shape, value), dims=x.dims)
+
+
+def _set_file_info(data, idx, fname):
+    """Set FILEINDEX, and FILENAME if present, of the blocks in *data*. A
+    DataBlock, a dict of blocks (e.g. MDIF) or a list of blocks.
+    """
+    if isinstance(data, DataBlock):
+        if "FILEINDEX" in data.vardata:  # merged blocks, keep dims
+            data["FILEINDEX"] = _filled(data.FILEINDEX, idx)
+        else:
+            data["FILEINDEX"] = DimPartial("FILEINDEX", [idx])
+        if "FILENAME" in data:
+            data["FILENAME"] = _filled(data.FILENAME,
+                                       py3.cast_unicode(fname))
+    elif isinstance(data, dict):
+        for value in data.values():
+            _set_file_info(value, idx, fname)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            _set_file_info(value, idx, fname)
+
+
+def _merge(blocks, merge, hyper, regrid):
+    """Merge results of several files, dicts of blocks are merged for each
+    key like the MDIF reader does.
+    """
+    if not all(isinstance(block, dict) for block in blocks):
+        if merge:
+            return merge_blocks(blocks, hyper=hyper, regrid=regrid)
+        return blocks
+    out = {}
+    for block in blocks:
+        for k, v in block.items():
+            if isinstance(v, (list, tuple)):
+                out.setdefault(k, []).extend(v)
+            else:
+                out.setdefault(k, []).append(v)
+    if merge:
+        for k, v in out.items():
+            out[k] = merge_blocks(v, hyper=hyper, regrid=regrid)
+    return out
+
+
+class ReadCache(object):
+    """Cache of parsed data files in *cachedir*.
+
+    *cachedir* defaults to ``_hfcache`` in the current directory. *maxsize*
+    is the maximum total size of the cache in bytes, None means no limit.
+    If *use_hash* is True the content hash of the file is part of the key,
+    this catches changes that do not alter modification time or size at the
+    cost of reading each file when it is looked up.
+    """
+    def __init__(self, cachedir=None, maxsize=2 ** 30, use_hash=False):
+        if cachedir is None:
+            cachedir = os.path.join(os.getcwd(), "_hfcache")
+        self.cachedir = os.path.abspath(cachedir)
+        self.maxsize = maxsize
+        self.use_hash = use_hash
+
+    def key(self, filename):
+        """Return key (abspath, mtime, size, hash) for *filename*
+        """
+        stat = os.stat(filename)
+        if self.use_hash:
+            digest = file_hash(filename)
+        else:
+            digest = None
+        return (os.path.abspath(filename), stat.st_mtime, stat.st_size,
+                digest)
+
+    def entryname(self, filename, options):
+        """Return name of cache entry for *filename* read with *options*
+        """
+        options = repr(sorted(options.items()))
+        name = "%s_%s%s" % (_hexdigest(os.path.abspath(filename)),
+                            _hexdigest(options), ENTRY_EXTENSION)
+        return os.path.join(self.cachedir, name)
+
+    def entries(self):
+        """Return list of paths to all entries in cache
+        """
+        if not os.path.isdir(self.cachedir):
+            return []
+        return [os.path.join(self.cachedir, name)
+                for name in os.listdir(self.cachedir)
+                if name.endswith(ENTRY_EXTENSION)]
+
+    def load(self, entry, key):
+        """Return data stored in *entry* if it was stored with *key*, else
+        None.
+        """
+        try:
+            with open(entry, "rb") as fil:
+                if pickle.load(fil) != key:
+                    return None
+                data = pickle.load(fil)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            os.utime(entry, None)
+        except OSError:  # pragma: no cover
+            pass
+        return data
+
+    def store(self, entry, key, data):
+        """Store *data* with *key* in *entry*
+        """
+        if not os.path.isdir(self.cachedir):
+            os.makedirs(self.cachedir)
+        fd, tmpname = tempfile.mkstemp(dir=self.cachedir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fil:
+                pickle.dump(key, fil, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(data, fil, pickle.HIGHEST_PROTOCOL)
+            if os.path.exists(entry):
+                os.remove(entry)
+            os.rename(tmpname, entry)
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+        self.evict()
+
+    def get(self, filename, readfun, **options):
+        """Return data of *filename* from cache, calling
+        readfun(filename, \\*\\*options) and storing the result if the entry
+        is missing or stale.
+        """
+        key = self.key(filename)
+        entry = self.entryname(filename, options)
+        data = self.load(entry, key)
+        if data is None:
+            data = readfun(filename, **options)
+            self.store(entry, key, data)
+        return data
+
+    def read(self, filename, readfun, **options):
+        """Read files matching *filename* (pattern or list of patterns)
+        using the cache. The files are read one at a time with
+        readfun(fname, \\*\\*options) and merged like the multi file readers
+        do.
+        """
+        if isinstance(filename, (list, tuple)):
+            filenames = []
+            for f in filename:
+                filenames.extend(glob(f))
+        else:
+            filenames = glob(filename)
+        if not filenames:
+            raise IOError("Pattern %r did not match any files" % filename)
+        blocks = []
+        for idx, fname in enumerate(filenames):
+            data = self.get(fname, readfun, **options)
+            _set_file_info(data, idx, fname)
+            blocks.append(data)
+        if len(blocks) == 1:
+            return blocks[0]
+        return _merge(blocks, options.get("merge", True),
+                      options.get("hyper", False), options.get("regrid"))
+
+    def invalidate(self, filename):
+        """Remove entries of all files matching *filename*
+        """
+        if isinstance(filename, py3.string_types):
+            filename = [filename]
+        entries = self.entries()
+        for pattern in filename:
+            for fname in glob(pattern):
+                prefix = os.path.join(self.cachedir,
+                                      _hexdigest(os.path.abspath(fname)))
+                for entry in entries:
+                    if entry.startswith(prefix):
+                        os.remove(entry)
+
+    def clear(self):
+        """Remove all entries in cache
+        """
+        for entry in self.entries():
+            os.remove(entry)
+
+    def size(self):
+        """Return total size of cache entries in bytes
+        """
+        return sum(os.path.getsize(entry) for entry in self.entries())
+
+    def evict(self):
+        """Remove least recently used entries until size of cache is at
+        most *maxsize*.
+        """
+        if self.maxsize is None:
+            return
+        entries = [(os.path.getmtime(entry), os.path.getsize(entry), entry)
+                   for entry in self.entries()]
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.maxsize:
+                break
+            os.remove(entry)
+            total -= size
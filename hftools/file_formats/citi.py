@@ -254,14 +254,16 @@ def save_citi(db, filename):
 
 def read_citi(filnamn, make_complex=True, property_to_vars=True,
               guess_unit=True, normalize=True, make_matrix=True,
-              merge=True, verbose=False):
+              merge=True, verbose=False, workers=None, executor=None):
     return ReadCITIFileFormat.read_file(filnamn, make_complex=make_complex,
                                         property_to_vars=property_to_vars,
                                         guess_unit=guess_unit,
                                         normalize=normalize,
                                         make_matrix=make_matrix,
                                         merge=merge,
-                                        verbose=verbose)
+                                        verbose=verbose,
+                                        workers=workers,
+                                        executor=executor)
 
 if __name__ == "__main__":
 
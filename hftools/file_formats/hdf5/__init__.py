@@ -6,4 +6,4 @@
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
 from .hdf5 import read_hdf5, save_hdf5, is_hdf5
-from .v_02 import append_hdf5
+from .v_02 import append_hdf5, HDF5Appender
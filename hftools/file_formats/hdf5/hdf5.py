@@ -40,7 +40,22 @@ else:
         """
         return h5py.is_hdf5(filename)
 
-    def read_hdf5(h5file, name="datablock", **kw):
+    def read_hdf5(h5file, name="datablock", lazy=False, **kw):
+        """Read hdf5 file *h5file*.
+
+        *lazy* only applies to version 0.2 files, see
+        :func:`hftools.file_formats.hdf5.v_02.read_hdf5`. Older files are
+        always read into memory.
+        """
+        if lazy:
+            if isinstance(h5file, h5py.File):
+                fil = h5file
+            else:
+                fil = h5py.File(h5file, mode="r")
+            if fil.attrs.get("hftools file version", "") == "0.2":
+                return v_02.read_hdf5(fil, name=name, lazy=True, **kw)
+            if fil is not h5file:
+                fil.close()
         with hdf5context(h5file) as fil:
             version = fil.attrs.get("hftools file version", "")
             if version == "0.2":
@@ -13,10 +13,15 @@ except ImportError:  # pragma: no cover
     import_failed = True
     h5py = None
 
+try:
+    import hdf5plugin  # registers the lz4 filter with hdf5
+except ImportError:  # pragma: no cover
+    hdf5plugin = None
+
 import numpy as np
 from hftools.dataset import DimRep, DimSweep, hfarray, DataBlock,\
     DimMatrix_i, DimMatrix_j, DimPartial
-from hftools.py3compat import PY3
+from hftools.py3compat import PY3, integer_types
 from hftools.dataset.comments import Comments
 #from hftools.file_formats.hdf5.hdf5 import hdf5context
 from .helper import hdf5context
@@ -37,11 +42,200 @@ def unescape_varname(x):
     return x.replace("\\", "/")
 
 
+LZ4_FILTER = 32004
+CHUNK_TARGET_BYTES = 256 * 1024
+CHUNK_MAX_BYTES = 1024 * 1024
+EXPAND_CHUNK = 64
+
+
+def auto_chunks(data, expandaxis=None):
+    """Return chunk shape for hfarray *data* aligned to its dims.
+
+    The matrix dims and the innermost sweep dim (typically the frequency
+    sweep) are kept whole, the inner sweep is split only if the chunk
+    would be larger than CHUNK_MAX_BYTES. The outer dims (bias points,
+    index, ...) are then grown, innermost first, until the chunk is about
+    CHUNK_TARGET_BYTES. The *expandaxis* of an expandable dataset gets
+    at most EXPAND_CHUNK elements.
+    """
+    shape = data.shape
+    if not shape:
+        return None
+    if 0 in shape:
+        return True
+    itemsize = 16 if data.dtype.kind in "OUS" else data.dtype.itemsize
+    dims = getattr(data, "dims", ())
+    sweeps = [idx for idx, dim in enumerate(dims)
+              if not isinstance(dim, (DimMatrix_i, DimMatrix_j))]
+    inner = sweeps[-1] if sweeps else 0
+    if inner == expandaxis and inner > 0:
+        inner -= 1
+    chunks = [1] * inner + list(shape[inner:])
+    if expandaxis is not None:
+        chunks[expandaxis] = 1
+    while (np.prod(chunks) * itemsize > CHUNK_MAX_BYTES and
+           chunks[inner] > 1):
+        chunks[inner] = (chunks[inner] + 1) // 2
+    order = list(reversed(range(inner)))
+    if expandaxis is not None:
+        order = [expandaxis] + [ax for ax in order if ax != expandaxis]
+    for ax in order:
+        grow = CHUNK_TARGET_BYTES // int(np.prod(chunks) * itemsize)
+        if grow <= 1:
+            break
+        if ax == expandaxis:
+            chunks[ax] = min(EXPAND_CHUNK, grow)
+        else:
+            chunks[ax] = min(shape[ax], grow)
+    return tuple(int(x) for x in chunks)
+
+
+def dataset_options(key, data, expandaxis=None, chunks=None,
+                    compression=None, compression_opts=None, shuffle=False):
+    """Return keyword arguments for h5py create_dataset.
+
+    *chunks* is None (contiguous unless compressed or expandable), "auto"
+    for :func:`auto_chunks`, True to let h5py decide, a chunk shape, or a
+    dict with one of these for each variable name. *compression* is None,
+    "gzip", "lzf", "lz4" (needs the hdf5plugin package) or a filter number.
+    """
+    if not data.ndim:  # scalars can not be chunked or compressed
+        return {}
+    if isinstance(chunks, dict):
+        chunks = chunks.get(key)
+    if compression == "lz4":
+        if hdf5plugin is None:
+            raise ValueError("lz4 compression needs the hdf5plugin package")
+        compression = LZ4_FILTER
+    if chunks is None and (compression or shuffle):
+        chunks = "auto"
+    if chunks == "auto":
+        chunks = auto_chunks(data, expandaxis)
+    elif chunks is None and expandaxis is not None:
+        chunks = True
+    kw = {}
+    if chunks is not None:
+        kw["chunks"] = chunks
+    if compression is not None:
+        kw["compression"] = compression
+        if compression_opts is not None:
+            kw["compression_opts"] = compression_opts
+    if shuffle:
+        kw["shuffle"] = True
+    return kw
+
+
 def expand_dataset(dataset, expansion, axis):
     dataset.resize(dataset.shape[axis] + expansion, axis=axis)
 
 
-def getvar(db, key):
+class LazyHDF5Array(object):
+    """Proxy for variable stored in hdf5 *dataset* that reads data on
+    access.
+
+    Indexing with integers, slices and Ellipsis only reads the selected
+    hyperslab from the file and returns an hfarray. Other indices, and
+    conversion to an array, read the whole variable. Arithmetic, and any
+    other hfarray attribute, work on the materialized hfarray so the proxy
+    can be used in place of an hfarray in a DataBlock. The proxy keeps a
+    reference to the file so it is open as long as the proxy is alive.
+    """
+    __array_priority__ = 10
+
+    def __init__(self, dataset, dims, unit=None, dtype=None,
+                 outputformat=None):
+        self.dataset = dataset
+        self.file = dataset.file
+        self.dims = tuple(dims)
+        self.unit = unit
+        self.outputformat = outputformat
+        self.dtype = np.dtype(dtype) if dtype is not None else dataset.dtype
+
+    @property
+    def shape(self):
+        return self.dataset.shape
+
+    @property
+    def ndim(self):
+        return len(self.dataset.shape)
+
+    @property
+    def size(self):
+        return int(np.prod(self.dataset.shape))
+
+    def __len__(self):
+        return self.dataset.shape[0]
+
+    def __repr__(self):
+        return "<%s %r shape=%r dtype=%s>" % (self.__class__.__name__,
+                                              self.dataset.name, self.shape,
+                                              self.dtype)
+
+    def _make_array(self, data, dims):
+        return hfarray(data, dims=dims, unit=self.unit, dtype=self.dtype,
+                       outputformat=self.outputformat)
+
+    def materialize(self):
+        """Read all data and return it as an hfarray
+        """
+        return self._make_array(self.dataset[...], self.dims)
+
+    def __array__(self, dtype=None):
+        return np.asarray(self.materialize(), dtype=dtype)
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name in ("dataset", "dims"):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def dims_index(self, name, cls=None):
+        for idx, dim in enumerate(self.dims):
+            if dim.name == name and (cls is None or isinstance(dim, cls)):
+                return idx
+        msg = "Can not find AxisObject with name:%r and cls:%s" % (name, cls)
+        raise IndexError(msg)
+
+    def __getitem__(self, index):
+        if not isinstance(index, tuple):
+            index = (index,)
+        for i in index:
+            if isinstance(i, integer_types) or i is Ellipsis:
+                continue
+            if isinstance(i, slice) and (i.step is None or i.step > 0):
+                continue
+            return self.materialize()[index]
+        if index.count(Ellipsis) > 1:
+            raise IndexError("Can not handle more than one Ellipsis")
+        if Ellipsis in index:
+            i = index.index(Ellipsis)
+            index = (index[:i] + (slice(None),) * (self.ndim - len(index) + 1)
+                     + index[i + 1:])
+        if len(index) > self.ndim:
+            raise IndexError("too many indices")
+        index = index + (slice(None),) * (self.ndim - len(index))
+        data = self.dataset[index]
+        dims = [dim[i] for i, dim in zip(index, self.dims)
+                if isinstance(i, slice)]
+        if not dims:
+            return np.asarray(data, dtype=self.dtype)[()]
+        return self._make_array(data, dims)
+
+
+def _materialized_method(name):
+    def method(self, *args):
+        return getattr(self.materialize(), name)(*args)
+    method.__name__ = name
+    return method
+
+for _name in ["add", "sub", "mul", "div", "truediv", "floordiv", "mod",
+              "pow", "radd", "rsub", "rmul", "rdiv", "rtruediv", "rfloordiv",
+              "rmod", "rpow", "neg", "pos", "abs", "lt", "le", "gt", "ge"]:
+    _name = "__%s__" % _name
+    setattr(LazyHDF5Array, _name, _materialized_method(_name))
+del _name
+
+
+def getvar(db, key, lazy=False):
     X = db[key]
 
     dims = []
@@ -56,14 +250,14 @@ def getvar(db, key):
     unit = X.attrs.get("unit", None)
     outputformat = X.attrs.get("outputformat", None)
     dtype = X.attrs.get("dtype", None)
-    if len(dims) == len(X.dims):
-        return hfarray(X.value, dims=dims, unit=unit,
-                       dtype=dtype, outputformat=outputformat)
-    else:
+    if len(dims) != len(X.dims):
         dimcls = dimrep[X.attrs.get("dimtype", "DimSweep")]
-        dim = dimcls(X.name.strip("/"), X[...], unit=unit)
-        return hfarray(X.value, dims=(dim,), unit=unit,
-                       dtype=dtype, outputformat=outputformat)
+        dims = (dimcls(X.name.strip("/"), X[...], unit=unit),)
+    if lazy:
+        return LazyHDF5Array(X, dims=dims, unit=unit,
+                             dtype=dtype, outputformat=outputformat)
+    return hfarray(X[...], dims=dims, unit=unit,
+                   dtype=dtype, outputformat=outputformat)
 
 
 def cast_arrays_to_hdf5(data):
@@ -80,10 +274,15 @@ def cast_arrays_to_hdf5(data):
     return data
 
 
-def create_dataset(db, key, data, expandable=False):
+def create_dataset(db, key, data, expandable=False, **kw):
     if "/" in key:
         raise Exception("/ illegal character for variable name in hdf5 file")
     data_dtype = data.dtype
+    if expandable:
+        expandaxis = 0 if data.ndim in (0, 1) else 1
+    else:
+        expandaxis = None
+    options = dataset_options(key, data, expandaxis, **kw)
     data = cast_arrays_to_hdf5(data)
     if expandable:
         if data.ndim in (0, 1):
@@ -94,24 +293,34 @@ def create_dataset(db, key, data, expandable=False):
             maxshape = tuple(maxshape)
     else:
         maxshape = None
-    db.create_dataset(key, data=data, maxshape=maxshape)
+    db.create_dataset(key, data=data, maxshape=maxshape, **options)
     db[key].attrs["dtype"] = data_dtype.str
 
 
-def read_hdf5_handle(filehandle, **kw):
+def read_hdf5_handle(filehandle, lazy=False, **kw):
     if isinstance(filehandle, h5py.File):
         db = DataBlock()
         for k in filehandle:
             uk = unescape_varname(k)
             if "dimtype" not in filehandle[k].attrs:
-                db[uk] = getvar(filehandle, k)
+                db[uk] = getvar(filehandle, k, lazy=lazy)
         db.comments = Comments()
         return db
     else:
         raise IOError("filehandle should be a h5py File, is: %r" % filehandle)
 
 
-def read_hdf5(h5file, name="datablock", **kw):
+def read_hdf5(h5file, name="datablock", lazy=False, **kw):
+    """Read hftools v0.2 hdf5 file.
+
+    If *lazy* is True the variables are :class:`LazyHDF5Array` proxies that
+    read data from the file when accessed. The file is then left open, if
+    *h5file* is a filename it is closed when all proxies are gone.
+    """
+    if lazy:
+        if not isinstance(h5file, h5py.File):
+            h5file = h5py.File(h5file, mode="r")
+        return read_hdf5_handle(h5file, name=name, lazy=True, **kw)
     with hdf5context(h5file) as fil:
         d = read_hdf5_handle(fil, name=name, **kw)
     return d
@@ -123,7 +332,9 @@ else:  # if PY2
     h5py_string_dtype = h5py.special_dtype(vlen=unicode)
 
 
-def save_hdf5_handle(db, filehandle, expandable=False, expanddim=None, **kw):
+def save_hdf5_handle(db, filehandle, expandable=False, expanddim=None,
+                     chunks=None, compression=None, compression_opts=None,
+                     shuffle=False, **kw):
     if expanddim is None:
         expanddim = DimRep("INDEX", 1)
     filehandle.attrs["hftools file version"] = "0.2"
@@ -156,7 +367,9 @@ def save_hdf5_handle(db, filehandle, expandable=False, expanddim=None, **kw):
             v = v.add_dim(expanddim, 1)
         else:
             pass
-        create_dataset(filehandle, ek, v, expandable=expandable)
+        create_dataset(filehandle, ek, v, expandable=expandable,
+                       chunks=chunks, compression=compression,
+                       compression_opts=compression_opts, shuffle=shuffle)
         for idx, dv in enumerate(v.dims):
             filehandle[ek].dims.create_scale(filehandle[dv.name])
             filehandle[ek].dims[idx].attach_scale(filehandle[dv.name])
@@ -168,33 +381,139 @@ def save_hdf5_handle(db, filehandle, expandable=False, expanddim=None, **kw):
             filehandle[ek].attrs["outputformat"] = v.outputformat
 
 
-def save_hdf5(db, h5file, expandable=False, expanddim=None, **kw):
+def save_hdf5(db, h5file, expandable=False, expanddim=None, chunks=None,
+              compression=None, compression_opts=None, shuffle=False, **kw):
+    """Save DataBlock *db* in hftools v0.2 format.
+
+    *chunks*, *compression*, *compression_opts* and *shuffle* set the
+    storage layout of the variables, see :func:`dataset_options`. Giving
+    *compression* or *shuffle* without *chunks* uses chunks="auto".
+    """
     with hdf5context(h5file, mode="w") as fil:
         d = save_hdf5_handle(db, fil,
                              expandable=expandable,
                              expanddim=expanddim,
+                             chunks=chunks,
+                             compression=compression,
+                             compression_opts=compression_opts,
+                             shuffle=shuffle,
                              **kw)
     return d
 
 
+class HDF5Appender(object):
+    """Append DataBlocks to an expandable hftools v0.2 file.
+
+    The blocks are buffered and written *buffersize* at a time as one slab
+    per variable. The datasets grow by a factor *growth* when more space is
+    needed and are trimmed to the written length by :meth:`close`. Can be
+    used as a context manager::
+
+        with HDF5Appender(filehandle) as appender:
+            for db in measurements:
+                appender.append(db)
+
+    Until the appender is closed the datasets can contain unused space
+    after the last written index. When the with block is left by an
+    exception the buffered blocks are still written, unless it was the
+    writing that failed.
+    """
+    def __init__(self, filehandle, expanddim=None, buffersize=100,
+                 growth=2.0):
+        key = "hftools file version"
+        if key not in filehandle.attrs or filehandle.attrs[key] != "0.2":
+            raise Exception("Can only append to hftools version 0.2")
+        if expanddim is None:
+            expanddim = DimRep("INDEX", 1)
+        self.filehandle = filehandle
+        self.indexname = expanddim.name
+        self.buffersize = max(1, buffersize)
+        self.growth = max(1.0, growth)
+        self.length = filehandle[self.indexname].shape[0]
+        self.buffer = []
+        self.flush_failed = False
+        self.datasets = []
+        for k, diskdata in filehandle.items():
+            uk = unescape_varname(k)
+            if "dimtype" in diskdata.attrs and uk != self.indexname:
+                continue
+            self.datasets.append((uk, diskdata, diskdata.maxshape.index(None)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.flush_failed:  # drop blocks that could not be written
+            self.buffer = []
+            self.trim()
+        else:
+            self.close()
+
+    def append(self, db):
+        """Add *db* to buffer, flush buffer if it is full
+        """
+        for uk, _, _ in self.datasets:
+            if uk != self.indexname and uk not in db.vardata:
+                msg = "Variable %r missing in db, can not append" % uk
+                raise ValueError(msg)
+        self.buffer.append(db)
+        if len(self.buffer) >= self.buffersize:
+            self.flush()
+
+    def _reserve(self, diskdata, axis, length):
+        if diskdata.shape[axis] < length:
+            size = max(length, int(diskdata.shape[axis] * self.growth))
+            diskdata.resize(size, axis=axis)
+
+    def flush(self):
+        """Write buffered blocks to file
+
+        The slabs for all variables are built before anything is written.
+        The buffer is cleared and the written length advanced only when all
+        slabs are written, a slab left over by a failed write is removed
+        by :meth:`trim`. *flush_failed* is True while a failed flush has
+        not been followed by a successful one.
+        """
+        if not self.buffer:
+            return
+        self.flush_failed = True
+        start = self.length
+        stop = start + len(self.buffer)
+        slabs = []
+        for uk, diskdata, axis in self.datasets:
+            if uk == self.indexname:
+                last = diskdata[start - 1] if start else -1
+                data = last + np.arange(1, stop - start + 1)
+            else:
+                data = np.stack([cast_arrays_to_hdf5(np.asarray(db[uk]))
+                                 for db in self.buffer], axis=axis)
+            slabs.append((diskdata, axis, data))
+        for diskdata, axis, data in slabs:
+            self._reserve(diskdata, axis, stop)
+        for diskdata, axis, data in slabs:
+            diskdata[(slice(None),) * axis + (slice(start, stop),)] = data
+        self.length = stop
+        self.buffer = []
+        self.flush_failed = False
+
+    def close(self):
+        """Flush buffer and trim datasets to written length
+        """
+        self.flush()
+        self.trim()
+
+    def trim(self):
+        """Trim datasets to written length
+        """
+        for _, diskdata, axis in self.datasets:
+            if diskdata.shape[axis] != self.length:
+                diskdata.resize(self.length, axis=axis)
+
+
 def append_hdf5(db, filehandle, expanddim=None, **kw):
-    key = "hftools file version"
-    if key not in filehandle.attrs or filehandle.attrs[key] != "0.2":
-        raise Exception("Can only append to hftools version 0.2")
-    if expanddim is None:
-        expanddim = DimRep("INDEX", 1)
-    idx = filehandle[expanddim.name][-1] + 1
-    expand_dataset(filehandle[expanddim.name], 1, 0)
-    filehandle[expanddim.name].value[-1] = idx
-
-    for k, v in filehandle.items():
-        uk = unescape_varname(k)
-        if uk in db.ivardata or uk == expanddim.name:
-            continue
-        if uk not in db.vardata:
-            raise ValueError("Variable %r missing in db, can not append" % uk)
-        diskdata = filehandle[k]
-        ax = diskdata.maxshape.index(None)
-        expand_dataset(diskdata, 1, ax)
-        s = (slice(None),) * ax + (diskdata.shape[ax] - 1,)
-        diskdata[s] = cast_arrays_to_hdf5(db[uk])
+    """Append *db* to expandable v0.2 file, use :class:`HDF5Appender` when
+    appending many blocks.
+    """
+    with HDF5Appender(filehandle, expanddim=expanddim, buffersize=1,
+                      growth=1) as appender:
+        appender.append(db)
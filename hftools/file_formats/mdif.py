@@ -16,6 +16,7 @@ MDIF
 
 """
 from __future__ import print_function
+import copy
 import re
 import itertools
 import time
@@ -30,7 +31,23 @@ from hftools.utils import glob
 from hftools.file_formats.common import Comments,\
     format_complex_header, format_elem
 from hftools.file_formats.readbase import ManyOptional,\
-    One, Token, ReadFileFormat, FileFormatError
+    One, Token, ReadFileFormat, FileFormatError, map_in_pool
+
+
+def read_single_mdif(task):
+    """Read one MDIF file, *task* is a tuple (obj, file_index, filename).
+
+    Returns dict of blocks with FILENAME set. Module level function so it
+    can be sent to a process pool.
+    """
+    obj, file_index, fname = task
+    obj.file_index = file_index
+    with open(fname) as fil:
+        res = obj.do_file(fil)
+    for v in res.values():
+        for block in (v if isinstance(v, list) else [v]):
+            block["FILENAME"] = hfarray(fname)
+    return res
 
 
 class MDIFError(FileFormatError):
@@ -46,63 +63,80 @@ def is_mdif(filename, rad):
 reg = re.compile("(.+)[(](integer|real|string|complex)[)]")
 
 
+def token_table(lines, ntokens):
+    u"""Split *lines* into an array of tokens with *ntokens* columns.
+    Extra tokens at the end of a line are ignored.
+    """
+    rows = [line.split() for line in lines]
+    lengths = set(len(row) for row in rows)
+    if lengths != set([ntokens]):
+        if min(lengths) < ntokens:
+            raise MDIFError("Data line has fewer than %d values" % ntokens)
+        rows = [row[:ntokens] for row in rows]
+    return np.array(rows).reshape(len(rows), ntokens)
+
+
+def convert_tokens(tokens, vtype):
+    u"""Convert array of *tokens* to array of *vtype* (real, integer or
+    string)
+    """
+    if vtype == "string":
+        return np.array([x.strip('"') for x in tokens.tolist()])
+    dtype = {"real": np.float64, "integer": np.int64}[vtype]
+    try:
+        return tokens.astype(dtype)
+    except ValueError:
+        return np.char.strip(tokens, '"').astype(dtype)
+
+
 class GetData(object):
+    u"""Decoder of the DATA section of an MDIF block.
+
+    The % *header* lines are compiled into a column plan, a list with one
+    entry (ntokens, [(varname, vtype, offset), ...]) for each header
+    line. Each record spans one data line per header line and the data is
+    converted one column at a time.
+    """
     def __init__(self, header):
         self.header = header
-        self.parse_stream = []
+        self.plan = []
         for headline in header:
-            self.parse_stream.append([])
+            columns = []
+            offset = 0
             for head in headline:
-                self.parse_stream[-1].append(self.parse_header(head))
+                vtype, varname = self.parse_header(head)
+                columns.append((varname, vtype, offset))
+                offset += dict(complex=2).get(vtype, 1)
+            self.plan.append((offset, columns))
 
     def sweep_name(self):
-        return self.parse_stream[0][0][1]
+        return self.plan[0][1][0][0]
 
     def parse_data(self, datastream):
+        nlines = len(self.plan)
+        if not datastream or len(datastream) % nlines:
+            msg = "%d data lines do not make up records of %d lines"
+            raise MDIFError(msg % (len(datastream), nlines))
         vardata = DataDict()
-        while True:
-            for lineparser in self.parse_stream:
-                linedata = datastream.pop(0).split()
-                for func, varname in lineparser:
-                    vardata.setdefault(varname, []).append(func(linedata))
-            if not datastream:
-                break
+        for idx, (ntokens, columns) in enumerate(self.plan):
+            tokens = token_table(datastream[idx::nlines], ntokens)
+            for varname, vtype, offset in columns:
+                if vtype == "complex":
+                    real = convert_tokens(tokens[:, offset], "real")
+                    imag = convert_tokens(tokens[:, offset + 1], "real")
+                    value = real + 1j * imag
+                else:
+                    value = convert_tokens(tokens[:, offset], vtype)
+                vardata[varname] = value
         return vardata
 
     def parse_header(self, head):
         res = reg.match(head)
         if res:
             var, vtype = res.groups()
-            typefunc = {"string": self.get_string,
-                        "complex": self.get_complex,
-                        "real": self.get_real,
-                        "integer": self.get_integer}[vtype]
         else:
             raise Exception("Unknown datatype in header %r" % head)
-        return typefunc, var
-
-    def get_string(self, stream):
-        d = stream.pop(0)
-        d = d.strip('"')
-        return d
-
-    def get_real(self, stream):
-        d = stream.pop(0)
-        d = d.strip('"')
-        d = float(d)
-        return d
-
-    def get_integer(self, stream):
-        d = stream.pop(0)
-        d = d.strip('"')
-        d = int(d)
-        return(d)
-
-    def get_complex(self, stream):
-        dr = self.get_real(stream)
-        di = self.get_real(stream)
-        d = dr + 1j * di
-        return d
+        return vtype, var
 
 
 class ReadMDIFFileFormat(ReadFileFormat):
@@ -116,8 +150,12 @@ class ReadMDIFFileFormat(ReadFileFormat):
     def read_file(cls, filename, make_complex=True, property_to_vars=True,
                   guess_unit=True, normalize=True, make_matrix=False,
                   merge=True, verbose=False, multiple_files=True,
-                  blockname=None, **kw):
+                  blockname=None, workers=None, executor=None, **kw):
+        """Read MDIF files matching *filename*.
 
+        *workers* and *executor* read several files in a pool, see
+        :meth:`ReadFileFormat.read_file`.
+        """
         if multiple_files:
             merge = False
         obj = cls(make_complex=make_complex, property_to_vars=property_to_vars,
@@ -129,18 +167,19 @@ class ReadMDIFFileFormat(ReadFileFormat):
             filenames = glob(filename)
         else:
             filenames = [filename]
+        tasks = [(copy.copy(obj), idx, fname)
+                 for idx, fname in enumerate(filenames)]
+        if workers is None and executor is None:
+            results = [read_single_mdif(task) for task in tasks]
+        else:
+            results = map_in_pool(read_single_mdif, tasks, workers, executor)
         objs = {}
-        for idx, fname in enumerate(filenames):
-            with open(fname) as fil:
-                res = obj.do_file(fil)
-                for k, v in res.items():
-                    if isinstance(v, list):
-                        for a in v:
-                            a["FILENAME"] = hfarray(fname)
-                        objs.setdefault(k, []).extend(v)
-                    else:
-                        v["FILENAME"] = hfarray(fname)
-                        objs.setdefault(k, []).append(v)
+        for res in results:
+            for k, v in res.items():
+                if isinstance(v, list):
+                    objs.setdefault(k, []).extend(v)
+                else:
+                    objs.setdefault(k, []).append(v)
 
         if multiple_files:
             res = {}
@@ -198,7 +237,10 @@ class ReadMDIFFileFormat(ReadFileFormat):
         containing a measurement data block.
         """
         while True:
-            comments = ManyOptional("COMMENT")(stream)
+            try:
+                comments = ManyOptional("COMMENT")(stream)
+            except StopIteration:
+                return
 
             def split_eq(rad):
                 return [x.strip() for x in rad.split("=")]
@@ -218,7 +260,7 @@ class ReadMDIFFileFormat(ReadFileFormat):
             #self.header = header = header[0]
             db.comments = Comments(comments)
             #data = numpy.array(data)
-            dd = self.proc_data(header, data[:])
+            dd = self.proc_data(header, data)
             for vname in dd:
                 db[vname] = dd[vname]
             for var in vars:
@@ -523,7 +565,8 @@ def save_mdif(db, filename):
 
 def read_mdif(filnamn, make_complex=True, property_to_vars=True,
               guess_unit=True, normalize=True, make_matrix=True,
-              merge=True, blockname=None, verbose=True, multiple_files=True):
+              merge=True, blockname=None, verbose=True, multiple_files=True,
+              workers=None, executor=None):
     return ReadMDIFFileFormat.read_file(filnamn, make_complex=make_complex,
                                         property_to_vars=property_to_vars,
                                         guess_unit=guess_unit,
@@ -532,7 +575,9 @@ def read_mdif(filnamn, make_complex=True, property_to_vars=True,
                                         merge=merge,
                                         blockname=blockname,
                                         verbose=verbose,
-                                        multiple_files=multiple_files)
+                                        multiple_files=multiple_files,
+                                        workers=workers,
+                                        executor=executor)
 
 
 if __name__ == "__main__":
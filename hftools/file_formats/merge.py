@@ -15,7 +15,10 @@ import numpy as np
 from hftools.core.exceptions import HFToolsHyperCubeError
 from hftools.dataset import DataDict, DimSweep, DimPartial, hfarray,\
     DataBlock, DimRep
+from hftools.dataset.interpolation import get_interpolator
 from hftools.file_formats.common import Comments
+from hftools.py3compat import string_types
+from hftools.utils import hypercube_index
 
 
 def merge_blocks_to_association_list(blocks):
@@ -37,69 +40,78 @@ def merge_blocks_to_association_list(blocks):
     return data
 
 
-def association_list_in_hypercube_order(association_list):
+def association_list_cells(association_list):
+    """Return (names, axes, cells) for *association_list*, where *cells*
+    is the flat index of each entry in the hypercube spanned by the sorted
+    index values in *axes*.
+    """
     names = [x[0] for x in association_list[0][0]]
-    indices = [tuple(y[1] for y in x[0]) for x in association_list]
-    uniq = [set(x) for x in zip(*indices)]
-    p = set(itertools.product(*map(sorted, uniq)))
-
-    if len(p) != len(association_list):
-        msg = ("Could not make a hypercube of blocks with DimPartials.\n"
-               " Indices %r are incomplete, there are %s elements but "
-               "there should be %s" % (names, len(association_list), len(p)))
-        raise HFToolsHyperCubeError(msg)
-
-    out = []
-
-    for i, int_i in zip(itertools.product(*[sorted(x) for x in uniq]),
-                        itertools.product(*[range(len(x)) for x in uniq])):
-        idx = indices.index(i)
-        out.append((int_i, association_list[idx][1]))
-    return names, map(sorted, uniq), out
-
+    if not names:
+        if len(association_list) != 1:
+            msg = ("Could not make a hypercube of %s blocks without "
+                   "DimPartials" % len(association_list))
+            raise HFToolsHyperCubeError(msg)
+        return names, [], np.zeros(1, dtype=int)
+    columns = zip(*[[y[1] for y in x[0]] for x in association_list])
+    axes, cells = hypercube_index(list(columns), names)
+    return names, axes, cells
 
-def merge_variable(association_list):
-    names, indices, association_list =\
-        association_list_in_hypercube_order(association_list)
-    innershape = tuple(len(x) for x in indices)
-
-    innerdims = tuple(DimRep(name, i) for name, i in zip(names, indices))
 
+def association_list_in_hypercube_order(association_list):
+    names, axes, cells = association_list_cells(association_list)
+    shape = tuple(len(x) for x in axes)
+    order = np.empty_like(cells)
+    order[cells] = np.arange(len(cells))
+    out = [(np.unravel_index(cell, shape), association_list[idx][1])
+           for cell, idx in enumerate(order)]
+    return names, [x.tolist() for x in axes], out
+
+
+def merge_variable(association_list, cache=None):
+    """Merge values in *association_list* into one hfarray with a DimRep
+    for each index. *cache* is an optional dict used to share the
+    hypercube index between variables with the same coordinates.
+    """
     if len(association_list) == 1:
-        #pdb.set_trace()
         return association_list[0][1], {}, None
-    basedims = association_list[0][1].dims
-    prototype = association_list[0][1]
-
+    coords = tuple(x[0] for x in association_list)
+    if cache is None or coords not in cache:
+        index = association_list_cells(association_list)
+        if cache is not None:
+            cache[coords] = index
+    else:
+        index = cache[coords]
+    names, axes, cells = index
+    innershape = tuple(len(x) for x in axes)
+    innerdims = tuple(DimRep(name, x.tolist())
+                      for name, x in zip(names, axes))
+
+    values = [x[1] for x in association_list]
+    prototype = values[0]
+    basedims = prototype.dims
     if prototype.dtype.type in (np.unicode_, np.str_):
-        length = max(int(x[1].dtype.str[2:]) for x in association_list)
+        length = max(int(x.dtype.str[2:]) for x in values)
         proto_dtype = np.dtype((prototype.dtype.type, length))
     else:
         proto_dtype = prototype.dtype
     newshape = prototype.shape[:1] + innershape + prototype.shape[1:]
     result = empty(newshape, dtype=proto_dtype)
-    unit = []
-
-    for idx, x in association_list:
-        unit.append(getattr(x, "unit", None))
-        if prototype.ndim:
-            result[(slice(None, None, None),) + idx] = x
-        else:
-            if x.ndim == 0:
-                result[idx] = x.flatten()[0]
-            else:
-                result[idx] = x
-    if len(set(unit)) == 1:
+    if prototype.ndim:
+        lead = (slice(None),)
+    else:
+        lead = ()
+    for idx, x in zip(zip(*np.unravel_index(cells, innershape)), values):
+        result[lead + idx] = np.asarray(x)
+
+    unit = set(getattr(x, "unit", None) for x in values)
+    if len(unit) == 1:
         unit = unit.pop()
     else:
         unit = None
     v = hfarray(result,
                 dims=basedims[:1] + innerdims + basedims[1:],
                 unit=unit)
-    if len(association_list[0][0]) == 0:
-        indexvars = {}
-    else:
-        indexvars = dict((x.name, hfarray(x)) for x in innerdims)
+    indexvars = dict((x.name, hfarray(x)) for x in innerdims)
     return v, indexvars, innerdims
 
 
@@ -114,12 +126,9 @@ def merge_blocks_do_hyper(blocks):
             if vname not in ivars:
                 ivars[vname] = v
 
-    free_vars = set()
+    cache = {}
     for vname, assoc in data.items():
-        free_vars.add(zip(*assoc)[0])
-    free_vars = list(free_vars)
-    for vname, assoc in data.items():
-        v, indexvars, dim = merge_variable(assoc)
+        v, indexvars, dim = merge_variable(assoc, cache)
         outdata[vname] = v
         for iname, value in indexvars.items():
             outdata.ivardata[iname] = value.dims[0]
@@ -155,7 +164,82 @@ def get_partials(db):
     return partials
 
 
-def merge_blocks(blocks, hyper=False, indexed=False):
+def regrid_target(grids, regrid="union"):
+    """Return the target grid for *grids* (sequence of 1d arrays).
+
+    *regrid* is "union" for all points of all grids, "intersection" for the
+    points of the union that are inside the range of every grid, or the
+    target grid itself.
+    """
+    if isinstance(regrid, string_types):
+        union = np.unique(np.concatenate([np.asarray(x) for x in grids]))
+        if regrid == "union":
+            return union
+        elif regrid == "intersection":
+            low = max(np.min(x) for x in grids)
+            high = min(np.max(x) for x in grids)
+            target = union[(union >= low) & (union <= high)]
+            if not len(target):
+                raise ValueError("Grids do not overlap")
+            return target
+        raise ValueError("Unknown regrid mode %r" % (regrid,))
+    return np.asarray(regrid)
+
+
+def regrid_blocks(blocks, regrid="union", dim="freq"):
+    """Resample the *dim* sweep of all *blocks* onto a common grid, see
+    :func:`regrid_target`.
+
+    The variables are interpolated linearly by a cached
+    :class:`Interpolator` that is shared by all blocks with the same
+    source grid. Points outside the range of a block are nan.
+    """
+    grids = [np.asarray(b.ivardata[dim].data) for b in blocks
+             if dim in b.ivardata]
+    if not grids:
+        return blocks
+    target = regrid_target(grids, regrid)
+    out = []
+    for b in blocks:
+        if dim not in b.ivardata:
+            out.append(b)
+            continue
+        olddim = b.ivardata[dim]
+        oldx = np.asarray(olddim.data)
+        if oldx.shape == target.shape and (oldx == target).all():
+            out.append(b)
+            continue
+        interpolator = get_interpolator(oldx, target, "linear",
+                                        bounds_error=False)
+        newdim = olddim.__class__(olddim.name, target, unit=olddim.unit,
+                                  outputformat=olddim.outputformat)
+        db = DataBlock()
+        db.blockname = b.blockname
+        db.comments = b.comments
+        for k, v in b.ivardata.items():
+            db.ivardata[k] = newdim if k == dim else v
+        for k, v in b.vardata.items():
+            if olddim not in v.dims:
+                db[k] = v
+                continue
+            axis = v.dims_index(dim)
+            dims = v.dims[:axis] + (newdim,) + v.dims[axis + 1:]
+            db[k] = hfarray(interpolator(v, axis), dims=dims, unit=v.unit,
+                            outputformat=v.outputformat)
+        out.append(db)
+    return out
+
+
+def merge_blocks(blocks, hyper=False, indexed=False, regrid=None,
+                 regrid_dim="freq"):
+    """Merge *blocks* into one DataBlock.
+
+    If *regrid* is given the *regrid_dim* sweeps of the blocks are first
+    resampled onto a common grid by :func:`regrid_blocks`, so blocks
+    measured on different frequency grids can be merged.
+    """
+    if regrid is not None:
+        blocks = regrid_blocks(blocks, regrid, regrid_dim)
     db = DataBlock()
     dimpartialgroups = OrderedDict()
 
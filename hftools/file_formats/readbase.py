@@ -7,8 +7,11 @@
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
 from __future__ import print_function
+import copy
 import io
 import itertools
+import multiprocessing
+import multiprocessing.pool
 import re
 
 from itertools import chain
@@ -242,11 +245,55 @@ def _matrix_elements(elem_tuples):
         return elems, sorted(i_idx), sorted(j_idx)
 
 
+def read_single_file(task):
+    """Read one file using the ReadFileFormat object in *task*.
+
+    *task* is a tuple (obj, file_index, filename, encoding, multiple_files).
+    Module level function so it can be sent to a process pool.
+    """
+    obj, file_index, fname, encoding, multiple_files = task
+    obj.file_index = file_index
+    with io.open(fname, encoding=encoding) as fil:
+        res = obj.do_file(fil)
+    if multiple_files:
+        fname = py3.cast_unicode(fname)
+        if "FILENAME" not in res:
+            res["FILENAME"] = hfarray(fname)
+    return res
+
+
+def map_in_pool(func, tasks, workers=None, executor=None):
+    """Return list of func(task) for *tasks* computed in a pool.
+
+    *executor* is "process", "thread", or an object with a map method. If
+    *executor* is None a process pool is used. *workers* is the size of the
+    pool, None means the number of cpus.
+    """
+    if hasattr(executor, "map"):
+        return list(executor.map(func, tasks))
+    if executor in (None, "process"):
+        pool = multiprocessing.Pool(workers)
+    elif executor == "thread":
+        pool = multiprocessing.pool.ThreadPool(workers)
+    else:
+        raise ValueError("Unknown executor %r, should be 'process' or "
+                         "'thread'" % (executor,))
+    try:
+        return pool.map(func, tasks)
+    finally:
+        pool.close()
+        pool.join()
+
+
 class ReadFileFormat(object):
     def __init__(self, make_complex=True, property_to_vars=True,
                  guess_unit=True, normalize=True, make_matrix=True,
-                 merge=True, verbose=False, hyper=False, **kw):
+                 merge=True, verbose=False, hyper=False, regrid=None,
+                 **kw):
         """class to handle file reading of a datafile
+
+        *regrid* is passed to :func:`merge_blocks` to merge blocks with
+        different frequency grids.
         """
 
         self.make_complex = make_complex
@@ -258,6 +305,7 @@ class ReadFileFormat(object):
         self.verbose = verbose
         self.file_index = 0
         self.hyper = hyper
+        self.regrid = regrid
         for name in kw:
             if not hasattr(self, name):
                 setattr(self, name, kw[name])
@@ -266,7 +314,17 @@ class ReadFileFormat(object):
     def read_file(cls, filename, make_complex=True, property_to_vars=True,
                   guess_unit=True, normalize=True, make_matrix=False,
                   merge=True, verbose=False, multiple_files=True,
-                  hyper=False, encoding="cp1252", **kw):
+                  hyper=False, encoding="cp1252", workers=None,
+                  executor=None, **kw):
+        """Read files matching *filename*.
+
+        The files are read one at a time unless *workers* or *executor* is
+        given. *executor* is either "process" (default when only *workers*
+        is given) or "thread" to use a pool of *workers* processes or
+        threads, or an object with a map method e.g. a
+        multiprocessing.Pool. The blocks are merged in the same order, and
+        get the same FILEINDEX and FILENAME, as when reading serially.
+        """
         obj = cls(make_complex=make_complex, property_to_vars=property_to_vars,
                   guess_unit=guess_unit, normalize=normalize,
                   make_matrix=make_matrix, merge=merge, verbose=verbose,
@@ -282,20 +340,19 @@ class ReadFileFormat(object):
         else:
             filenames = [filename]
         filenames = [path(f) for f in filenames]
-        objs = []
         if not filenames:
             raise IOError("Pattern %r did not match any files" % filename)
-        for idx, fname in enumerate(filenames):
-            if verbose:
-                print("\r%-80s\r" % fname.basename(), end="")
-            with io.open(fname, encoding=encoding) as fil:
-                res = obj.do_file(fil)
-                if multiple_files:
-                    #res["FILEINDEX"] = DimPartial("FILEINDEX", [idx])
-                    fname = py3.cast_unicode(fname)
-                    if "FILENAME" not in res:
-                        res["FILENAME"] = hfarray(fname)
-                objs.append(res)
+        if workers is None and executor is None:
+            objs = []
+            for idx, fname in enumerate(filenames):
+                if verbose:
+                    print("\r%-80s\r" % fname.basename(), end="")
+                objs.append(read_single_file((obj, idx, fname, encoding,
+                                              multiple_files)))
+        else:
+            tasks = [(copy.copy(obj), idx, fname, encoding, multiple_files)
+                     for idx, fname in enumerate(filenames)]
+            objs = map_in_pool(read_single_file, tasks, workers, executor)
         if multiple_files:
             res = obj._merge(objs)
         else:
@@ -304,23 +361,67 @@ class ReadFileFormat(object):
             print("\r%80s\r" % "")
         return res
 
-    def do_file(self, stream):
+    @classmethod
+    def iter_file(cls, filename, make_complex=True, property_to_vars=True,
+                  guess_unit=True, normalize=True, make_matrix=False,
+                  multiple_files=True, encoding="cp1252", **kw):
+        """Generator yielding one DataBlock per block in the files matching
+        *filename*.
+
+        Only one block at a time is kept in memory, the blocks are not
+        merged. Blocks get FILEINDEX, and FILENAME if *multiple_files* is
+        True, as when reading with read_file.
+        """
+        obj = cls(make_complex=make_complex, property_to_vars=property_to_vars,
+                  guess_unit=guess_unit, normalize=normalize,
+                  make_matrix=make_matrix, merge=False, **kw)
+        obj.filename = filename
+        if multiple_files:
+            if isinstance(filename, (list, tuple)):
+                filenames = []
+                for f in filename:
+                    filenames.extend(glob(f))
+            else:
+                filenames = glob(filename)
+        else:
+            filenames = [filename]
+        filenames = [path(f) for f in filenames]
+        if not filenames:
+            raise IOError("Pattern %r did not match any files" % filename)
+        for idx, fname in enumerate(filenames):
+            with io.open(fname, encoding=encoding) as fil:
+                for block in obj.iter_blocks(fil):
+                    if "FILEINDEX" not in block:
+                        block["FILEINDEX"] = DimPartial("FILEINDEX", [idx])
+                    if multiple_files and "FILENAME" not in block:
+                        block["FILENAME"] = hfarray(py3.cast_unicode(fname))
+                    yield block
+
+    def iter_blocks(self, stream):
+        """Generator yielding the blocks of *stream* one at a time, each
+        processed (make_complex, properties, units, names and matrices)
+        but not merged.
+        """
         tokenstream = Stream(self.tokenize(stream))
         stream_of_block_tokens = self.group_blocks(tokenstream)
-        blocks = list(self.parse_blocks(stream_of_block_tokens))
-        if not blocks:
+        empty = True
+        for block in self.parse_blocks(stream_of_block_tokens):
+            empty = False
+            blocks = self._make_complex([block])
+            blocks = self._properties_to_vars(blocks)
+            blocks = self._guess_unit(blocks)
+            blocks = self._normalize(blocks)
+            blocks = self._combine_matrices(blocks)
+            for b in blocks:
+                yield b
+        if empty:
             args = "No blocks found in file. Perhaps file is empty"\
                    " or of the wrong kind. (Tried to parse %s)"
             msg = args % (self.__class__.__name__)
             raise ParseError(msg)
-        blocks = self._make_complex(blocks)
-        blocks = self._properties_to_vars(blocks)
-        blocks = self._guess_unit(blocks)
-        blocks = self._normalize(blocks)
-        blocks = self._combine_matrices(blocks)
-        #import pdb;pdb.set_trace()
-        blocks = self._merge(blocks)
-        #import pdb;pdb.set_trace()
+
+    def do_file(self, stream):
+        blocks = self._merge(list(self.iter_blocks(stream)))
         if isinstance(blocks, DataBlock):
             if "FILEINDEX" not in blocks:
                 blocks["FILEINDEX"] = DimPartial("FILEINDEX",
@@ -396,7 +497,8 @@ class ReadFileFormat(object):
             if len(blocks) == 1:
                 return blocks[0]
             else:
-                return merge_blocks(blocks, hyper=self.hyper)
+                return merge_blocks(blocks, hyper=self.hyper,
+                                    regrid=self.regrid)
         else:
             return blocks
 
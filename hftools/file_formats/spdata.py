@@ -12,6 +12,7 @@ SP-Data
 =======
 
     .. autofunction:: read_spdata
+    .. autofunction:: iter_spdata
     .. autofunction:: save_spdata
     .. autofunction:: normalize_names
 
@@ -50,7 +51,65 @@ def match_numunit(x):
 reg_header = re.compile("^[A-Za-z_]")
 
 
+def columns_from_rows(rows, ncols, typed=True, sample=10):
+    """Convert list of data lines *rows* with tab separated values to a list
+    of *ncols* arrays, one for each column.
+
+    The lines are joined and split once into a (nrows, ncols) object
+    array that refers to the split strings. If *typed* is True the type (int, float or other) of each
+    column is guessed from the first *sample* rows and the column strings
+    are parsed straight into a preallocated array of that type. Columns of
+    other types, and columns where this fails, are converted value by value
+    using to_numeric.
+    """
+    if not len(rows):
+        return [np.array([]) for idx in range(ncols)]
+    if any(row.count("\t") != ncols - 1 for row in rows):
+        msg = "Different number of header variables "\
+              "from data columns"
+        raise SPDataIOError(msg)
+    table = np.array("\t".join(rows).split("\t"), dtype=object)
+    table = table.reshape(len(rows), ncols)
+    return [convert_column(table[:, idx], typed, sample)
+            for idx in range(ncols)]
+
+
+def guess_column_type(values):
+    """Return int, float or None depending on which type all strings in
+    *values* can be converted to.
+    """
+    for typ in (int, float):
+        try:
+            for x in values:
+                typ(x)
+        except ValueError:
+            continue
+        return typ
+    return None
+
+
+def convert_column(column, typed=True, sample=10):
+    """Convert sequence of strings *column* to array of numbers, dates
+    or strings. See :func:`columns_from_rows`.
+    """
+    if typed and len(column):
+        typ = guess_column_type(column[:sample])
+        dtypes = {int: [np.int64, np.float64], float: [np.float64]}
+        for dtype in dtypes.get(typ, []):
+            out = np.empty(len(column), dtype=dtype)
+            try:
+                out[...] = column
+            except (ValueError, OverflowError):
+                continue
+            return out
+    return np.array([to_numeric(x, False) for x in column])
+
+
 class ReadSPFileFormat(ReadFileFormat):
+    def __init__(self, typed_columns=True, **kw):
+        ReadFileFormat.__init__(self, **kw)
+        self.typed_columns = typed_columns
+
     def tokenize(self, stream):
         """Split stream of lines in sp-data format into
         stream of tagged lines.
@@ -104,7 +163,7 @@ class ReadSPFileFormat(ReadFileFormat):
             else:
                 raise SPDataIOError("Missing header")
             while running and (token == "Data"):
-                data.append([to_numeric(x, False) for x in rad.split("\t")])
+                data.append(rad)
                 try:
                     token, lineno, rad = next(stream)
                 except StopIteration:
@@ -116,14 +175,11 @@ class ReadSPFileFormat(ReadFileFormat):
             db = DataBlock()
             db.comments = Comments(comments)
             header = [x.strip() for x in header[0].strip().split("\t")]
-            Nhead = len(header)
-            #data = np.array(data)
-            if Nhead != len(data[0]):
-                msg = "Different number of header variables "\
-                      "from data columns"
-                raise SPDataIOError(msg)
             output = DataDict()
-            for varname, column in zip(header, zip(*data)):
+            columns = columns_from_rows(data, len(header),
+                                        typed=self.typed_columns)
+            del data
+            for varname, column in zip(header, columns):
                 output.setdefault(varname.strip(), []).append(column)
             for varname in output:
                 data = output[varname]
@@ -193,7 +249,14 @@ def save_spdata(db, filename, encoding="cp1252"):
 
 def read_spdata(filnamn, make_complex=True, property_to_vars=True,
                 guess_unit=True, normalize=True, make_matrix=True,
-                merge=True, hyper=False, verbose=False, encoding="cp1252"):
+                merge=True, hyper=False, verbose=False, encoding="cp1252",
+                workers=None, executor=None, typed_columns=True):
+    """Read sp-data file(s) *filnamn*.
+
+    If *typed_columns* is True the data columns are converted to int or
+    float arrays in bulk after guessing their type from the first rows,
+    otherwise each value is converted separately.
+    """
     return ReadSPFileFormat.read_file(filnamn, make_complex=make_complex,
                                       property_to_vars=property_to_vars,
                                       guess_unit=guess_unit,
@@ -202,7 +265,28 @@ def read_spdata(filnamn, make_complex=True, property_to_vars=True,
                                       merge=merge,
                                       verbose=verbose,
                                       hyper=hyper,
-                                      encoding=encoding)
+                                      encoding=encoding,
+                                      workers=workers,
+                                      executor=executor,
+                                      typed_columns=typed_columns)
+
+
+def iter_spdata(filnamn, make_complex=True, property_to_vars=True,
+                guess_unit=True, normalize=True, make_matrix=True,
+                encoding="cp1252", typed_columns=True):
+    """Generator yielding one DataBlock for each block in the sp-data
+    file(s) *filnamn*.
+
+    Unlike :func:`read_spdata` the blocks are not merged, so only one
+    block at a time is held in memory.
+    """
+    return ReadSPFileFormat.iter_file(filnamn, make_complex=make_complex,
+                                      property_to_vars=property_to_vars,
+                                      guess_unit=guess_unit,
+                                      normalize=normalize,
+                                      make_matrix=make_matrix,
+                                      encoding=encoding,
+                                      typed_columns=typed_columns)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+import os
+
+import hftools.file_formats
+from hftools import path
+from hftools.testing import TestCase
+from hftools.file_formats.cache import ReadCache
+
+testpath = path(__file__).dirname()
+savepath = testpath / "testdata/cache/savetest"
+
+
+class TestReadCache(TestCase):
+    def setUp(self):
+        if savepath.exists():  # pragma: no cover
+            savepath.rmtree()
+        savepath.makedirs()
+        for name in ["sp_oneport_1_1.txt", "sp_oneport_2_1.txt"]:
+            (testpath / "testdata/sp-data" / name).copy(savepath / name)
+        self.cache = ReadCache(savepath / "_hfcache")
+        self.pattern = savepath / "sp_oneport_*_1.txt"
+
+    def tearDown(self):
+        savepath.rmtree()
+        (testpath / "testdata/cache").removedirs()
+
+    def read(self, **kw):
+        return hftools.file_formats.read_data(self.pattern, cache=self.cache,
+                                              verbose=False, **kw)
+
+    def test_same_as_read_data(self):
+        facit = hftools.file_formats.read_data(self.pattern, verbose=False)
+        for _ in range(2):
+            d = self.read()
+            self.assertEqual(sorted(d.allvarnames), sorted(facit.allvarnames))
+            self.assertAllclose(d.FILEINDEX, facit.FILEINDEX)
+            self.assertEqual(list(d.FILENAME), list(facit.FILENAME))
+            self.assertAllclose(d.a11, facit.a11)
+            self.assertEqual(len(self.cache.entries()), 2)
+
+    def test_hit(self):
+        self.read()
+        calls = []
+
+        def readfun(fname, **kw):  # pragma: no cover
+            calls.append(fname)
+        self.cache.read(self.pattern, readfun, merge=True, guess_unit=True,
+                        property_to_vars=True, verbose=False)
+        self.assertEqual(calls, [])
+
+    def test_changed_file(self):
+        self.read()
+        fname = savepath / "sp_oneport_1_1.txt"
+        with open(fname, "ab") as fil:
+            fil.write(b"\n")
+        calls = []
+
+        def readfun(fname, **kw):
+            calls.append(fname)
+            return hftools.file_formats.read_data(fname, **kw)
+        self.cache.read(self.pattern, readfun, merge=True, guess_unit=True,
+                        property_to_vars=True, verbose=False)
+        self.assertEqual(calls, [fname])
+
+    def test_options(self):
+        self.read()
+        self.read(guess_unit=False)
+        self.assertEqual(len(self.cache.entries()), 4)
+
+    def test_invalidate(self):
+        self.read()
+        self.cache.invalidate(savepath / "sp_oneport_2_1.txt")
+        self.assertEqual(len(self.cache.entries()), 1)
+        self.cache.clear()
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_evict(self):
+        self.read()
+        entries = sorted(self.cache.entries())
+        os.utime(entries[0], (1, 1))
+        self.cache.maxsize = self.cache.size() - 1
+        self.cache.evict()
+        self.assertEqual(self.cache.entries(), entries[1:])
+
+    def test_hash(self):
+        cache = ReadCache(savepath / "_hfcache", use_hash=True)
+        key = cache.key(savepath / "sp_oneport_1_1.txt")
+        self.assertEqual(len(key[3]), 40)
+        self.assertIsNone(self.cache.key(savepath / "sp_oneport_1_1.txt")[3])
+
+    def test_cachedir(self):
+        d = hftools.file_formats.read_data(self.pattern,
+                                           cache=savepath / "other",
+                                           verbose=False)
+        self.assertAllclose(d.FILEINDEX, [0, 1])
+        self.assertEqual(len(ReadCache(savepath / "other").entries()), 2)
+
+    def test_mdif(self):
+        for name in ["a.mdif", "b.mdif"]:
+            (testpath / "testdata/mdif/small.mdif").copy(savepath / name)
+        fname = savepath / "a.mdif"
+        facit = hftools.file_formats.read_data(fname, verbose=False)
+        for _ in range(2):
+            d = hftools.file_formats.read_data(fname, cache=self.cache,
+                                               verbose=False)
+            self.assertEqual(sorted(d.keys()), sorted(facit.keys()))
+            for k in facit:
+                self.assertEqual(d[k].FILEINDEX.dims, facit[k].FILEINDEX.dims)
+                self.assertEqual(list(d[k].FILENAME.flat),
+                                 list(facit[k].FILENAME.flat))
+        d = hftools.file_formats.read_data(savepath / "*.mdif",
+                                           cache=self.cache, merge=False,
+                                           verbose=False)
+        for k in facit:
+            for idx, name in enumerate(["a.mdif", "b.mdif"]):
+                self.assertEqual(set(d[k][idx].FILEINDEX.flat), set([idx]))
+                self.assertEqual(set(d[k][idx].FILENAME.flat),
+                                 set([str(savepath / name)]))
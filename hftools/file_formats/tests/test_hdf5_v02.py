@@ -15,11 +15,12 @@ import hftools.file_formats.hdf5 as hdf5
 from hftools import path
 from hftools.testing import TestCase
 import hftools.file_formats.tests.base_test as base_test
-from hftools.dataset import DataBlock, hfarray, DimSweep, DimRep
+from hftools.dataset import DataBlock, hfarray, DimSweep, DimRep,\
+    DimMatrix_i, DimMatrix_j
 from hftools.file_formats.common import Comments
 
 from hftools.file_formats.hdf5.v_01 import save_hdf5 as save_hdf5_v01
-from hftools.file_formats.hdf5.v_02 import append_hdf5
+from hftools.file_formats.hdf5.v_02 import append_hdf5, HDF5Appender
 from hftools.file_formats.hdf5.helper import hdf5context
 testpath = path(__file__).dirname()
 
@@ -70,6 +71,67 @@ class Test_hdf5_specific(TestCase):
         fname.unlink()
 
 
+class Test_hdf5_lazy(TestCase):
+    def setUp(self):
+        fname = testpath / "testdata/hdf5/v02/test1.hdf5"
+        self.facit = readfun(fname)
+        self.d = readfun(fname, lazy=True)
+
+    def test_proxy(self):
+        self.assertIsInstance(self.d.vardata["S"], v_02.LazyHDF5Array)
+        self.assertEqual(self.d.S.dims, self.facit.S.dims)
+        self.assertEqual(self.d.S.shape, self.facit.S.shape)
+        self.assertEqual(self.d.S.dtype, self.facit.S.dtype)
+
+    def test_materialize(self):
+        S = self.d.S.materialize()
+        self.assertIsInstance(S, hfarray)
+        self.assertEqual(S.dims, self.facit.S.dims)
+        self.assertAllclose(S, self.facit.S)
+        self.assertAllclose(np.asarray(self.d.S), self.facit.S)
+
+    def test_hyperslab(self):
+        for idx in [(Ellipsis, 0, 0), 1, (1, 1, 0), (-1, 0, 0),
+                    slice(None, None, 2), (slice(1, 3), Ellipsis, 1)]:
+            res = self.d.S[idx]
+            facit = self.facit.S[idx]
+            self.assertAllclose(res, facit)
+            if isinstance(facit, hfarray):
+                self.assertEqual(res.dims, facit.dims)
+
+    def test_fallback(self):
+        idx = (slice(None, None, -1), Ellipsis)
+        self.assertAllclose(self.d.S[idx], self.facit.S[idx])
+
+    def test_arithmetic(self):
+        for res in [self.d.S * 2, 2 * self.d.S, self.d.S + self.facit.S,
+                    self.facit.S + self.d.S]:
+            self.assertIsInstance(res, hfarray)
+            self.assertEqual(res.dims, self.facit.S.dims)
+            self.assertAllclose(res, self.facit.S * 2)
+        self.assertAllclose(-self.d.S, -self.facit.S)
+
+    def test_filter(self):
+        res = self.d.filter(self.d.freq > 1e9)
+        facit = self.facit.filter(self.facit.freq > 1e9)
+        self.assertEqual(res.S.dims, facit.S.dims)
+        self.assertAllclose(res.S, facit.S)
+
+    def test_dims_index(self):
+        self.assertEqual(self.d.S.dims_index("freq"), 0)
+        self.assertRaises(IndexError, self.d.S.dims_index, "unknown")
+
+    def test_main(self):
+        fname = testpath / "testdata/hdf5/v02/test1.hdf5"
+        d = hdf5.read_hdf5(fname, lazy=True)
+        self.assertIsInstance(d.vardata["S"], v_02.LazyHDF5Array)
+
+    def test_v01(self):
+        fname = testpath / "testdata/hdf5/v01/test1.hdf5"
+        d = hdf5.read_hdf5(fname, lazy=True)
+        self.assertIsInstance(d.vardata["S"], hfarray)
+
+
 class Test_read_hdf5_handle(TestCase):
     def test1(self):
         self.assertRaises(IOError, v_02.read_hdf5_handle, "unknown.hdf5")
@@ -244,6 +306,87 @@ class Test_hdf5_data_save(TestCase):
         fname.unlink()
 
 
+class Test_hdf5_layout(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        p = path(testpath / "testdata/hdf5/v02/savetest")
+        if not p.exists():  # pragma: no cover
+            p.makedirs()
+
+    @classmethod
+    def tearDownClass(cls):
+        p = path(testpath / "testdata/hdf5/v02/savetest")
+        p.removedirs()
+
+    def setUp(self):
+        self.d = DataBlock()
+        dims = (DimSweep("Vgs", 5), DimSweep("freq", 11),
+                DimMatrix_i("i", 2), DimMatrix_j("j", 2))
+        S = np.arange(220.).reshape((5, 11, 2, 2)) * (1 + 1j)
+        self.d.S = hfarray(S, dims=dims)
+        self.d.c = hfarray(3)
+        self.fname = testpath / "testdata/hdf5/v02/savetest/layout.hdf5"
+
+    def tearDown(self):
+        self.fname.unlink()
+
+    def save_and_check(self, **kw):
+        savefun(self.d, self.fname, **kw)
+        d2 = readfun(self.fname)
+        self.assertAllclose(d2.S, self.d.S)
+        self.assertEqual(d2.S.dims, self.d.S.dims)
+        self.assertEqual(d2.c, 3)
+        with h5py.File(self.fname, "r") as fil:
+            return fil["S"].chunks, fil["S"].compression, fil["S"].shuffle
+
+    def test_default(self):
+        self.assertEqual(self.save_and_check(), (None, None, False))
+
+    def test_auto(self):
+        res = self.save_and_check(chunks="auto")
+        self.assertEqual(res, ((5, 11, 2, 2), None, False))
+
+    def test_gzip_shuffle(self):
+        res = self.save_and_check(compression="gzip", compression_opts=4,
+                                  shuffle=True)
+        self.assertEqual(res, ((5, 11, 2, 2), "gzip", True))
+
+    def test_per_variable(self):
+        res = self.save_and_check(chunks=dict(S=(1, 11, 2, 2)),
+                                  compression="lzf")
+        self.assertEqual(res, ((1, 11, 2, 2), "lzf", False))
+
+    def test_lz4(self):
+        if v_02.hdf5plugin is None:
+            self.assertRaises(ValueError, savefun, self.d, self.fname,
+                              compression="lz4")
+            self.fname.touch()
+        else:  # pragma: no cover
+            self.save_and_check(compression="lz4")
+
+
+class Test_auto_chunks(TestCase):
+    def test_sweep(self):
+        dims = (DimSweep("Vgs", 50), DimSweep("freq", 201),
+                DimMatrix_i("i", 2), DimMatrix_j("j", 2))
+        S = hfarray(np.zeros((50, 201, 2, 2), dtype=complex), dims=dims)
+        self.assertEqual(v_02.auto_chunks(S), (20, 201, 2, 2))
+
+    def test_large_sweep(self):
+        dims = (DimSweep("Vgs", 2), DimSweep("freq", 200000))
+        S = hfarray(np.zeros((2, 200000)), dims=dims)
+        self.assertEqual(v_02.auto_chunks(S), (1, 100000))
+
+    def test_expandable(self):
+        dims = (DimSweep("freq", 201), DimRep("INDEX", 1),
+                DimMatrix_i("i", 2), DimMatrix_j("j", 2))
+        S = hfarray(np.zeros((201, 1, 2, 2), dtype=complex), dims=dims)
+        self.assertEqual(v_02.auto_chunks(S, 1), (201, 20, 2, 2))
+
+    def test_scalar(self):
+        self.assertIsNone(v_02.auto_chunks(hfarray(1)))
+
+
 class Test_hdf5_main_data_save(Test_hdf5_data_save):
     savefun = [lambda d, x: hdf5.save_hdf5(d, x, version="0.2")]
 
@@ -320,6 +463,104 @@ class Test_hdf5_data_expandable(TestCase):
 
 
 
+    def test_index(self):
+        i1 = DimSweep("a", 1)
+        d1 = DataBlock()
+        d1.b = hfarray([2], dims=(i1,))
+        fname = testpath / "testdata/hdf5/v02/savetest/res_1.hdf5"
+        with hdf5context(fname, mode="w") as fil:
+            savefun(d1, fil, expandable=True)
+            append_hdf5(d1, fil)
+            append_hdf5(d1, fil)
+        d = readfun(fname)
+        self.assertAllclose(d.INDEX, [0, 1, 2])
+        fname.unlink()
+
+    def test_appender(self):
+        i1 = DimSweep("a", 2)
+        d1 = DataBlock()
+        d1.b = hfarray([0, 0], dims=(i1,))
+        d1.c = hfarray(0)
+        fname = testpath / "testdata/hdf5/v02/savetest/res_1.hdf5"
+        with hdf5context(fname, mode="w") as fil:
+            savefun(d1, fil, expandable=True)
+            with HDF5Appender(fil, buffersize=3) as appender:
+                for idx in range(1, 11):
+                    d2 = DataBlock()
+                    d2.b = hfarray([idx, 10 * idx], dims=(i1,))
+                    d2.c = hfarray(idx)
+                    appender.append(d2)
+                    self.assertEqual(len(appender.buffer), idx % 3)
+                self.assertEqual(fil["b"].shape, (2, 16))
+            self.assertEqual(fil["b"].shape, (2, 11))
+        d = readfun(fname)
+        self.assertAllclose(d.INDEX, range(11))
+        self.assertAllclose(d.c, range(11))
+        self.assertAllclose(d.b, [range(11), range(0, 110, 10)])
+        fname.unlink()
+
+    def test_appender_error(self):
+        i1 = DimSweep("a", 2)
+        d1 = DataBlock()
+        d1.b = hfarray([0, 0], dims=(i1,))
+        d1.c = hfarray(0)
+        fname = testpath / "testdata/hdf5/v02/savetest/res_1.hdf5"
+
+        def append(fil):
+            with HDF5Appender(fil, buffersize=2) as appender:
+                for idx in range(1, 5):
+                    d2 = DataBlock()
+                    d2.b = hfarray([idx] * (2 if idx < 4 else 3),
+                                   dims=(DimSweep("a", 2 if idx < 4 else 3),))
+                    d2.c = hfarray(idx)
+                    appender.append(d2)
+
+        with hdf5context(fname, mode="w") as fil:
+            savefun(d1, fil, expandable=True)
+            self.assertRaises(ValueError, append, fil)
+            self.assertEqual(fil["b"].shape, (2, 3))
+            self.assertEqual(fil["c"].shape, (3,))
+        d = readfun(fname)
+        self.assertAllclose(d.c, range(3))
+        fname.unlink()
+
+    def test_appender_body_error(self):
+        i1 = DimSweep("a", 2)
+        d1 = DataBlock()
+        d1.b = hfarray([0, 0], dims=(i1,))
+        d1.c = hfarray(0)
+        fname = testpath / "testdata/hdf5/v02/savetest/res_1.hdf5"
+
+        def append(fil):
+            with HDF5Appender(fil, buffersize=10) as appender:
+                for idx in range(1, 4):
+                    d2 = DataBlock()
+                    d2.b = hfarray([idx, 10 * idx], dims=(i1,))
+                    d2.c = hfarray(idx)
+                    appender.append(d2)
+                raise KeyError("measurement failed")
+
+        with hdf5context(fname, mode="w") as fil:
+            savefun(d1, fil, expandable=True)
+            self.assertRaises(KeyError, append, fil)
+            self.assertEqual(fil["b"].shape, (2, 4))
+            self.assertEqual(list(fil["c"][...]), [0, 1, 2, 3])
+        fname.unlink()
+
+    def test_appender_missing(self):
+        i1 = DimSweep("a", 1)
+        d1 = DataBlock()
+        d1.b = hfarray([2], dims=(i1,))
+        d1.c = hfarray(3)
+        d2 = DataBlock()
+        d2.b = hfarray([3], dims=(i1,))
+        fname = testpath / "testdata/hdf5/v02/savetest/res_1.hdf5"
+        with hdf5context(fname, mode="w") as fil:
+            savefun(d1, fil, expandable=True)
+            with HDF5Appender(fil) as appender:
+                self.assertRaises(ValueError, appender.append, d2)
+        fname.unlink()
+
     def test_wrong_version_1(self):
         ia = DimSweep("a", 1, unit="")
         d1 = DataBlock()
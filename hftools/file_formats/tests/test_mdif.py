@@ -5,6 +5,8 @@
 #
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
+import numpy as np
+
 import hftools.file_formats
 from hftools import path
 from hftools.testing import TestCase
@@ -21,13 +23,46 @@ class Test_parse_header(TestCase):
     def test_1(self):
         D = mdif.GetData([["X(real)"]])
         q = D.parse_header("X(real)")
-        self.assertEqual(q, (D.get_real, "X"))
+        self.assertEqual(q, ("real", "X"))
 
     def test_2(self):
         D = mdif.GetData([["X(real)"]])
         self.assertRaises(Exception, D.parse_header, "X(unknown)")
 
 
+class Test_parse_data(TestCase):
+    def test_multiline(self):
+        D = mdif.GetData([["f(real)", "n(integer)"],
+                          ["S(complex)", "name(string)"]])
+        res = D.parse_data(["1e9 1", "0.5 -0.5 \"a\"",
+                            "2e9 2", "1 2 \"bc\""])
+        self.assertEqual(list(res.keys()), ["f", "n", "S", "name"])
+        self.assertAllclose(res["f"], [1e9, 2e9])
+        self.assertEqual(res["n"].dtype, np.int64)
+        self.assertAllclose(res["n"], [1, 2])
+        self.assertAllclose(res["S"], [0.5 - 0.5j, 1 + 2j])
+        self.assertEqual(list(res["name"]), ["a", "bc"])
+
+    def test_quoted_real(self):
+        D = mdif.GetData([["f(real)", "x(real)"]])
+        res = D.parse_data(['1 "27"', '2 3'])
+        self.assertAllclose(res["x"], [27, 3])
+
+    def test_extra_tokens(self):
+        D = mdif.GetData([["f(real)"]])
+        res = D.parse_data(["1", "2 5"])
+        self.assertAllclose(res["f"], [1, 2])
+
+    def test_missing_tokens(self):
+        D = mdif.GetData([["f(real)", "S(complex)"]])
+        self.assertRaises(mdif.MDIFError, D.parse_data, ["1 2 3", "2 3"])
+
+    def test_incomplete_record(self):
+        D = mdif.GetData([["f(real)"], ["x(real)"]])
+        self.assertRaises(mdif.MDIFError, D.parse_data, ["1", "2", "3"])
+        self.assertRaises(mdif.MDIFError, D.parse_data, [])
+
+
 class TestMDIFdata_1(base_test.Test_1):
     readfun = [hftools.file_formats.read_mdif]
     basepath = testpath
@@ -68,6 +103,18 @@ class TestMDIF_readfile(TestCase):
                          verbose=False, blockname="Spar")
         self.assertTrue("Power" in mdif)
 
+    def test_read_data_workers(self):
+        fname = testpath / "testdata/mdif/small.mdif"
+        facit = read_mdif(fname, verbose=False)
+        for executor in ["thread", "process"]:
+            res = hftools.file_formats.read_data(fname, verbose=False,
+                                                 workers=2,
+                                                 executor=executor)
+            self.assertEqual(sorted(res.keys()), sorted(facit.keys()))
+            for k in facit:
+                self.assertEqual(sorted(res[k].vardata.keys()),
+                                 sorted(facit[k].vardata.keys()))
+
 
 class TestMDIF_savefile(TestCase):
     def test_1(self):
@@ -0,0 +1,157 @@
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+import itertools
+
+import numpy as np
+
+from hftools.core.exceptions import HFToolsHyperCubeError
+from hftools.dataset import DataBlock, DimPartial, DimSweep, DimRep, hfarray
+from hftools.file_formats.merge import merge_blocks, merge_blocks_do_hyper,\
+    regrid_target, regrid_blocks, merge_variable
+from hftools.testing import TestCase
+
+
+def make_blocks(cells):
+    fi = DimSweep("f", [10, 20, 30])
+    blocks = []
+    for i, j in cells:
+        db = DataBlock()
+        db.I = DimPartial("I", np.array(i))
+        db.J = DimPartial("J", np.array(j))
+        db.x = hfarray([1, 2, 3], dims=(fi,), unit="V") * (i + 10 * j)
+        blocks.append(db)
+    return blocks
+
+
+class Test_merge_blocks_do_hyper(TestCase):
+    def test_unordered(self):
+        cells = [(2, 5), (1, 6), (1, 5), (2, 6), (3, 5), (3, 6)]
+        res = merge_blocks_do_hyper(make_blocks(cells))
+        self.assertEqual(res.x.dims, (DimSweep("f", [10, 20, 30]),
+                                      DimRep("I", [1, 2, 3]),
+                                      DimRep("J", [5, 6])))
+        self.assertEqual(res.x.unit, "V")
+        facit = (np.array([1, 2, 3])[:, None, None] *
+                 (np.array([1, 2, 3])[:, None] + 10 * np.array([5, 6])))
+        self.assertAllclose(res.x, facit)
+
+    def test_missing(self):
+        blocks = make_blocks([(1, 5), (1, 6), (2, 5)])
+        self.assertRaises(HFToolsHyperCubeError, merge_blocks_do_hyper,
+                          blocks)
+
+    def test_duplicate(self):
+        blocks = make_blocks([(1, 5), (1, 6), (2, 5), (1, 5)])
+        self.assertRaises(HFToolsHyperCubeError, merge_blocks_do_hyper,
+                          blocks)
+
+
+class Test_merge_variable(TestCase):
+    def test_broadcast(self):
+        fi = DimSweep("f", [10, 20, 30])
+        values = [hfarray([1, 2, 3], dims=(fi,)), hfarray([5], dims=(fi,))]
+        association_list = [((("I", 2),), values[0]),
+                            ((("I", 1),), values[1])]
+        v, indexvars, innerdims = merge_variable(association_list)
+        self.assertEqual(v.dims, (fi, DimRep("I", [1, 2])))
+        self.assertTrue(np.all(np.array(v) == [[5, 1], [5, 2], [5, 3]]))
+
+    def test_scalar(self):
+        association_list = [((("I", 2),), hfarray(4)),
+                            ((("I", 1),), hfarray(3))]
+        v, indexvars, innerdims = merge_variable(association_list)
+        self.assertEqual(v.dims, (DimRep("I", [1, 2]),))
+        self.assertTrue(np.all(np.array(v) == [3, 4]))
+
+
+class Test_merge_blocks_hyper(TestCase):
+    def test_hyper(self):
+        cells = list(itertools.product([1, 2], [5, 6, 7]))
+        res = merge_blocks(make_blocks(cells), hyper=True)
+        self.assertAllclose(res.I, [1, 2])
+        self.assertAllclose(res.J, [5, 6, 7])
+        self.assertAllclose(res.x[:, 1, 2], [72, 144, 216])
+
+    def test_duplicate(self):
+        blocks = make_blocks([(1, 5), (1, 6), (2, 5), (1, 5)])
+        self.assertRaises(HFToolsHyperCubeError, merge_blocks, blocks,
+                          hyper=True)
+
+
+def make_grid_blocks(grids):
+    blocks = []
+    for idx, f in enumerate(grids):
+        fi = DimSweep("freq", f, unit="Hz")
+        db = DataBlock()
+        db.I = DimPartial("I", np.array(idx))
+        db.freq = fi
+        db.x = hfarray(2 * np.array(f) + 1j, dims=(fi,), unit="V")
+        db.y = hfarray(np.ones((len(f), 2)) * idx,
+                       dims=(fi, DimRep("k", [0, 1])))
+        db.z = hfarray(idx)
+        blocks.append(db)
+    return blocks
+
+
+class Test_regrid_target(TestCase):
+    def test_union(self):
+        res = regrid_target([[1, 2, 3], [2.5, 3, 4]])
+        self.assertAllclose(res, [1, 2, 2.5, 3, 4])
+
+    def test_intersection(self):
+        res = regrid_target([[1, 2, 3], [2.5, 3, 4]], "intersection")
+        self.assertAllclose(res, [2.5, 3])
+
+    def test_grid(self):
+        self.assertAllclose(regrid_target([[1, 2]], [1, 1.5]), [1, 1.5])
+
+    def test_errors(self):
+        self.assertRaises(ValueError, regrid_target, [[1, 2], [3, 4]],
+                          "intersection")
+        self.assertRaises(ValueError, regrid_target, [[1, 2]], "kalle")
+
+
+class Test_merge_blocks_regrid(TestCase):
+    def setUp(self):
+        self.blocks = make_grid_blocks([[1., 2, 3, 4], [2., 3, 4, 5, 6],
+                                        [1., 2, 3, 4]])
+
+    def test_union(self):
+        res = merge_blocks(self.blocks, regrid="union")
+        self.assertAllclose(res.freq, [1, 2, 3, 4, 5, 6])
+        self.assertEqual(res.freq.unit, "Hz")
+        self.assertEqual(res.x.unit, "V")
+        x = np.array(res.x.reorder_dimensions(res.I.dims[0]))
+        self.assertAllclose(x[0, :4], [2 + 1j, 4 + 1j, 6 + 1j, 8 + 1j])
+        self.assertTrue(np.isnan(x[0, 4:]).all())
+        self.assertAllclose(x[1, 1:], [4 + 1j, 6 + 1j, 8 + 1j, 10 + 1j,
+                                       12 + 1j])
+        self.assertTrue(np.isnan(x[1, 0]))
+        self.assertEqual(res.y.shape, (6, 3, 2))
+
+    def test_intersection(self):
+        res = merge_blocks(self.blocks, regrid="intersection")
+        self.assertAllclose(res.freq, [2, 3, 4])
+        self.assertAllclose(res.x, (2 * np.array([2, 3, 4]) + 1j)[:, None])
+        self.assertAllclose(res.z, [0, 1, 2])
+
+    def test_grid(self):
+        res = merge_blocks(self.blocks, regrid=[2.5, 3.5])
+        self.assertAllclose(res.x, np.array([5 + 1j, 7 + 1j])[:, None])
+
+    def test_weights_shared(self):
+        blocks = regrid_blocks(self.blocks, [2.5, 3.5])
+        self.assertEqual(len(blocks), 3)
+        self.assertAllclose(blocks[2].y, [[2, 2], [2, 2]])
+        self.assertEqual(blocks[0].ivardata["freq"],
+                         blocks[1].ivardata["freq"])
+
+    def test_same_grid(self):
+        blocks = make_grid_blocks([[1., 2], [1., 2]])
+        res = regrid_blocks(blocks)
+        self.assertIs(res[0], blocks[0])
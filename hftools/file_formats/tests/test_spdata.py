@@ -5,7 +5,10 @@
 #
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
+import numpy as np
+
 import hftools.file_formats
+import hftools.file_formats.spdata as spdata
 from hftools import path
 from hftools.testing import TestCase
 from hftools.file_formats.tests import base_test
@@ -86,6 +89,128 @@ class TestSPdata_merge(TestCase):
                                   [[8, 18], [8, 18]]])
 
 
+class TestSPdata_parallel(TestCase):
+    def setUp(self):
+        self.files = [testpath / "testdata/sp-data/sp_oneport_1_1.txt",
+                      testpath / "testdata/sp-data/sp_oneport_2_1.txt"]
+        self.facit = hftools.file_formats.read_spdata(self.files,
+                                                      verbose=False)
+
+    def _check(self, d):
+        self.assertEqual(sorted(d.allvarnames),
+                         sorted(self.facit.allvarnames))
+        self.assertAllclose(d.FILEINDEX, [0, 1])
+        self.assertEqual(list(d.FILENAME), list(self.facit.FILENAME))
+        self.assertAllclose(d.a11, self.facit.a11)
+        self.assertEqual(d.a11.dims, self.facit.a11.dims)
+
+    def test_thread(self):
+        d = hftools.file_formats.read_spdata(self.files, verbose=False,
+                                             workers=2, executor="thread")
+        self._check(d)
+
+    def test_process(self):
+        d = hftools.file_formats.read_spdata(self.files, verbose=False,
+                                             workers=2, executor="process")
+        self._check(d)
+
+    def test_read_data(self):
+        d = hftools.file_formats.read_data(self.files, verbose=False,
+                                           workers=2, executor="thread")
+        self._check(d)
+
+    def test_bad_executor(self):
+        self.assertRaises(ValueError, hftools.file_formats.read_spdata,
+                          self.files, verbose=False, executor="foo")
+
+
+class TestSPdata_iter(TestCase):
+    def test_blocks(self):
+        f1 = testpath / "testdata/sp-data/a.txt"
+        blocks = list(hftools.file_formats.iter_spdata(f1))
+        self.assertEqual(len(blocks), 4)
+        self.assertAllclose(blocks[0].a, [0, 3, 6])
+        self.assertAllclose(blocks[1].a, [10, 13, 16])
+        self.assertAllclose(blocks[0].FILEINDEX, [0])
+        self.assertEqual(blocks[0].FILENAME, f1)
+        self.assertEqual(blocks[0].Power.unit, "dBm")
+        facit = hftools.file_formats.read_spdata(f1, verbose=False)
+        self.assertEqual(facit.FILENAME, f1)
+
+    def test_multiple_files(self):
+        files = [testpath / "testdata/sp-data/sp_oneport_1_1.txt",
+                 testpath / "testdata/sp-data/sp_oneport_2_1.txt"]
+        blocks = list(hftools.file_formats.iter_spdata(files))
+        self.assertEqual(len(blocks), 2)
+        self.assertAllclose(blocks[1].FILEINDEX, [1])
+        self.assertEqual(blocks[1].FILENAME, files[1])
+        facit = hftools.file_formats.read_spdata(files[1], verbose=False)
+        self.assertAllclose(blocks[1].a22, facit.a22)
+
+    def test_error(self):
+        f1 = testpath / "testdata/sp-data/test_error_4.txt"
+        blocks = hftools.file_formats.iter_spdata(f1)
+        self.assertRaises(HFToolsIOError, list, blocks)
+
+
+class TestSPdata_convert_column(TestCase):
+    def _convert(self, values, typed=True, sample=2):
+        column = np.array(values, dtype=object)
+        return spdata.convert_column(column, typed=typed, sample=sample)
+
+    def test_int(self):
+        res = self._convert(["1", "2", "3"])
+        self.assertEqual(res.dtype, np.int64)
+        self.assertAllclose(res, [1, 2, 3])
+
+    def test_float(self):
+        res = self._convert(["1", "2.5", "3"])
+        self.assertEqual(res.dtype, np.float64)
+        self.assertAllclose(res, [1, 2.5, 3])
+
+    def test_int_mismatch(self):
+        res = self._convert(["1", "2", "3.5"])
+        self.assertEqual(res.dtype, np.float64)
+        self.assertAllclose(res, [1, 2, 3.5])
+
+    def test_float_mismatch(self):
+        res = self._convert(["1.5", "2", "x"])
+        self.assertEqual(list(res), ["1.5", "2", "x"])
+
+    def test_date(self):
+        res = self._convert(["2014-01-02 10:00", "2014-01-03 10:00"])
+        self.assertEqual(res.dtype.kind, "M")
+
+    def test_strings(self):
+        res = spdata.convert_column(("1", "2", "3.5"), sample=2)
+        self.assertEqual(res.dtype, np.float64)
+        self.assertAllclose(res, [1, 2, 3.5])
+
+    def test_columns_from_rows(self):
+        res = spdata.columns_from_rows(["1\t2.5\tx", "3\t4\ty"], 3)
+        self.assertEqual(res[0].dtype, np.int64)
+        self.assertAllclose(res[1], [2.5, 4])
+        self.assertEqual(list(res[2]), ["x", "y"])
+        self.assertRaises(spdata.SPDataIOError, spdata.columns_from_rows,
+                          ["1\t2"], 3)
+
+    def test_untyped(self):
+        res = self._convert(["1", "2", "3"], typed=False)
+        self.assertEqual(res.dtype, np.int64)
+        self.assertAllclose(res, [1, 2, 3])
+
+    def test_read(self):
+        f1 = testpath / "testdata/sp-data/a.txt"
+        d1 = hftools.file_formats.read_spdata(f1, verbose=False)
+        d2 = hftools.file_formats.read_spdata(f1, verbose=False,
+                                              typed_columns=False)
+        self.assertEqual(d1.allvarnames, d2.allvarnames)
+        for vname in d1.vardata:
+            self.assertEqual(d1[vname].dtype, d2[vname].dtype)
+            self.assertEqual(d1[vname].dims, d2[vname].dims)
+            self.assertTrue(np.all(d1[vname] == d2[vname]))
+
+
 class TestSPdata_read_single_column(TestCase):
     def test_1(self):
         f1 = testpath / "testdata/sp-data/single_freq.txt"
@@ -215,3 +215,37 @@ class TestTouchstone_save(TestCase):
                            (idx + 1, rad1, rad2))
                     self.assertEqual(rad1, rad2, msg=msg)
 
+
+class TestTouchstone_proc_data(TestCase):
+    def test_read_values(self):
+        values, bounds = hftools.file_formats.touchstone.read_values(
+            [u"0  1 2", u"3\t4", u"5e1"])
+        self.assertAllclose(values, [0, 1, 2, 3, 4, 50])
+        self.assertAllclose(bounds, [0, 3, 5, 6])
+
+    def test_read_values_error(self):
+        self.assertRaises(ValueError,
+                          hftools.file_formats.touchstone.read_values,
+                          [u"0 1 2", u"1 x 3"])
+
+    def test_rows_spanning_lines(self):
+        lines = [u"0 1 0 2 0", u"3 0 4 0",
+                 u"1 0 1 0 2", u"0 3 0 4"]
+        f, s, fn, noise = hftools.file_formats.touchstone.proc_data(lines)
+        self.assertAllclose(f, [0, 1])
+        self.assertAllclose(s, [[1, 0, 2, 0, 3, 0, 4, 0],
+                                [0, 1, 0, 2, 0, 3, 0, 4]])
+        self.assertIsNone(fn)
+        self.assertIsNone(noise)
+
+    def test_noise(self):
+        lines = [u"0 1 0 2 0 3 0 4 0", u"1 0 1 0 2 0 3 0 4",
+                 u"0 1 2 3 4", u"1 5 6 7 8"]
+        f, s, fn, noise = hftools.file_formats.touchstone.proc_data(lines)
+        self.assertAllclose(f, [0, 1])
+        self.assertAllclose(fn, [0, 1])
+        self.assertAllclose(noise, [[1, 2, 3, 4], [5, 6, 7, 8]])
+
+    def test_empty(self):
+        self.assertRaises(TouchstoneError,
+                          hftools.file_formats.touchstone.proc_data, [])
@@ -67,7 +67,7 @@ class ReadTouchstoneFileFormat(ReadFileFormat):
                     msg = "Second # info at lineno: %d" % lineno
                     raise TouchstoneError(msg)
             else:
-                datalist.append(list(map(float, rad.split())))
+                datalist.append(rad)
         if info is None:
             raise TouchstoneError("No # info line in file")
         comments = Comments(comments)
@@ -79,56 +79,82 @@ class ReadTouchstoneFileFormat(ReadFileFormat):
         yield out
 
 
-def process_data(data):
-    max_N = int(sqrt(sum(map(len, data)) - 1) / 2 + 1)
-    n = 1  # number of ports
+def read_values(lines):
+    """Convert the numeric *lines* of a touchstone file into one flat float64
+    array in a single pass.
+
+    Returns the values and the offsets of the line boundaries in the flat
+    array, i.e. line k holds values[bounds[k]:bounds[k + 1]].
+    """
+    text = u"\n".join(lines)
+    raw = np.frombuffer(text.encode("ascii", "replace"), dtype=np.uint8)
+    blank = np.zeros(raw.shape, dtype=bool)
+    for char in " \t\n\r\v\f":
+        blank |= raw == ord(char)
+    tokenstart = ~blank
+    tokenstart[1:] &= blank[:-1]
+    lineindex = np.cumsum(raw == ord("\n"))
+    counts = np.bincount(lineindex[tokenstart], minlength=len(lines))
+    bounds = np.zeros(len(lines) + 1, dtype=np.intp)
+    np.cumsum(counts, out=bounds[1:])
+    values = np.array(text.split(), dtype=np.float64)
+    return values, bounds
+
+
+def split_rows(values, bounds, N):
+    """Find number of rows with *N* values each in *values*.
+
+    Each row must start on a line boundary given by *bounds* and the
+    frequency (first value of the row) must be increasing. Returns the
+    number of rows before the frequency stops increasing or None if the
+    rows do not line up with the lines.
+    """
+    rowstarts = np.arange(0, len(values), N)
+    misaligned = np.nonzero(~np.in1d(rowstarts + N, bounds))[0]
+    freq = values[rowstarts]
+    decreasing = np.nonzero(freq[1:] <= freq[:-1])[0] + 1
+    nrows = len(rowstarts)
+    if len(decreasing):
+        nrows = decreasing[0]
+    if len(misaligned) and misaligned[0] < nrows:
+        return None
+    return nrows
+
+
+def process_data(values, bounds):
+    """Split flat *values* into rows of S-parameter data and noise data.
+
+    The number of ports is found by trying all possible row lengths, a
+    decreasing frequency marks the start of the noise data of a two-port.
+    """
+    if not len(values):
+        raise TouchstoneError("File is not a valid Touchstone File")
+    max_N = int(sqrt(len(values) - 1) / 2 + 1)
     for n in range(1, max_N):
         N = 2 * n ** 2 + 1  # number of data points per frequency
-        output, noise = _process_data(data, N)
-        if output:
-            return output, noise
+        nrows = split_rows(values, bounds, N)
+        if nrows is None:
+            continue
+        end = nrows * N
+        output = values[:end].reshape(nrows, N)
+        if end == len(values):
+            return output, None
+        elif N == 9:  # N==9 when two-port
+            noisevalues = values[end:]
+            noisebounds = bounds[bounds >= end] - end
+            nnoise = split_rows(noisevalues, noisebounds, 5)
+            if nnoise is not None and nnoise * 5 == len(noisevalues):
+                return output, noisevalues.reshape(nnoise, 5)
     raise TouchstoneError("File is not a valid Touchstone File")
 
 
-def _process_data(data, N):
-    output = []
-    current_row = []
-    noise = []
-    for idx, rad in enumerate(data):
-        if not current_row:
-            if output:
-                if rad[0] <= output[-1][0]:
-                    if N == 9:  # N==9 when two-port
-                        noise, _ = _process_data(data[idx:], 5)
-                        if noise:
-                            return output, noise
-                    return None, None
-                else:
-                    current_row.extend(rad)
-            else:
-                current_row.extend(rad)
-        else:
-            current_row.extend(rad)
-
-        if len(current_row) > N:
-            return None, None
-        elif len(current_row) == N:
-            output.append(current_row)
-            current_row = []
-    if current_row:
-        return None, None
-    return output, noise
-
-
-def proc_data(data, cplxtype=None):
-    output, noise = process_data(data)
-    data = np.array(output)
+def proc_data(lines, cplxtype=None):
+    data, noise = process_data(*read_values(lines))
     f = np.array(data[:, 0])
     s = data[:, 1:]
-    if noise:
-        data = np.array(noise)
-        fn = data[:, 0]
-        noisedata = np.array(data[:, 1:], dtype=np.float64)
+    if noise is not None:
+        fn = noise[:, 0]
+        noisedata = np.array(noise[:, 1:], dtype=np.float64)
         return f, s, fn, noisedata
     else:
         return f, s, None, None
@@ -234,7 +260,7 @@ def save_touchstone(db, filename):
 
 def read_touchstone(filnamn, make_complex=True, property_to_vars=True,
                     guess_unit=True, normalize=True, make_matrix=True,
-                    merge=True, verbose=False):
+                    merge=True, verbose=False, workers=None, executor=None):
     res = ReadTouchstoneFileFormat.read_file(filnamn,
                                              make_complex=make_complex,
                                              property_to_vars=property_to_vars,
@@ -242,7 +268,9 @@ def read_touchstone(filnamn, make_complex=True, property_to_vars=True,
                                              normalize=normalize,
                                              make_matrix=make_matrix,
                                              merge=merge,
-                                             verbose=verbose)
+                                             verbose=verbose,
+                                             workers=workers,
+                                             executor=executor)
     return res
 
 if __name__ == "__main__":
@@ -6,6 +6,8 @@
 #
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
+from multiprocessing.pool import ThreadPool
+
 import numpy as np
 import numpy.linalg as linalg
 
@@ -188,8 +190,23 @@ def delay(freq, var):
     return (f_mean, dfi / domega)
 
 
+def _axis_index(data, axis):
+    """Return index of *axis* which is an index or the name of a dim of
+    hfarray *data*.
+    """
+    if isinstance(axis, (int, np.integer)):
+        return axis % np.ndim(data)
+    return data.dims_index(getattr(axis, "name", axis))
+
+
+def _axis_first(ndim, axis):
+    return (axis,) + tuple(i for i in range(ndim) if i != axis)
+
+
 def smooth(data, aperture, axis=0):
     """Smoothar *data* med aritmetiskt medelvarde langs med *axis* [=0].
+    Medelvardena beraknas med en kumulativ summa sa kostnaden ar
+    oberoende av *aperture*. Vid kanterna krymps fonstret symmetriskt.
 
     Invariabler
 
@@ -201,27 +218,57 @@ def smooth(data, aperture, axis=0):
             i smoothingen
 
         *axis*
-            axel som skall smoothas langs default = 1
+            axel som skall smoothas langs, index eller namn pa dim
     """
     data = np.asanyarray(data)
+    axis = _axis_index(data, axis)
     newdata = np.empty_like(data)
-    len = data.shape[axis] - 1
-    if aperture % 2 == 0:
-        odd = 0
-    else:
-        odd = 1
-    for i in range(data.shape[axis]):
-        wid = min(i, aperture // 2, abs(len - i))
-        if wid != 0:
-            newdata[i] = np.mean(data[i - wid: i + wid + odd], axis)
-        else:
-            newdata[i] = data[i]
+    x = np.moveaxis(np.asarray(data), axis, 0)
+    n = x.shape[0]
+    i = np.arange(n)
+    wid = np.minimum(np.minimum(i, aperture // 2), n - 1 - i)
+    lo = i - wid
+    hi = i + wid + aperture % 2
+    csum = np.zeros((n + 1,) + x.shape[1:],
+                    dtype=np.result_type(x.dtype, np.float64))
+    np.cumsum(x, axis=0, out=csum[1:])
+    count = np.maximum(hi - lo, 1).reshape((n,) + (1,) * (x.ndim - 1))
+    mean = (csum[hi] - csum[lo]) / count
+    mean[wid == 0] = x[wid == 0]
+    np.moveaxis(np.asarray(newdata), axis, 0)[...] = mean
     return newdata
 
 
+def poly_smooth_weights(x, aperture, N=3):
+    """Berakna vikter for smoothing med *N* te gradens polynom
+    (Savitzky-Golay) over fonster med *aperture* sampel av *x*.
+
+    Resultat (index, weights) dar rad *i* i *index* ar fonstrets index i
+    *x* och rad *i* i *weights* ar vikterna som ger polynomets varde i
+    x[i]. Vid kanterna flyttas fonstret in i data.
+    """
+    x = np.asarray(x, dtype=np.float64).ravel()
+    n = len(x)
+    if aperture > n:
+        msg = "aperture %d larger than number of samples %d"
+        raise ValueError(msg % (aperture, n))
+    i = np.arange(n)
+    start = np.minimum(np.maximum(i - aperture // 2, 0),
+                       max(0, n - 1 - aperture))
+    index = start[:, np.newaxis] + np.arange(aperture)
+    t = x[index] - x[:, np.newaxis]
+    scale = abs(t).max(axis=1)
+    scale[scale == 0] = 1
+    t = t / scale[:, np.newaxis]
+    vander = t[..., np.newaxis] ** np.arange(N + 1)
+    weights = linalg.pinv(vander)[:, 0, :]
+    return index, weights
+
+
 def poly_smooth(x, y, aperture, axis=0, N=3):
     """Smoothar *data* med hjalp av *N* te gradens polynom, langs med
-    *axis* [=0].
+    *axis* [=0]. Vikterna fran :func:`poly_smooth_weights` beraknas en
+    gang och appliceras som en faltning over alla ovriga axlar.
 
     Invariabler
 
@@ -236,27 +283,22 @@ def poly_smooth(x, y, aperture, axis=0, N=3):
             smoothingen
 
         *axis*
-            axel som skall smoothas langs
+            axel som skall smoothas langs, index eller namn pa dim
 
         *N*
             Vilken grad skallpolynomet ha
 
     """
-    import scipy
+    y = np.asanyarray(y)
+    axis = _axis_index(y, axis)
+    index, weights = poly_smooth_weights(x, aperture, N)
+    yy = np.moveaxis(np.asarray(y), axis, 0)
+    shape = (len(weights),) + (1,) * (yy.ndim - 1)
+    result = np.zeros(yy.shape, dtype=np.result_type(yy.dtype, np.float64))
+    for j in range(aperture):
+        result += weights[:, j].reshape(shape) * yy[index[:, j]]
     newdata = np.empty_like(y)
-    size = x.shape[axis] - 1
-    if aperture % 2 == 0:
-        odd = 0
-    else:
-        odd = 1
-    wid = aperture // 2
-
-    for i in range(x.shape[axis]):
-        start = min(max(i - wid, 0), max(0, size - aperture))
-        stop = max(min(i + wid + odd, size), aperture)
-        assert stop - start == aperture
-        poly = scipy.polyfit(x[start:stop], y[start:stop], N)
-        newdata[i] = scipy.polyval(poly, x[i])
+    np.moveaxis(np.asarray(newdata), axis, 0)[...] = result
     return newdata
 
 
@@ -265,6 +307,11 @@ def poly_smooth_magphase(x, data, aperture, axis=0, N=3):
     :func:`poly_smooth`.
 
     """
+    axis = _axis_index(data, axis)
+    if axis:
+        order = _axis_first(data.ndim, axis)
+        res = poly_smooth_magphase(x, data.transpose(*order), aperture, 0, N)
+        return res.transpose(*np.argsort(order))
     m = poly_smooth(x, abs(data), aperture, axis, N)
     p = poly_smooth(x, unwrap_phase(data), aperture, axis, N)
     return m * exp(1j * p)
@@ -275,6 +322,11 @@ def smooth_magphase(data, aperture, axis=0):
     :func:`smooth`.
 
     """
+    axis = _axis_index(data, axis)
+    if axis:
+        order = _axis_first(data.ndim, axis)
+        res = smooth_magphase(data.transpose(*order), aperture, 0)
+        return res.transpose(*np.argsort(order))
     m = smooth(abs(data), aperture, axis)
     p = smooth(unwrap_phase(data), aperture, axis)
     return m * exp(1j * p)
@@ -379,15 +431,7 @@ def inv(A):
 
 
 def matrix_multiply_old(A, B):
-    dot = np.dot
-    res = broadcast_matrices((A, B))
-    x = dot(firstelement(A), firstelement(B))
-    resdims = res._broadcasted[0].dims
-    resempty = np.empty(res.outershape + x.shape, dtype=x.dtype)
-    result = hfarray(resempty, dims=resdims)
-    for a, b, r in broadcast_matrices((A, B, result)):
-        r[...] = dot(a, b)
-    return result
+    return matrix_multiply(A, B)
 
 
 def matrix_multiply(a, b):
@@ -425,16 +469,84 @@ def solve_Ab(A, b, squeeze=True):
 
 
 def lstsq(A, b, squeeze=True):
-    lstsq = np.linalg.lstsq
-    res = broadcast_matrices((A, b))
-    x, residuals, rank, s = lstsq(firstelement(res._broadcasted[0]), firstelement(res._broadcasted[1]))
-    xdims = res._broadcasted[0].dims
-    xempty = np.empty(res.outershape + x.shape, dtype=x.dtype)
-    xresult = hfarray(xempty, dims=xdims)
-
-    for a, b, rx in broadcast_matrices((A, b, xresult)):
-        rx[...], _, _, _ = lstsq(a, b)
-    return xresult
+    """Least squares solution x of A x = b for each matrix in hfarrays *A*
+    and *b*. The outer dims are broadcast and all problems are solved
+    with one batched pseudo inverse (SVD), which like numpy.linalg.lstsq
+    gives the minimum norm solution for rank deficient matrices.
+    """
+    AA, bb = make_same_dims_list((A, b))
+    x = np.matmul(linalg.pinv(np.asarray(AA)), np.asarray(bb))
+    if x.shape[-2:] == AA.shape[-2:]:
+        matrixdims = AA.dims[-2:]
+    else:
+        matrixdims = (DimMatrix_i("i", x.shape[-2]),
+                      DimMatrix_j("j", x.shape[-1]))
+    return hfarray(x, dims=AA.dims[:-2] + matrixdims, copy=False)
+
+
+def map_matrices(func, *arrays, **kw):
+    """Apply *func* to each matrix of the hfarrays *arrays* and return an
+    hfarray with the results.
+
+    The arrays are broadcast like :class:`broadcast_matrices` does and
+    *func* is called with one matrix (the last *N* [=2] axes) from each
+    array. *func* must return arrays of the same shape and dtype for all
+    matrices. The matrix dims of the result are those of the first array
+    when the shapes agree, otherwise they are given by *dims*. If there
+    are no matrices an empty result with these dims is returned.
+
+    With *workers* > 1 the outer shape is split in chunks that are
+    processed in a thread pool, which pays off when *func* releases the
+    GIL as numpy.linalg routines do.
+    """
+    N = kw.pop("N", 2)
+    workers = kw.pop("workers", None)
+    dims = kw.pop("dims", None)
+    if kw:
+        raise TypeError("map_matrices got unexpected keyword arguments %s" %
+                        ", ".join(sorted(kw)))
+    res = broadcast_matrices(arrays, N)
+    outershape = res.outershape
+    plain = [np.asarray(x) for x in res._broadcasted]
+    firstdims = res._broadcasted[0].dims
+    count = int(np.multiply.reduce(outershape))
+    if count == 0:
+        # func can not be probed, the result keeps the matrix dims
+        if dims is None:
+            dims = firstdims[len(outershape):]
+        shape = outershape + tuple(len(x.data) for x in dims)
+        out = np.empty(shape, dtype=np.result_type(*plain))
+        return hfarray(out, dims=firstdims[:len(outershape)] + tuple(dims),
+                       copy=False)
+    first = np.asarray(func(*[x[(0,) * len(outershape)] for x in plain]))
+    out = np.empty(outershape + first.shape, dtype=first.dtype)
+
+    def work(chunk):
+        for i in chunk:
+            idx = np.unravel_index(i, outershape)
+            out[idx] = func(*[x[idx] for x in plain])
+
+    if workers is not None and workers > 1 and count > 1:
+        pool = ThreadPool(workers)
+        try:
+            pool.map(work, np.array_split(np.arange(count), workers))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        work(range(count))
+
+    if dims is None:
+        if first.shape == res._matrixshapes[0]:
+            dims = firstdims[len(outershape):]
+        elif first.ndim == 0:
+            dims = ()
+        else:
+            msg = ("Result shape %r differs from matrix shape of first "
+                   "array, dims must be given" % (first.shape,))
+            raise ValueError(msg)
+    return hfarray(out, dims=firstdims[:len(outershape)] + tuple(dims),
+                   copy=False)
 
 
 if __name__ == '__main__':
@@ -57,6 +57,29 @@ def make_accessor(i, j):
     return accessor
 
 
+_accessor_tables = {}
+
+
+def accessor_table(shortname, nports):
+    """Return dict with accessors for the elements of a *nports* matrix.
+
+    Names are on the form s11, S11 for *shortname* "S". The tables are
+    created once for each *shortname* and size.
+    """
+    key = (shortname, nports)
+    try:
+        return _accessor_tables[key]
+    except KeyError:
+        pass
+    table = {}
+    for name in [shortname.lower(), shortname.upper(), shortname]:
+        for i in range(nports):
+            for j in range(nports):
+                table["%s%d%d" % (name, i + 1, j + 1)] = make_accessor(i, j)
+    _accessor_tables[key] = table
+    return table
+
+
 def convert(fromP, toP, a):
     """Converts multiports using permutation matrices as described in [#]
 
@@ -77,27 +100,89 @@ def convert(fromP, toP, a):
     return res, A, B
 
 
+_conversion_cache = {}
+
+
+def conversion_coefficients(fromP, toP):
+    """Return the blocks (tau1, sigma1, tau2, sigma2) of fromP * inv(toP)
+    as ndarrays, see :func:`convert`.
+    """
+    P = np.dot(np.asarray(fromP), np.linalg.inv(np.asarray(toP)))
+    N = P.shape[-1] // 2
+    return P[:N, :N], P[:N, N:], P[N:, :N], P[N:, N:]
+
+
+def cached_conversion_coefficients(source, target):
+    """Return :func:`conversion_coefficients` for converting multiport
+    *source* to the class of *target*. The coefficients are cached per
+    class pair, Z0 and number of ports.
+    """
+    key = (source.__class__, target.__class__, source.Z0, target.Z0,
+           source.shape[-1])
+    try:
+        return _conversion_cache[key]
+    except KeyError:
+        coeffs = conversion_coefficients(source.P, target.P)
+        _conversion_cache[key] = coeffs
+        return coeffs
+    except TypeError:
+        return conversion_coefficients(source.P, target.P)
+
+
+def _lincomb(const, *terms):
+    """Return const + sum of c * x for all (c, x) in *terms*, terms with
+    c == 0 are skipped.
+    """
+    res = const
+    for c, x in terms:
+        if c != 0:
+            res = res + c * x
+    return res
+
+
+def _convert_twoport(a, coeffs):
+    """Closed form of :func:`convert_matrices` for twoports
+    """
+    tau1, sigma1, tau2, sigma2 = coeffs
+    a = [[a[..., 0, 0], a[..., 0, 1]], [a[..., 1, 0], a[..., 1, 1]]]
+    m = [[_lincomb(tau1[i, k], (-tau2[0, k], a[i][0]), (-tau2[1, k], a[i][1]))
+          for k in range(2)] for i in range(2)]
+    n = [[_lincomb(-sigma1[i, k], (sigma2[0, k], a[i][0]),
+                   (sigma2[1, k], a[i][1]))
+          for k in range(2)] for i in range(2)]
+    det = m[0][0] * m[1][1] - m[0][1] * m[1][0]
+    res = np.empty(np.broadcast(a[0][0], det).shape + (2, 2),
+                   dtype=np.result_type(a[0][0], det, *coeffs))
+    res[..., 0, 0] = (m[1][1] * n[0][0] - m[0][1] * n[1][0]) / det
+    res[..., 0, 1] = (m[1][1] * n[0][1] - m[0][1] * n[1][1]) / det
+    res[..., 1, 0] = (m[0][0] * n[1][0] - m[1][0] * n[0][0]) / det
+    res[..., 1, 1] = (m[0][0] * n[1][1] - m[1][0] * n[0][1]) / det
+    return res
+
+
+def convert_matrices(a, coeffs):
+    """Convert the matrices in ndarray *a* using *coeffs* from
+    :func:`conversion_coefficients`.
+
+    Twoports use closed form elementwise expressions, larger matrices are
+    converted with one batched solve.
+    """
+    if a.shape[-1] == 2:
+        return _convert_twoport(a, coeffs)
+    tau1, sigma1, tau2, sigma2 = coeffs
+    return np.linalg.solve(tau1 - np.matmul(a, tau2),
+                           np.matmul(a, sigma2) - sigma1)
+
+
 class _MultiPortArray(_hfarray):
     """Basklass som ej skall anvandas direkt
     """
     shortname = None
     P = None
-    _attrfuns = {}
     _Z0 = None
 
     def __init__(self, data, dims=None, copy=True, Z0=None, info=None, unit=None):
         data = np.asanyarray(data)
-        if (self.shortname is not None) and (data.ndim >= 2):
-            self._attrfuns = {}
-            names = [self.shortname.lower(), self.shortname.upper(),
-                     self.shortname]
-            for name in names:
-                for i in range(data.shape[-1]):
-                    for j in range(data.shape[-1]):
-                        label = "%s%d%d" % (name, i + 1, j + 1)
-                        accessor = make_accessor(i, j)
-                        self._attrfuns[label] = accessor
-
         if isinstance(data, self.__class__) and self.Z0 == data.Z0:
             pass
         elif isinstance(data, _MultiPortArray):
@@ -106,9 +191,9 @@ class _MultiPortArray(_hfarray):
             else:
                 self.Z0 = Z0
             if self.ismatrix() and (data.shape[-1] == data.shape[-2]):
-                view = data.view(type=hfarray, dtype=data.dtype)
-                res, _, _ = convert(data.P, self.P, view)
-                self.view(type=hfarray, dtype=self.dtype)[:] = res
+                coeffs = cached_conversion_coefficients(data, self)
+                res = convert_matrices(np.asarray(data), coeffs)
+                np.asarray(self)[...] = res
             else:
                 fmt = ("Can not convert subelements of a %s matrix to "
                        "elements of a %s matrix")
@@ -193,10 +278,13 @@ class _MultiPortArray(_hfarray):
                                           SArray(right)))
 
     def __getattr__(self, key):
+        if self.shortname is None or self.ndim < 2:
+            raise AttributeError(key)
         try:
-            return (self._attrfuns[key](self))
+            accessor = accessor_table(self.shortname, self.shape[-1])[key]
         except KeyError:
-            raise AttributeError
+            raise AttributeError(key)
+        return accessor(self)
 
     def __setattr__(self, key, value):
         try:
@@ -8,7 +8,9 @@
 #-----------------------------------------------------------------------------
 import numpy as np
 
-from hftools.dataset import make_same_dims, _DimMatrix, hfarray
+from hftools.dataset import make_same_dims, _DimMatrix, hfarray,\
+    change_shape, DimMatrix_i, DimMatrix_j
+from hftools.dataset.arrayobj import Dims, DimsList
 from hftools.math import det, inv, matrix_multiply
 
 
@@ -30,6 +32,8 @@ def cascadeS(S1, S2, *rest):
     res[..., 1, 1] = S2[..., 1, 1] - S1[..., 1, 1] * s2det
     res = res / denom
     res = S1.__class__(res, dims=S1.dims)
+    if rest:
+        return cascadeS(res, *rest)
     return res
 
 
@@ -100,33 +104,211 @@ def deembed(e1, S, e2):
     return deembedright(deembedleft(e1, S), e2)
 
 
+def _broadcast_networks(networks):
+    """Return ndarrays of S-matrices in *networks* with matrix last and
+    broadcastable outer dims, together with the union of outer dims.
+    """
+    networks = [_matrix_dims_last(S) for S in networks]
+    outerdims = DimsList()
+    for S in networks:
+        for dim in S.dims[:-2]:
+            if dim not in outerdims:
+                outerdims.append(dim)
+    outerdims.sort(key=lambda x: x.sortprio)
+    arrays = [np.asarray(change_shape(S, Dims(tuple(outerdims) + S.dims[-2:])))
+              for S in networks]
+    return arrays, Dims(outerdims)
+
+
+class Circuit(object):
+    """Netlist of S-parameter networks.
+
+    Networks are added with :meth:`add` and their ports are connected with
+    :meth:`connect`. :meth:`reduce` returns the S-parameters seen from the
+    unconnected ports, computed with one batched linear solve over all
+    sweep dims::
+
+        c = Circuit()
+        fixture = c.add(T)
+        dut = c.add(S)
+        c.connect((fixture, 2), (dut, 0))
+        c.connect((fixture, 3), (dut, 1))
+        res = c.reduce()
+
+    Ports are numbered from 0 within each network.
+    """
+    def __init__(self):
+        self.networks = []
+        self.connections = []
+
+    def add(self, S):
+        """Add network *S* and return its index in the circuit
+        """
+        self.networks.append(S)
+        return len(self.networks) - 1
+
+    def connect(self, a, b):
+        """Connect port *a* to port *b*, both given as (network, port)
+        """
+        self.connections.append((tuple(a), tuple(b)))
+
+    def _port_offsets(self):
+        offsets = [0]
+        for S in self.networks:
+            offsets.append(offsets[-1] + _matrix_dims_last(S).shape[-1])
+        return offsets
+
+    def _global_port(self, port, offsets):
+        network, idx = port
+        if not 0 <= network < len(self.networks):
+            raise ValueError("No port %r in circuit" % (port,))
+        if not 0 <= idx < offsets[network + 1] - offsets[network]:
+            raise ValueError("No port %r in circuit" % (port,))
+        return offsets[network] + idx
+
+    def external_ports(self):
+        """Return list of unconnected ports as (network, port) in the order
+        they appear in the result of :meth:`reduce`.
+        """
+        connected = set()
+        for a, b in self.connections:
+            connected.update((a, b))
+        return [(network, idx)
+                for network, S in enumerate(self.networks)
+                for idx in range(_matrix_dims_last(S).shape[-1])
+                if (network, idx) not in connected]
+
+    def reduce(self, ports=None):
+        """Return S-parameters of the circuit at the unconnected ports.
+
+        *ports* is an optional list of (network, port) giving the order of
+        the external ports, default is :meth:`external_ports`.
+        """
+        if not self.networks:
+            raise ValueError("Circuit is empty")
+        offsets = self._port_offsets()
+        internal = [self._global_port(port, offsets)
+                    for connection in self.connections
+                    for port in connection]
+        if len(set(internal)) != len(internal):
+            raise ValueError("A port can only be connected once")
+        if ports is None:
+            ports = self.external_ports()
+        external = [self._global_port(port, offsets) for port in ports]
+        if set(external) & set(internal):
+            raise ValueError("Connected ports can not be external ports")
+
+        arrays, outerdims = _broadcast_networks(self.networks)
+        outershape = np.broadcast(*[x[..., 0, 0] for x in arrays]).shape
+        dtype = np.result_type(complex, *arrays)
+        S = np.zeros(outershape + (offsets[-1], offsets[-1]), dtype=dtype)
+        for start, stop, x in zip(offsets[:-1], offsets[1:], arrays):
+            S[..., start:stop, start:stop] = x
+
+        e = np.array(external, dtype=int)
+        res = S[..., e[:, None], e]
+        if internal:
+            c = np.array(internal, dtype=int)
+            C = np.zeros((len(c), len(c)))
+            C[np.arange(0, len(c), 2), np.arange(1, len(c), 2)] = 1
+            C[np.arange(1, len(c), 2), np.arange(0, len(c), 2)] = 1
+            a_c = np.linalg.solve(C - S[..., c[:, None], c],
+                                  S[..., c[:, None], e])
+            res = res + np.matmul(S[..., e[:, None], c], a_c)
+        dims = outerdims + (DimMatrix_i("i", len(e)),
+                            DimMatrix_j("j", len(e)))
+        return self.networks[0].__class__(res, dims=dims)
+
+
+def connect(S_a, port_a, S_b, port_b):
+    """Connect port *port_a* of network *S_a* to port *port_b* of *S_b*.
+
+    *port_a* and *port_b* can also be equally long sequences of ports to
+    connect several ports at once. The ports of the result are the
+    unconnected ports of *S_a* followed by those of *S_b*.
+    """
+    port_a, port_b = np.atleast_1d(port_a), np.atleast_1d(port_b)
+    if len(port_a) != len(port_b):
+        raise ValueError("port_a and port_b must have the same length")
+    circuit = Circuit()
+    a = circuit.add(S_a)
+    b = circuit.add(S_b)
+    for pa, pb in zip(port_a, port_b):
+        circuit.connect((a, int(pa)), (b, int(pb)))
+    return circuit.reduce()
+
+
+def deembed_fixture(T, M):
+    """De-embed 2N-port fixture *T* from N-port measurement *M*.
+
+    Ports 0..N-1 of *T* are the measurement ports and ports N..2N-1 connect
+    to ports 0..N-1 of the device. Solves M = connect(T, N..2N-1, S, 0..N-1)
+    for S with batched linear solves over all sweep dims.
+    """
+    arrays, outerdims = _broadcast_networks((T, M))
+    t, m = arrays
+    N = m.shape[-1]
+    if t.shape[-1] != 2 * N:
+        raise ValueError("Fixture must have twice as many ports as M")
+    t_ee, t_ec = t[..., :N, :N], t[..., :N, N:]
+    t_ce, t_cc = t[..., N:, :N], t[..., N:, N:]
+    x = np.linalg.solve(t_ec, m - t_ee)
+    x = np.swapaxes(np.linalg.solve(np.swapaxes(t_ce, -1, -2),
+                                    np.swapaxes(x, -1, -2)), -1, -2)
+    res = np.linalg.solve(np.identity(N) + np.matmul(x, t_cc), x)
+    dims = outerdims + (DimMatrix_i("i", N), DimMatrix_j("j", N))
+    return M.__class__(res, dims=dims)
+
+
 def switch_correct(b, a):
     Sm = matrix_multiply(b, inv(a))
     return Sm
 
 
-def make_passive_svd(S, delta=1e-6):
+def _matrix_dims_last(S):
+    """Reorder S so the matrix dims are the last dims.
+    """
+    neworder = tuple([x for x in S.dims if not isinstance(x, _DimMatrix)])
+    return S.reorder_dimensions(*neworder)
+
+
+def _clip_singular_values(s, limit):
+    """Clip the singular values of the stacked matrices in ndarray *s* to
+    *limit*.
+    """
+    u, sigma, vh = np.linalg.svd(s)
+    excess = sigma - limit
+    excess[excess < 0] = 0
+    return s - np.matmul(u * excess[..., np.newaxis, :], vh)
+
+
+def make_passive_svd(S, delta=1e-6, maxiter=0):
     """Force S-parameters in S to be passive.
 
-    The S-parameters of S are scaled such that the highest eigenvalue of S'
-    becomes |lambda|max < 1 - delta. The scaling is done using SVD.
+    The singular values of S are clipped to 1 - delta using SVD, all
+    matrices are processed in one batched call.
 
+    With *maxiter* > 0 the clipping is repeated, at most *maxiter* times,
+    on the matrices whose largest singular value is still above
+    1 - delta, for N-ports where rounding can leave singular values
+    slightly above the limit.
 
     Doshi, et.al, DesignCon 2012, "Fast and Optimal Algorithms for Enforcing
     Reciprocity, Passivity and Causality in S-parameters"
     """
-
-    svd = np.linalg.svd
-    out = []
-    for ss in S:
-        ss = np.array(ss, copy=False)
-        u, s, v = svd(ss)
-        s = abs(s) - 1
-        s[s < 0] = 0
-        s = np.diag(s)
-        delta = matrix_multiply(matrix_multiply(u, s), v)
-        out.append(ss - delta)
-    return S.__class__(out, dims=S.dims)
+    dims = S.dims
+    S = _matrix_dims_last(S)
+    limit = 1 - delta
+    out = _clip_singular_values(np.array(S), limit)
+    if maxiter > 0:
+        flat = out.reshape((-1,) + out.shape[-2:])
+        for _ in range(maxiter):
+            sigma_max = np.linalg.svd(flat, compute_uv=False)[..., 0]
+            active = np.flatnonzero(sigma_max > limit)
+            if len(active) == 0:
+                break
+            flat[active] = _clip_singular_values(flat[active], limit)
+    return S.__class__(out, dims=S.dims).reorder_dimensions(*dims)
 
 
 def make_passive_eig(S, delta=1e-6):
@@ -135,15 +317,12 @@ def make_passive_eig(S, delta=1e-6):
     The S-parameters of S are scaled such that the highest eigenvalue of S'
     becomes |lambda|max < 1 - delta.
     """
-    eig = np.linalg.eigvals
-    out = []
-    for s in S:
-        lambda_max = max(abs(eig(s)))
-        if lambda_max > 1:
-            out.append(s / lambda_max * (1 - delta))
-        else:
-            out.append(s)
-    return S.__class__(out, dims=S.dims)
+    dims = S.dims
+    S = _matrix_dims_last(S)
+    lambda_max = abs(np.linalg.eigvals(np.array(S, copy=False))).max(axis=-1)
+    scale = np.where(lambda_max > 1, (1 - delta) / lambda_max, 1)
+    return S.__class__(np.array(S) * scale[..., np.newaxis, np.newaxis],
+                       dims=S.dims).reorder_dimensions(*dims)
 
 
 def make_reciprocal(S):
@@ -157,10 +336,9 @@ def make_reciprocal(S):
 
 
 def check_passive(S):
-    eig = np.linalg.eigvals
-    out = []
-    for s in S:
-        lambda_max = max(abs(eig(s)))
-        out.append(lambda_max)
-    return hfarray(out, dims=S.dims[:1])
-
+    """Return largest absolute eigenvalue of each matrix in S, the result
+    has all non-matrix dims of S.
+    """
+    S = _matrix_dims_last(S)
+    lambda_max = abs(np.linalg.eigvals(np.array(S, copy=False))).max(axis=-1)
+    return hfarray(lambda_max, dims=S.dims[:-2])
@@ -7,6 +7,7 @@
 # The full license is in the file COPYING.txt, distributed with this software.
 #-----------------------------------------------------------------------------
 import os
+import pickle
 import warnings
 
 import numpy as np
@@ -176,6 +177,32 @@ class Test_MultiPortArray(_Test_hfarray):
             self.assertAllclose(b[..., 1, 1],
                                 getattr(b, "%s22" % b.shortname))
 
+    def test_via_shortname_result(self):
+        if self.cls.shortname:
+            b = self.cls(self.a) * 2
+            self.assertAllclose(getattr(b, "%s21" % b.shortname), 6)
+            self.assertRaises(AttributeError, getattr, b,
+                              "%s33" % b.shortname)
+
+    def test_via_shortname_3port(self):
+        if self.cls.shortname and not issubclass(self.cls,
+                                                 mp._TwoPortArray):
+            b = self.cls(self.b)
+            self.assertAllclose(getattr(b, "%s32" % b.shortname.lower()), 8)
+
+    def test_no_shortname(self):
+        if not self.cls.shortname:
+            b = self.cls(self.a)
+            self.assertRaises(AttributeError, getattr, b, "s11")
+
+    def test_pickle(self):
+        if self.cls == mp._MultiPortArray:
+            return
+        b = self.cls(self.a)
+        c = pickle.loads(pickle.dumps(b, 2))
+        self.assertIsInstance(c, self.cls)
+        self.assertAllclose(c, b)
+
     def test_init_error(self):
         if self.cls == mp._MultiPortArray:
             return
@@ -332,3 +359,46 @@ class TestConversions(TestCase):
     def testH(self):
         self._conversion(mp.HArray)
 
+
+class TestConversionEngine(TestCase):
+    def setUp(self):
+        self.a = random_complex_matrix(3, 4, 1, 2)
+
+    def test_twoport_closed_form(self):
+        for source in network_classes:
+            x = source(self.a)
+            for target in network_classes:
+                coeffs = mp.conversion_coefficients(x.P, target(x).P)
+                res = mp.convert_matrices(np.asarray(x), coeffs)
+                facit, _, _ = mp.convert(x.P, target(x).P,
+                                         x.view(type=aobj.hfarray))
+                msg = "Conversion from %r to %r failed" % (source, target)
+                self.assertAllclose(res, facit, msg=msg)
+
+    def test_cache(self):
+        x = mp.SArray(self.a)
+        c1 = mp.cached_conversion_coefficients(x, mp.ZArray(x))
+        c2 = mp.cached_conversion_coefficients(x, mp.ZArray(x))
+        self.assertIs(c1, c2)
+        y = mp.SArray(mp.ZArray(self.a), Z0=25.)
+        c3 = mp.cached_conversion_coefficients(y, mp.ZArray(x))
+        self.assertIsNot(c1, c3)
+
+    def test_Z0(self):
+        z = mp.ZArray(self.a)
+        s = mp.SArray(z, Z0=25.)
+        I = np.identity(2)
+        facit = np.matmul(np.array(z) - 25 * I,
+                          np.linalg.inv(np.array(z) + 25 * I))
+        self.assertAllclose(s, facit)
+        self.assertAllclose(mp.ZArray(s), z)
+
+    def test_nport(self):
+        z = mp.ZArray(random_complex_matrix(3, 4, 1, 3) + 2 * np.identity(3))
+        s = mp.SArray(z)
+        I = np.identity(3)
+        facit = np.matmul(np.array(z) - 50 * I,
+                          np.linalg.inv(np.array(z) + 50 * I))
+        self.assertAllclose(s, facit)
+        self.assertAllclose(mp.ZArray(s), z)
+        self.assertAllclose(mp.YArray(s), np.linalg.inv(np.array(z)))
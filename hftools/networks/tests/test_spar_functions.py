@@ -116,3 +116,157 @@ class Test_deembed(TestCase):
         r = spfun.deembed(self.b, self.c, self.b)
         self.assertAllclose(r,  make_array([[[0.025, 0j], [0, 0.025]]]))
 
+
+class Test_passive(TestCase):
+    def setUp(self):
+        self.a = make_array([[[0, 2], [0.5, 0j]],
+                             [[0.5, 0], [0, 0.5j]]])
+        dims = (aobj.DimSweep("b", 2),) + self.a.dims
+        self.b = aobj.hfarray([self.a, self.a * 4], dims=dims)
+
+    def test_check_passive(self):
+        r = spfun.check_passive(self.a)
+        self.assertAllclose(r, [1, 0.5])
+        self.assertEqual(r.dims, self.a.dims[:1])
+
+    def test_check_passive_dims(self):
+        r = spfun.check_passive(self.b)
+        self.assertAllclose(r, [[1, 0.5], [4, 2]])
+        self.assertEqual(r.dims, self.b.dims[:2])
+
+    def test_make_passive_eig(self):
+        r = spfun.make_passive_eig(self.b, delta=0.1)
+        self.assertAllclose(r[0], self.a)
+        self.assertAllclose(r[1, 0], self.a[0] * 0.9)
+        self.assertAllclose(r[1, 1], self.a[1] * 1.8)
+        self.assertEqual(r.dims, self.b.dims)
+
+    def test_make_passive_svd(self):
+        r = spfun.make_passive_svd(self.b)
+        self.assertAllclose(r[0, 0], [[0, 1], [0.5, 0]])
+        self.assertAllclose(r[0, 1], self.a[1])
+        self.assertAllclose(r[1], make_array([[[0, 1], [1, 0]],
+                                              [[1, 0], [0, 1j]]]))
+        self.assertEqual(r.dims, self.b.dims)
+
+    def test_make_passive_svd_maxiter(self):
+        r = spfun.make_passive_svd(self.b, delta=0.1, maxiter=2)
+        sigma = np.linalg.svd(np.array(r), compute_uv=False)
+        self.assertTrue((sigma <= 0.9 + 1e-12).all())
+        self.assertAllclose(r[0, 1], self.a[1])
+
+    def test_make_passive_svd_delta(self):
+        r = spfun.make_passive_svd(self.b, delta=0.1)
+        sigma = np.linalg.svd(np.array(r), compute_uv=False)
+        self.assertTrue((sigma <= 0.9 + 1e-12).all())
+
+    def test_make_passive_dims_order(self):
+        S = self.b.reorder_dimensions(self.b.dims[2])
+        for func in [spfun.make_passive_svd, spfun.make_passive_eig]:
+            r = func(S, delta=0.1)
+            self.assertEqual(r.dims, S.dims)
+            facit = func(self.b, delta=0.1).reorder_dimensions(S.dims[0])
+            self.assertTrue(np.allclose(np.array(r), np.array(facit)))
+
+
+def make_random(nports, *outer):
+    dims = tuple(aobj.DimSweep(name, n) for name, n in outer)
+    dims = dims + (aobj.DimMatrix_i("i", nports),
+                   aobj.DimMatrix_j("j", nports))
+    shape = tuple(n for _, n in outer) + (nports, nports)
+    data = np.random.randn(*shape) + 1j * np.random.randn(*shape)
+    return aobj.hfarray(0.3 * data, dims=dims)
+
+
+class Test_connect(TestCase):
+    def setUp(self):
+        self.a = make_random(2, ("f", 5))
+        self.b = make_random(2, ("b", 3), ("f", 5))
+
+    def test_cascade(self):
+        r = spfun.connect(self.a, 1, self.b, 0)
+        self.assertAllclose(r, spfun.cascadeS(self.a, self.b))
+        self.assertEqual(r.dims, spfun.cascadeS(self.a, self.b).dims)
+
+    def test_cascade_rest(self):
+        r = spfun.cascadeS(self.a, self.b, self.a)
+        r2 = spfun.connect(spfun.connect(self.a, 1, self.b, 0),
+                           1, self.a, 0)
+        self.assertAllclose(r, r2)
+
+    def test_port_order(self):
+        b = make_random(2, ("f", 5))
+        r = spfun.connect(self.a, 0, b, 1)
+        self.assertAllclose(r, spfun.cascadeS(b, self.a)[:, ::-1, ::-1])
+
+    def test_several_ports(self):
+        c = make_random(4, ("f", 5))
+        r = spfun.connect(c, [2, 3], self.b, [0, 1])
+        self.assertEqual(r.shape, (5, 3, 2, 2))
+
+    def test_length_mismatch(self):
+        self.assertRaises(ValueError, spfun.connect,
+                          self.a, [0, 1], self.b, [0])
+
+
+class Test_Circuit(TestCase):
+    def setUp(self):
+        self.a = make_random(2, ("f", 5))
+        self.b = make_random(2, ("f", 5))
+
+    def test_reduce(self):
+        c = spfun.Circuit()
+        a = c.add(self.a)
+        b = c.add(self.b)
+        c.connect((a, 1), (b, 0))
+        self.assertEqual(c.external_ports(), [(0, 0), (1, 1)])
+        self.assertAllclose(c.reduce(), spfun.cascadeS(self.a, self.b))
+
+    def test_reduce_ports(self):
+        c = spfun.Circuit()
+        a = c.add(self.a)
+        b = c.add(self.b)
+        c.connect((a, 1), (b, 0))
+        r = c.reduce(ports=[(b, 1), (a, 0)])
+        self.assertAllclose(r, spfun.cascadeS(self.a, self.b)[:, ::-1, ::-1])
+
+    def test_no_connection(self):
+        c = spfun.Circuit()
+        c.add(self.a)
+        self.assertAllclose(c.reduce(), self.a)
+
+    def test_connected_twice(self):
+        c = spfun.Circuit()
+        a = c.add(self.a)
+        b = c.add(self.b)
+        c.connect((a, 1), (b, 0))
+        c.connect((a, 1), (b, 1))
+        self.assertRaises(ValueError, c.reduce)
+
+    def test_bad_port(self):
+        c = spfun.Circuit()
+        a = c.add(self.a)
+        c.connect((a, 1), (a, 2))
+        self.assertRaises(ValueError, c.reduce)
+        for network in [1, -1]:
+            c = spfun.Circuit()
+            a = c.add(self.a)
+            c.connect((a, 1), (network, 0))
+            self.assertRaises(ValueError, c.reduce)
+
+    def test_empty(self):
+        self.assertRaises(ValueError, spfun.Circuit().reduce)
+
+
+class Test_deembed_fixture(TestCase):
+    def test_1(self):
+        T = make_random(8, ("f", 5))
+        S = make_random(4, ("f", 5), ("b", 3))
+        M = spfun.connect(T, [4, 5, 6, 7], S, [0, 1, 2, 3])
+        r = spfun.deembed_fixture(T, M)
+        self.assertAllclose(r, S)
+        self.assertEqual(r.dims, S.dims)
+
+    def test_wrong_size(self):
+        T = make_random(4, ("f", 5))
+        self.assertRaises(ValueError, spfun.deembed_fixture, T, T)
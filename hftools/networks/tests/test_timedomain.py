@@ -0,0 +1,168 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+import numpy as np
+
+import hftools.networks.timedomain as td
+from hftools.dataset import hfarray, DimSweep, DimRep, DimMatrix_i,\
+    DimMatrix_j
+from hftools.networks.multiports import SArray
+from hftools.testing import TestCase
+
+
+def make_delay(f, tau1=1e-9, tau2=3e-9):
+    """S-parameters of a line with delay tau1 and a reflection at tau2
+    """
+    S = np.zeros((2, len(f), 2, 2), complex)
+    S[..., 0, 0] = (0.3 * np.exp(-2j * np.pi * f * tau1) -
+                    0.2 * np.exp(-2j * np.pi * f * tau2))
+    S[..., 0, 1] = S[..., 1, 0] = np.exp(-2j * np.pi * f * tau1)
+    S[1] *= 2
+    dims = (DimRep("bias", 2), DimSweep("freq", f),
+            DimMatrix_i("i", 2), DimMatrix_j("j", 2))
+    S = SArray(S, dims=dims)
+    S.Z0 = 25.
+    return S
+
+
+class Test_get_window(TestCase):
+    def test_rect(self):
+        self.assertAllclose(td.get_window("rect", 3), [1, 1, 1])
+
+    def test_nonzero_ends(self):
+        for name in ["hann", "hamming", "blackman", 6]:
+            w = td.get_window(name, 11)
+            self.assertEqual(len(w), 11)
+            self.assertTrue((w > 0).all())
+            self.assertAllclose(w, w[::-1])
+
+    def test_unknown(self):
+        self.assertRaises(ValueError, td.get_window, "kalle", 3)
+
+
+class Test_extrapolate_dc(TestCase):
+    def test_1(self):
+        x = np.array([[2 + 1j, 3, 4], [1, 1, 1]])
+        res = td.extrapolate_dc(x, np.array([1., 2, 3]), axis=1)
+        self.assertAllclose(res, [[1, 2 + 1j, 3, 4], [1, 1, 1, 1]])
+
+
+class Test_TimeDomainPlan(TestCase):
+    def test_lowpass(self):
+        plan = td.TimeDomainPlan(np.arange(1, 11) * 1e9)
+        self.assertTrue(plan.add_dc)
+        self.assertEqual(plan.nfft, 20)
+        self.assertAllclose(plan.t, np.arange(20) * 50e-12)
+        self.assertAllclose(plan.window[0], 1)
+
+    def test_lowpass_dc(self):
+        plan = td.TimeDomainPlan(np.arange(0, 11) * 1e9, nfft=40)
+        self.assertFalse(plan.add_dc)
+        self.assertEqual(plan.nfft, 40)
+        self.assertAllclose(plan.scale, 2)
+
+    def test_bandpass(self):
+        plan = td.TimeDomainPlan(np.arange(3, 13) * 1e9, mode="bandpass")
+        self.assertEqual(plan.nfft, 10)
+
+    def test_errors(self):
+        self.assertRaises(ValueError, td.TimeDomainPlan, [1e9])
+        self.assertRaises(ValueError, td.TimeDomainPlan, [1e9, 2e9, 4e9])
+        self.assertRaises(ValueError, td.TimeDomainPlan, [3e9, 4e9, 5e9])
+        self.assertRaises(ValueError, td.TimeDomainPlan, [1e9, 2e9],
+                          mode="kalle")
+        self.assertRaises(ValueError, td.TimeDomainPlan, [1e9, 2e9], nfft=1)
+
+    def test_cache(self):
+        f = np.arange(1, 11) * 1e9
+        self.assertIs(td.get_plan(f), td.get_plan(f.copy()))
+        self.assertIsNot(td.get_plan(f), td.get_plan(f, window="hann"))
+
+    def test_lru(self):
+        f = np.arange(1, 11) * 1e9
+        first = td.get_plan(f)
+        for nfft in range(20, 20 + td._max_plans + 5):
+            td.get_plan(f)
+            td.get_plan(f, nfft=nfft)
+        self.assertIs(first, td.get_plan(f))
+        self.assertTrue(len(td._plans) <= td._max_plans)
+
+
+class Test_impulse_response(TestCase):
+    def setUp(self):
+        self.f = np.arange(1, 1001) * 10e6
+        self.S = make_delay(self.f)
+
+    def test_lowpass(self):
+        h = td.impulse_response(self.S, window="rect")
+        self.assertEqual(h.dims[0], self.S.dims[0])
+        self.assertEqual(h.dims[1].name, "time")
+        self.assertEqual(h.dims[2:], self.S.dims[2:])
+        self.assertEqual(h.shape, (2, 2000, 2, 2))
+        t = h.dims[1].data
+        s21 = np.array(h)[:, :, 1, 0]
+        self.assertAllclose(t[s21.argmax(axis=1)], [1e-9, 1e-9])
+        self.assertAllclose(s21.max(axis=1), [1, 2], rtol=1e-3)
+
+    def test_nfft(self):
+        h = td.impulse_response(self.S, window="rect", nfft=4000)
+        s21 = np.array(h)[:, :, 1, 0]
+        self.assertAllclose(s21.max(axis=1), [1, 2], rtol=1e-3)
+
+    def test_bandpass(self):
+        h = td.impulse_response(self.S, mode="bandpass", window="rect")
+        self.assertTrue(np.iscomplexobj(h))
+        t = h.dims[1].data
+        s11 = abs(np.array(h)[0, :, 0, 0])
+        self.assertAllclose(t[s11.argmax()], 1e-9)
+
+    def test_step(self):
+        h = td.step_response(self.S)
+        s21 = np.array(h)[:, :, 1, 0]
+        self.assertAllclose(s21[:, -1], [1, 2], rtol=1e-2)
+        self.assertAllclose(s21[:, 10], [0, 0], atol=1e-2)
+
+
+class Test_time_gate(TestCase):
+    def setUp(self):
+        self.f = np.arange(1, 1001) * 10e6
+        self.S = make_delay(self.f)
+
+    def test_full_gate(self):
+        g = td.time_gate(self.S, 0, 1)
+        self.assertIsInstance(g, SArray)
+        self.assertEqual(g.Z0, 25.)
+        self.assertEqual(g.dims, self.S.dims)
+        self.assertAllclose(g, self.S)
+
+    def test_gate(self):
+        g = td.time_gate(self.S, 0.5e-9, 1.5e-9)
+        facit = 0.3 * np.exp(-2j * np.pi * self.f * 1e-9)
+        self.assertAllclose(np.array(g)[0, 100:900, 0, 0], facit[100:900],
+                            atol=1e-2)
+        self.assertAllclose(np.array(g)[:, 100:900, 1, 0],
+                            np.array(self.S)[:, 100:900, 1, 0], rtol=2e-2)
+
+    def test_gate_around_zero(self):
+        dims = (DimSweep("freq", self.f),)
+        x = hfarray(0.5 * np.ones(len(self.f)), dims=dims)
+        g = td.time_gate(x, -0.5e-9, 0.5e-9)
+        self.assertAllclose(abs(np.array(g))[:900], 0.5, atol=1e-2)
+
+    def test_bandpass_gate(self):
+        g = td.time_gate(self.S, 2.5e-9, 3.5e-9, mode="bandpass")
+        facit = -0.2 * np.exp(-2j * np.pi * self.f * 3e-9)
+        self.assertAllclose(np.array(g)[0, 100:900, 0, 0], facit[100:900],
+                            atol=1e-2)
+
+    def test_real_input(self):
+        dims = (DimSweep("freq", self.f),)
+        x = hfarray(np.ones(len(self.f)), dims=dims)
+        g = td.time_gate(x, 0, 1, window="rect")
+        self.assertTrue(np.iscomplexobj(g))
+        self.assertAllclose(g, 1)
@@ -0,0 +1,133 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import hftools.networks.vectorfit as vf
+from hftools.dataset import hfarray, DimSweep, DimRep, DimMatrix_i,\
+    DimMatrix_j, DataBlock
+from hftools.file_formats.hdf5 import read_hdf5, save_hdf5
+from hftools.networks.multiports import SArray
+from hftools.testing import TestCase
+
+poles = np.array([-1e8 + 2j * np.pi * 2e9, -3e8 + 2j * np.pi * 5e9,
+                  -2e8 + 2j * np.pi * 8e9])
+
+
+def rational(f, residues, d):
+    s = 2j * np.pi * np.asarray(f)[:, np.newaxis, np.newaxis, np.newaxis]
+    res = d
+    for p, r in zip(poles, np.rollaxis(residues, -1)):
+        res = res + r / (s - p) + r.conjugate() / (s - p.conjugate())
+    return np.rollaxis(res, 0, 2)
+
+
+class Test_vector_fit(TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.residues = 1e8 * (rng.randn(3, 2, 2, 3) +
+                               1j * rng.randn(3, 2, 2, 3))
+        self.d = 0.1 * rng.randn(3, 2, 2)
+        self.f = np.linspace(0.1e9, 10e9, 201)
+        dims = (DimRep("bias", 3), DimSweep("freq", self.f),
+                DimMatrix_i("i", 2), DimMatrix_j("j", 2))
+        self.S = SArray(rational(self.f, self.residues, self.d), dims=dims)
+        self.model = vf.vector_fit(self.S, npoles=6, niter=8)
+
+    def test_poles(self):
+        self.assertAllclose(np.sort_complex(self.model.poles),
+                            np.sort_complex(np.concatenate((poles,
+                                                            poles.conj()))))
+
+    def test_evaluate(self):
+        f = np.sort(np.random.uniform(0.1e9, 10e9, 333))
+        res = self.model(f)
+        self.assertIsInstance(res, SArray)
+        self.assertEqual(res.dims[0], self.S.dims[0])
+        self.assertEqual(res.dims[1].name, "freq")
+        self.assertAllclose(res.dims[1].data, f)
+        self.assertEqual(res.dims[2:], self.S.dims[2:])
+        self.assertAllclose(res, rational(f, self.residues, self.d),
+                            atol=1e-9)
+
+    def test_freq_last(self):
+        dims = (DimRep("bias", 3), DimMatrix_i("i", 2),
+                DimMatrix_j("j", 2), DimSweep("freq", self.f))
+        S = hfarray(np.moveaxis(np.array(self.S), 1, -1), dims=dims)
+        model = vf.vector_fit(S, npoles=6, niter=8, asymptote=False)
+        res = model(self.f)
+        self.assertEqual(res.dims[:3], S.dims[:3])
+        self.assertEqual(res.dims[3].name, "freq")
+        self.assertIsInstance(res, hfarray)
+        self.assertAllclose(res, S, atol=0.2)
+
+    def test_odd_npoles(self):
+        model = vf.vector_fit(self.S, npoles=7, niter=3)
+        self.assertEqual(len(model.poles), 7)
+        self.assertTrue((model.poles.real < 0).all())
+
+    def test_datablock(self):
+        db = DataBlock()
+        db.S = self.S
+        self.model.to_datablock(db)
+        self.assertEqual(db.vf_residues.dims[1].name, "vf_pole")
+        model = vf.RationalModel.from_datablock(db, arraycls=SArray)
+        self.assertAllclose(model(self.f), self.model(self.f))
+        dims = model(self.f).dims
+        self.assertEqual(dims[::2], self.S.dims[::2])
+        self.assertEqual(dims[1].name, "freq")
+        self.assertIsInstance(model(self.f), SArray)
+
+    def test_datablock_Z0(self):
+        self.model.Z0 = 25.
+        db = self.model.to_datablock(DataBlock())
+        model = vf.RationalModel.from_datablock(db, arraycls=SArray)
+        self.assertEqual(model.Z0, 25.)
+        self.assertEqual(model(self.f).Z0, 25.)
+
+    def test_hdf5_Z0(self):
+        self.model.Z0 = 25.
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmpdir, "model.hdf5")
+            save_hdf5(self.model.to_datablock(DataBlock()), fname)
+            db = read_hdf5(fname)
+        finally:
+            shutil.rmtree(tmpdir)
+        model = vf.RationalModel.from_datablock(db, arraycls=SArray)
+        self.assertEqual(model(self.f).Z0, 25.)
+        self.assertAllclose(model(self.f), self.model(self.f))
+
+
+class Test_make_passive(TestCase):
+    def setUp(self):
+        f = np.linspace(0.1e9, 10e9, 101)
+        s = 2j * np.pi * f
+        p = -1e9 + 2j * np.pi * 4e9
+        S = np.zeros((3, 101, 2, 2), complex)
+        S[..., 1, 0] = S[..., 0, 1] = (1.05e9 / (s - p) +
+                                       1.05e9 / (s - p.conjugate()))
+        S[..., 0, 0] = 0.1
+        S[0] *= 0.5
+        S[2] *= 1.2
+        dims = (DimRep("bias", 3), DimSweep("freq", f),
+                DimMatrix_i("i", 2), DimMatrix_j("j", 2))
+        self.model = vf.vector_fit(SArray(S, dims=dims), npoles=2, niter=5)
+        self.f = np.linspace(0, 20e9, 1000)
+
+    def test_passive(self):
+        model = self.model.make_passive(self.f, delta=1e-3)
+        sigma = np.linalg.svd(np.array(model(self.f)), compute_uv=False)
+        self.assertTrue((sigma <= 0.999 + 1e-9).all())
+        self.assertAllclose(model(self.f)[0], self.model(self.f)[0])
+        self.assertAllclose(model(self.f), self.model(self.f), atol=0.3)
+        self.assertAllclose(model.poles, self.model.poles)
@@ -0,0 +1,218 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""
+Time domain
+===========
+
+Time domain transforms of arrays with a frequency sweep, e.g.
+:class:`SArray`. The transforms work along the *freq* dim and are batched
+over all other dims.
+
+In *lowpass* mode the frequency grid must be harmonic, i.e. f = k * df,
+and a missing DC point is extrapolated. The time response is real and
+both impulse and step responses are available. In *bandpass* mode any
+equidistant grid can be used and the time response is complex.
+
+Windows, time axes and FFT sizes only depend on the frequency grid and are
+kept in :class:`TimeDomainPlan` objects that are cached by :func:`get_plan`.
+
+.. autofunction:: impulse_response
+
+.. autofunction:: step_response
+
+.. autofunction:: time_gate
+
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from hftools.dataset import hfarray, DimSweep
+
+
+def get_window(window, N):
+    """Return symmetric window of length *N*.
+
+    *window* is one of "rect", "hann", "hamming", "blackman" or a number
+    that is used as beta of a kaiser window. The end points are nonzero so
+    the window can be removed again after gating.
+    """
+    if window in ("rect", "boxcar", None):
+        return np.ones(N)
+    elif window == "hann":
+        return np.hanning(N + 2)[1:-1]
+    elif window == "hamming":
+        return np.hamming(N)
+    elif window == "blackman":
+        return np.blackman(N + 2)[1:-1]
+    try:
+        beta = float(window)
+    except (TypeError, ValueError):
+        raise ValueError("Unknown window %r" % (window,))
+    return np.kaiser(N, beta)
+
+
+def extrapolate_dc(x, f, axis=-1):
+    """Return *x* with a DC point added along *axis*.
+
+    The DC value is real and linearly extrapolated from the real part of
+    the two lowest frequency points. *f* must be harmonic.
+    """
+    x = np.asarray(x)
+    x1 = np.take(x, [0], axis=axis).real
+    x2 = np.take(x, [1], axis=axis).real
+    dc = x1 - f[0] * (x2 - x1) / (f[1] - f[0])
+    return np.concatenate((dc.astype(x.dtype), x), axis=axis)
+
+
+class TimeDomainPlan(object):
+    """Precomputed data for time domain transforms on frequency grid *f*.
+
+    *mode* is "lowpass" or "bandpass", *window* is passed to
+    :func:`get_window` and *nfft* is the FFT length, larger values than the
+    default zero pads the spectrum which interpolates the time response.
+    The time response is scaled so its amplitude does not depend on *nfft*.
+    """
+    def __init__(self, f, mode="lowpass", window=6, nfft=None):
+        f = np.asarray(f, dtype=float)
+        if f.ndim != 1 or len(f) < 2:
+            raise ValueError("Need at least two frequency points")
+        df = f[1] - f[0]
+        if df <= 0 or not np.allclose(np.diff(f), df, rtol=1e-6, atol=0):
+            raise ValueError("Frequency grid must be equidistant")
+        self.f = f
+        self.df = df
+        self.mode = mode
+        if mode == "lowpass":
+            k0 = f[0] / df
+            if abs(k0 - round(k0)) > 1e-6 or round(k0) > 1:
+                msg = ("Lowpass mode needs a harmonic frequency grid "
+                       "starting at 0 or df")
+                raise ValueError(msg)
+            self.add_dc = round(k0) == 1
+            nbins = len(f) + self.add_dc
+            self.window = get_window(window, 2 * nbins - 1)[nbins - 1:]
+            default_nfft = 2 * (nbins - 1)
+        elif mode == "bandpass":
+            self.add_dc = False
+            nbins = len(f)
+            self.window = get_window(window, nbins)
+            default_nfft = nbins
+        else:
+            raise ValueError("Unknown mode %r" % (mode,))
+        if nfft is None:
+            nfft = default_nfft
+        elif nfft < default_nfft:
+            raise ValueError("nfft must be at least %d" % default_nfft)
+        self.nbins = nbins
+        self.nfft = nfft
+        self.scale = nfft / float(default_nfft)
+        self.t = np.arange(nfft) / (nfft * df)
+
+    def _shape(self, ndim, axis):
+        shape = [1] * ndim
+        shape[axis] = -1
+        return shape
+
+    def to_time(self, x, axis=-1):
+        """Windowed transform of ndarray *x* to time domain along *axis*
+        """
+        x = np.asarray(x)
+        if self.add_dc:
+            x = extrapolate_dc(x, self.f, axis)
+        x = x * self.window.reshape(self._shape(x.ndim, axis))
+        if self.mode == "lowpass":
+            return np.fft.irfft(x, self.nfft, axis=axis) * self.scale
+        else:
+            return np.fft.ifft(x, self.nfft, axis=axis) * self.scale
+
+    def to_freq(self, h, axis=-1):
+        """Transform time response *h* from :meth:`to_time` back to the
+        frequency grid and remove the window.
+        """
+        if self.mode == "lowpass":
+            x = np.fft.rfft(h, axis=axis) / self.scale
+        else:
+            x = np.fft.fft(h, axis=axis) / self.scale
+        x = np.take(x, np.arange(self.add_dc, self.nbins), axis=axis)
+        window = self.window[self.add_dc:]
+        return x / window.reshape(self._shape(x.ndim, axis))
+
+
+_plans = OrderedDict()
+_max_plans = 64
+
+
+def get_plan(f, mode="lowpass", window=6, nfft=None):
+    """Return cached :class:`TimeDomainPlan` for frequency grid *f*
+    """
+    f = np.asarray(f, dtype=float)
+    key = (f.tobytes(), mode, window, nfft)
+    try:
+        plan = _plans.pop(key)
+    except KeyError:
+        plan = TimeDomainPlan(f, mode, window, nfft)
+        if len(_plans) >= _max_plans:
+            _plans.popitem(last=False)
+    except TypeError:
+        return TimeDomainPlan(f, mode, window, nfft)
+    _plans[key] = plan
+    return plan
+
+
+def _time_response(S, mode, window, nfft, dim):
+    axis = S.dims_index(dim)
+    plan = get_plan(S.dims[axis].data, mode, window, nfft)
+    h = plan.to_time(S, axis)
+    dims = list(S.dims)
+    dims[axis] = DimSweep("time", plan.t, unit="s")
+    return h, axis, dims, plan
+
+
+def impulse_response(S, mode="lowpass", window=6, nfft=None, dim="freq"):
+    """Return impulse response of *S* as an hfarray where the *dim*
+    frequency sweep is replaced by a *time* sweep.
+    """
+    h, axis, dims, plan = _time_response(S, mode, window, nfft, dim)
+    return hfarray(h, dims=dims, copy=False)
+
+
+def step_response(S, window=6, nfft=None, dim="freq"):
+    """Return lowpass step response of *S* as an hfarray where the *dim*
+    frequency sweep is replaced by a *time* sweep.
+    """
+    h, axis, dims, plan = _time_response(S, "lowpass", window, nfft, dim)
+    step = np.cumsum(h, axis=axis) / plan.scale
+    return hfarray(step, dims=dims, copy=False)
+
+
+def time_gate(S, start, stop, mode="lowpass", window=6, gate="rect",
+              nfft=None, dim="freq"):
+    """Gate *S* in time domain and transform back to frequency domain.
+
+    The time response is multiplied by a *gate* window, see
+    :func:`get_window`, that is nonzero for *start* <= t <= *stop*. The
+    time response is periodic with period 1 / df so negative times, e.g. a
+    gate around a reflection at t = 0, wrap to the end of the time axis.
+    The result has the same class and dims as *S*.
+    """
+    axis = S.dims_index(dim)
+    plan = get_plan(S.dims[axis].data, mode, window, nfft)
+    h = plan.to_time(S, axis)
+    t = start + np.mod(plan.t - start, 1 / plan.df)
+    idx = np.flatnonzero(t <= stop)
+    idx = idx[np.argsort(t[idx], kind="mergesort")]
+    g = np.zeros(plan.nfft)
+    g[idx] = get_window(gate, len(idx))
+    h = h * g.reshape(plan._shape(h.ndim, axis))
+    out = S.astype(np.result_type(S.dtype, complex))
+    if hasattr(S, "Z0"):
+        out.Z0 = S.Z0
+    np.asarray(out)[...] = plan.to_freq(h, axis)
+    return out
@@ -0,0 +1,330 @@
+# -*- coding: ISO-8859-1 -*-
+#-----------------------------------------------------------------------------
+# Copyright (c) 2014, HFTools Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+"""
+Vector fitting
+==============
+
+Rational pole-residue models of frequency responses, e.g. :class:`SArray`,
+fitted with vector fitting [#]_. All responses (ports and bias points)
+share one set of poles so the residues of all responses are found in one
+least squares solve, and the model is evaluated at any frequencies with a
+single matrix product.
+
+.. [#] B. Gustavsen and A. Semlyen, "Rational approximation of frequency
+       domain responses by vector fitting", IEEE Trans. Power Delivery,
+       vol. 14, no. 3, pp. 1052-1061, 1999.
+
+.. autofunction:: vector_fit
+
+.. autoclass:: RationalModel
+    :members:
+
+"""
+import numpy as np
+
+from hftools.dataset import hfarray, DimSweep, DimRep
+
+
+def _basis(s, poles):
+    """Return complex basis matrix with one column per real coefficient.
+
+    *poles* contains real poles and one pole of each complex pair (with
+    positive imaginary part). A complex pair gives the two columns
+    1/(s-a) + 1/(s-a*) and j/(s-a) - j/(s-a*).
+    """
+    cols = []
+    for a in poles:
+        if a.imag == 0:
+            cols.append(1 / (s - a.real))
+        else:
+            cols.append(1 / (s - a) + 1 / (s - a.conjugate()))
+            cols.append(1j / (s - a) - 1j / (s - a.conjugate()))
+    return np.array(cols).T
+
+
+def _realstack(x):
+    return np.concatenate((x.real, x.imag), axis=0)
+
+
+def _full_poles(poles):
+    """Return all poles, including conjugates, in basis column order
+    """
+    out = []
+    for a in poles:
+        if a.imag == 0:
+            out.append(complex(a.real))
+        else:
+            out.extend([a, a.conjugate()])
+    return np.array(out, dtype=complex)
+
+
+def _coefficients_to_residues(poles, coeffs):
+    """Convert real coefficients (..., N) of :func:`_basis` to complex
+    residues of :func:`_full_poles`
+    """
+    res = np.array(coeffs, dtype=complex)
+    idx = 0
+    for a in poles:
+        if a.imag == 0:
+            idx += 1
+        else:
+            c1, c2 = coeffs[..., idx], coeffs[..., idx + 1]
+            res[..., idx] = c1 + 1j * c2
+            res[..., idx + 1] = c1 - 1j * c2
+            idx += 2
+    return res
+
+
+def _residues_to_coefficients(poles, residues):
+    """Inverse of :func:`_coefficients_to_residues`
+    """
+    coeffs = np.array(residues.real)
+    idx = 0
+    for a in poles:
+        if a.imag == 0:
+            idx += 1
+        else:
+            coeffs[..., idx + 1] = residues[..., idx].imag
+            idx += 2
+    return coeffs
+
+
+def _initial_poles(w, npoles):
+    """Complex pairs with imaginary parts spread over *w* and a real pole
+    if *npoles* is odd
+    """
+    beta = np.linspace(w[0], w[-1], npoles // 2)
+    poles = list(-beta / 100 + 1j * beta)
+    if npoles % 2:
+        poles.append(complex(-w[-1]))
+    return np.array(poles)
+
+
+def _relocate_poles(s, H, poles, chunksize):
+    """One vector fitting pole relocation step for responses *H* (Nf, K)
+    """
+    phi = _basis(s, poles)
+    N = phi.shape[1]
+    P = _realstack(np.column_stack((phi, np.ones(len(s)))))
+    Q1 = np.linalg.qr(P)[0]
+    Rs = []
+    for start in range(0, H.shape[1], chunksize):
+        h = H[:, start:start + chunksize].T[:, :, np.newaxis]
+        B = np.concatenate((-h * phi, h), axis=2)
+        B = np.concatenate((B.real, B.imag), axis=1)
+        B = B - np.matmul(Q1, np.matmul(Q1.T, B))
+        Rs.append(np.linalg.qr(B.reshape(-1, N + 1), mode="r"))
+    R = np.linalg.qr(np.concatenate(Rs, axis=0), mode="r")
+    c = np.linalg.lstsq(R[:N, :N], R[:N, N], rcond=None)[0]
+
+    A = np.zeros((N, N))
+    b = np.zeros(N)
+    idx = 0
+    for a in poles:
+        if a.imag == 0:
+            A[idx, idx] = a.real
+            b[idx] = 1
+            idx += 1
+        else:
+            A[idx:idx + 2, idx:idx + 2] = [[a.real, a.imag],
+                                           [-a.imag, a.real]]
+            b[idx] = 2
+            idx += 2
+    new = np.linalg.eigvals(A - np.outer(b, c))
+    new = np.where(new.real > 0, -new.real + 1j * new.imag, new)
+    tol = 1e-9 * abs(new).max()
+    real = np.sort(new[abs(new.imag) <= tol].real)
+    pairs = new[new.imag > tol]
+    return np.concatenate((real.astype(complex),
+                           pairs[np.argsort(pairs.imag)]))
+
+
+def _fit_residues(s, H, poles, asymptote=True):
+    """Return (residues, d) of responses *H* (Nf, K) with fixed *poles*
+    """
+    phi = _basis(s, poles)
+    if asymptote:
+        phi = np.column_stack((phi, np.ones(len(s))))
+    x = np.linalg.lstsq(_realstack(phi), _realstack(H), rcond=None)[0]
+    if asymptote:
+        x, d = x[:-1], x[-1]
+    else:
+        d = np.zeros(H.shape[1])
+    return _coefficients_to_residues(poles, x.T), d
+
+
+class RationalModel(object):
+    """Pole-residue model H(s) = sum(r_n / (s - p_n)) + d.
+
+    *poles* are all poles in rad/s. *residues* has the dims of the fitted
+    array with the frequency dim replaced by a pole dim at index *axis*.
+    *d* has the remaining dims. Calling the model with an array of
+    frequencies returns an array of class *cls* with a *freqname* sweep.
+    """
+    def __init__(self, poles, residues, d, dims, axis, cls=hfarray,
+                 freqname="freq", Z0=None):
+        self.poles = np.asarray(poles, dtype=complex)
+        self.residues = np.asarray(residues, dtype=complex)
+        self.d = np.asarray(d)
+        self.dims = tuple(dims)
+        self.axis = axis
+        self.cls = cls
+        self.freqname = freqname
+        self.Z0 = Z0
+
+    def _flat(self):
+        R = np.moveaxis(self.residues, self.axis, -1)
+        return R.reshape(-1, len(self.poles)), self.d.reshape(-1)
+
+    def _evaluate(self, f):
+        s = 2j * np.pi * np.asarray(f, dtype=float)
+        R, d = self._flat()
+        return np.dot(1 / (s[:, np.newaxis] - self.poles), R.T) + d
+
+    def __call__(self, f):
+        """Evaluate model at frequencies *f* in Hz
+        """
+        f = np.asarray(f, dtype=float)
+        H = self._evaluate(f)
+        restshape = self.d.shape
+        H = np.moveaxis(H.reshape((len(f),) + restshape), 0, self.axis)
+        dims = list(self.dims)
+        dims[self.axis] = DimSweep(self.freqname, f, unit="Hz")
+        out = self.cls(H, dims=dims)
+        if self.Z0 is not None:
+            out.Z0 = self.Z0
+        return out
+
+    def make_passive(self, f, delta=1e-6, maxiter=10):
+        """Return model with residues perturbed to make it passive at the
+        frequencies *f*.
+
+        The matrix dims must be the last two dims. In each iteration the
+        residues (and d) are changed, with the smallest change of the
+        response on *f*, so that the peaks of the singular values above
+        1 - delta move to 1 - delta to first order. The poles are kept
+        fixed. Stops when no singular value is above the limit or after
+        *maxiter* iterations.
+        """
+        f = np.asarray(f, dtype=float)
+        wscale = abs(self.poles).max()
+        poles = self.poles[self.poles.imag >= 0] / wscale
+        phi = _basis(2j * np.pi * f / wscale, poles)
+        asymptote = bool(np.any(self.d))
+        restshape = self.d.shape
+        nports = restshape[-1]
+        R = np.moveaxis(self.residues, self.axis, -1) / wscale
+        X = _residues_to_coefficients(poles, R)
+        if asymptote:
+            phi = np.column_stack((phi, np.ones(len(f))))
+            X = np.concatenate((X, self.d[..., np.newaxis]), axis=-1)
+        X = X.reshape((-1, nports, nports, phi.shape[1]))
+        # Changes are measured as the change of the response on *f*
+        G = np.dot(phi.conjugate().T, phi).real
+        G += 1e-12 * np.trace(G) * np.identity(len(G))
+        Linv = np.linalg.inv(np.linalg.cholesky(G)).T
+        limit = 1 - delta
+        for _ in range(maxiter):
+            H = np.einsum("fk,gpqk->gfpq", phi, X)
+            u, sigma, vh = np.linalg.svd(H)
+            if not (sigma > limit).any():
+                break
+            # constrain the local maxima of the violations
+            padded = np.pad(sigma, ((0, 0), (1, 1), (0, 0)), "constant")
+            active = ((sigma > limit) & (sigma >= padded[:, :-2]) &
+                      (sigma >= padded[:, 2:]))
+            for g in np.flatnonzero(active.any(axis=(1, 2))):
+                fidx, kidx = np.nonzero(active[g])
+                uu = u[g, fidx, :, kidx].conjugate()
+                vv = vh[g, fidx, kidx, :].conjugate()
+                basis = np.dot(phi[fidx], Linv)
+                rows = (uu[:, :, np.newaxis, np.newaxis] *
+                        vv[:, np.newaxis, :, np.newaxis] *
+                        basis[:, np.newaxis, np.newaxis]).real
+                dy = np.linalg.lstsq(rows.reshape(len(fidx), -1),
+                                     limit - sigma[g, fidx, kidx],
+                                     rcond=1e-8)[0]
+                X[g] += np.dot(dy.reshape(X.shape[1:]), Linv.T)
+        X = X.reshape(restshape + (-1,))
+        if asymptote:
+            X, d = X[..., :-1], X[..., -1]
+        else:
+            d = self.d
+        residues = _coefficients_to_residues(poles, X) * wscale
+        return RationalModel(self.poles, np.moveaxis(residues, -1, self.axis),
+                             d, self.dims, self.axis, self.cls,
+                             self.freqname, self.Z0)
+
+    def to_datablock(self, db, prefix="vf"):
+        """Add the model to DataBlock *db* as the variables <prefix>_poles,
+        <prefix>_residues, <prefix>_d and <prefix>_Z0 (if Z0 is set), e.g.
+        to save it to hdf5 next to the data.
+        """
+        poledim = DimRep(prefix + "_pole", len(self.poles))
+        db[prefix + "_poles"] = hfarray(self.poles, dims=(poledim,))
+        dims = list(self.dims)
+        dims[self.axis] = poledim
+        db[prefix + "_residues"] = hfarray(self.residues, dims=dims)
+        restdims = dims[:self.axis] + dims[self.axis + 1:]
+        db[prefix + "_d"] = hfarray(self.d, dims=restdims)
+        if self.Z0 is not None:
+            db[prefix + "_Z0"] = hfarray(self.Z0)
+        return db
+
+    @classmethod
+    def from_datablock(cls, db, prefix="vf", arraycls=hfarray,
+                       freqname="freq"):
+        """Return model stored in *db* by :meth:`to_datablock`
+        """
+        residues = db[prefix + "_residues"]
+        axis = residues.dims_index(prefix + "_pole")
+        dims = list(residues.dims)
+        dims[axis] = DimSweep(freqname, 1)
+        restdims = dims[:axis] + dims[axis + 1:]
+        d = db[prefix + "_d"].reorder_dimensions(*restdims)
+        Z0 = None
+        if prefix + "_Z0" in db:
+            Z0 = db[prefix + "_Z0"]
+            if not Z0.dims:
+                Z0 = Z0.item()
+        return cls(db[prefix + "_poles"], residues, d, dims, axis,
+                   cls=arraycls, freqname=freqname, Z0=Z0)
+
+
+def vector_fit(S, npoles=10, niter=10, asymptote=True, poles=None,
+               dim="freq", chunksize=64):
+    """Fit a :class:`RationalModel` with common poles to *S*.
+
+    *npoles* is the number of poles, conjugate pairs counted as two, and
+    *niter* the number of pole relocation iterations. With *asymptote* the
+    model has a constant term d. *poles* are optional starting poles in
+    rad/s, one of each conjugate pair. The pole relocation processes
+    *chunksize* responses at a time to limit memory use.
+    """
+    axis = S.dims_index(dim)
+    f = np.asarray(S.dims[axis].data, dtype=float)
+    wscale = 2 * np.pi * f.max()
+    s = 2j * np.pi * f / wscale
+    H = np.moveaxis(np.asarray(S), axis, 0)
+    restshape = H.shape[1:]
+    H = H.reshape(len(f), -1)
+    if poles is None:
+        w = 2 * np.pi * np.array([max(f.min(), f.max() / 100), f.max()])
+        poles = _initial_poles(w / wscale, npoles)
+    else:
+        poles = np.asarray(poles, dtype=complex) / wscale
+    for _ in range(niter):
+        poles = _relocate_poles(s, H, poles, chunksize)
+    residues, d = _fit_residues(s, H, poles, asymptote)
+    residues = residues.reshape(restshape + (-1,)) * wscale
+    return RationalModel(_full_poles(poles) * wscale,
+                         np.moveaxis(residues, -1, axis),
+                         d.reshape(restshape), S.dims, axis,
+                         cls=S.__class__, freqname=dim,
+                         Z0=getattr(S, "Z0", None))
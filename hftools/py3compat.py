@@ -54,6 +54,7 @@ if sys.version_info[0] >= 3:
     def reraise(tp, value, tb=None):
         raise tp(value).with_traceback(tb)
     import copyreg
+    import pickle
     import builtins
     import itertools
     from subprocess import Popen, PIPE
@@ -76,6 +77,7 @@ else:
     raise tp, value, tb
 """)
     import copy_reg as copyreg
+    import cPickle as pickle
     import os
 
     def popen(command):
@@ -239,6 +239,20 @@ class Test_smooth(TestCase):
     def test_2(self):
         self._help(*self.data[2])
 
+    def test_axis(self):
+        data = np.random.randn(4, 9)
+        facit = hfmath.smooth(data.T, 3).T
+        self.assertAllclose(hfmath.smooth(data, 3, axis=1), facit)
+        self.assertAllclose(hfmath.smooth(data, 3, axis=-1), facit)
+
+    def test_dim_name(self):
+        dims = (DimSweep("r", 4), DimSweep("freq", 9))
+        data = hfarray(np.random.randn(4, 9), dims=dims, unit="V")
+        res = hfmath.smooth(data, 4, axis="freq")
+        self.assertEqual(res.dims, dims)
+        self.assertEqual(res.unit, "V")
+        self.assertAllclose(res, hfmath.smooth(np.array(data).T, 4).T)
+
 
 class Test_smooth_mag_phase(TestCase):
     data = [(np.linspace(1, 5, 10) * np.exp(np.linspace(0, 1, 10) * 1j),
@@ -284,6 +298,29 @@ class Test_poly_smooth(TestCase):
     def test_2(self):
         self._help(*self.data[2])
 
+    def test_axis(self):
+        x = np.linspace(0, 1, 11)
+        y = np.random.randn(3, 11)
+        res = hfmath.poly_smooth(x, y, 5, axis=1, N=2)
+        self.assertAllclose(res, hfmath.poly_smooth(x, y.T, 5, N=2).T)
+
+    def test_aperture_error(self):
+        self.assertRaises(ValueError, hfmath.poly_smooth, np.arange(3.),
+                          np.arange(3.), 4)
+
+
+class Test_poly_smooth_weights(TestCase):
+    def test_savitzky_golay(self):
+        index, weights = hfmath.poly_smooth_weights(np.arange(9.), 5, N=2)
+        self.assertAllclose(index[4], [2, 3, 4, 5, 6])
+        self.assertAllclose(weights[4], np.array([-3, 12, 17, 12, -3]) / 35.)
+
+    def test_edges(self):
+        index, weights = hfmath.poly_smooth_weights(np.arange(6.), 4, N=3)
+        self.assertAllclose(index[0], [0, 1, 2, 3])
+        self.assertAllclose(index[-1], [1, 2, 3, 4])
+        self.assertAllclose(weights[0], [1, 0, 0, 0])
+
 
 class Test_linear_extrapolate(TestCase):
     def test_linear_extrapolate_1(self):
@@ -348,6 +385,21 @@ class Test_poly_smooth_mag_phase(TestCase):
         self._help(self.data[0][0], y, *self.data[0][2:])
 
 
+class Test_smooth_magphase_axis(TestCase):
+    def test_axis(self):
+        dims = (DimSweep("r", 2), DimSweep("freq", 10))
+        y = (np.linspace(1, 5, 10) * np.exp(np.linspace(0, 1, 10) * 1j) *
+             np.array([[1], [2]]))
+        y = hfarray(y, dims=dims)
+        res = hfmath.smooth_magphase(y, 2, axis="freq")
+        self.assertEqual(res.dims, dims)
+        facit = hfmath.smooth_magphase(y.transpose(1, 0), 2).transpose(1, 0)
+        self.assertAllclose(res, facit)
+        x = np.linspace(0, 10, 10)
+        res = hfmath.poly_smooth_magphase(x, y, 4, axis=1, N=2)
+        self.assertAllclose(res, y)
+
+
 class TestInv(TestCase):
     def setUp(self):
         self.I = I = DimSweep("I", [1, 2])
@@ -403,6 +455,78 @@ class TestDet(TestInv):
         self.assertEqual(res.shape, (3, ))
         self.assertEqual(res.dims, (self.J, ))
 
+
+class TestLstsq(TestInv):
+    def test_1(self):
+        res = hfmath.lstsq(self.m, self.m2)
+        self.assertAllclose(res, np.identity(2))
+        self.assertEqual(res.shape, (3, 2, 2))
+        self.assertEqual(res.dims, (self.J, self.mi, self.mj))
+
+    def test_broadcast(self):
+        A = hfarray(np.random.randn(3, 2, 2), dims=(self.J, self.mi,
+                                                    self.mj))
+        b = hfarray(np.random.randn(2, 3, 2, 2), dims=(self.I, self.J,
+                                                       self.mi, self.mj))
+        res = hfmath.lstsq(A, b)
+        self.assertEqual(res.dims, (self.J, self.I, self.mi, self.mj))
+        for j in range(3):
+            for i in range(2):
+                x = np.linalg.lstsq(A[j], b[i, j], rcond=None)[0]
+                self.assertAllclose(res[j, i], x)
+
+    def test_rank_deficient(self):
+        A = hfarray([[[1., 1], [1, 1]]] * 3, dims=(self.J, self.mi, self.mj))
+        res = hfmath.lstsq(A, self.m)
+        x = np.linalg.lstsq(A[0], self.m[0], rcond=None)[0]
+        self.assertAllclose(res, x)
+
+
+class TestMapMatrices(TestInv):
+    def test_same_shape(self):
+        res = hfmath.map_matrices(np.dot, self.m, self.m2)
+        self.assertAllclose(res, hfmath.matrix_multiply(self.m, self.m2))
+        self.assertEqual(res.dims, (self.J, self.mi, self.mj))
+
+    def test_scalar(self):
+        res = hfmath.map_matrices(np.linalg.det, self.m)
+        self.assertAllclose(res, -2)
+        self.assertEqual(res.dims, (self.J, ))
+
+    def test_workers(self):
+        A = hfarray(np.random.randn(4, 3, 2, 2), dims=(self.K, self.J,
+                                                       self.mi, self.mj))
+        res1 = hfmath.map_matrices(np.linalg.inv, A)
+        res2 = hfmath.map_matrices(np.linalg.inv, A, workers=3)
+        self.assertAllclose(res1, hfmath.inv(A))
+        self.assertAllclose(res1, res2)
+        self.assertEqual(res2.dims, A.dims)
+
+    def test_dims(self):
+        dims = (self.mi, DimMatrix_j("j", 1))
+        res = hfmath.map_matrices(lambda x: x[:, :1], self.m, dims=dims)
+        self.assertAllclose(res, [[[1.], [3]]] * 3)
+        self.assertEqual(res.dims, (self.J, ) + dims)
+
+    def test_dims_missing(self):
+        self.assertRaises(ValueError, hfmath.map_matrices,
+                          lambda x: x[:, :1], self.m)
+
+    def test_bad_keyword(self):
+        self.assertRaises(TypeError, hfmath.map_matrices, np.dot,
+                          self.m, self.m, worker=2)
+
+    def test_empty(self):
+        E = DimSweep("E", [])
+        A = hfarray(np.zeros((0, 2, 2)), dims=(E, self.mi, self.mj))
+        res = hfmath.map_matrices(np.linalg.inv, A)
+        self.assertEqual(res.shape, (0, 2, 2))
+        self.assertEqual(res.dims, A.dims)
+        dims = (self.mi, DimMatrix_j("j", 1))
+        res = hfmath.map_matrices(lambda x: x[:, :1], A, dims=dims)
+        self.assertEqual(res.shape, (0, 2, 1))
+
+
 if __name__ == '__main__':
     I = DimSweep("I", [1, 2])
     J = DimSweep("J", [10, 20, 30])
@@ -87,6 +87,22 @@ class Test_uniq(TestCase):
         self.assertEqual(utils.uniq([]), [])
 
 
+class Test_hypercube_index(TestCase):
+    def test_1(self):
+        axes, cells = utils.hypercube_index([[2, 1, 2, 1], [5, 5, 3, 3]])
+        self.assertAllclose(axes[0], [1, 2])
+        self.assertAllclose(axes[1], [3, 5])
+        self.assertAllclose(cells, [3, 1, 2, 0])
+
+    def test_missing(self):
+        self.assertRaises(utils.HFToolsHyperCubeError,
+                          utils.hypercube_index, [[1, 1, 2], [3, 4, 3]])
+
+    def test_duplicate(self):
+        self.assertRaises(utils.HFToolsHyperCubeError,
+                          utils.hypercube_index, [[1, 1, 2, 2], [3, 3, 4, 3]])
+
+
 class Test_chop(TestCase):
     def test_1(self):
         self.assertAllclose(utils.chop([1e-16]), np.array([0]))
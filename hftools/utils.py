@@ -16,7 +16,8 @@ import warnings
 
 import numpy as np
 
-from hftools.core.exceptions import HFToolsWarning, HFToolsDeprecationWarning
+from hftools.core.exceptions import HFToolsWarning, HFToolsDeprecationWarning,\
+    HFToolsHyperCubeError
 from hftools.py3compat import PY3
 
 
@@ -124,6 +125,40 @@ def uniq(data):
         return sorted(set(data))
 
 
+def hypercube_index(columns, names=None):
+    """Locate rows of coordinate *columns* in a hypercube.
+
+    *columns* is a sequence of equally long coordinate sequences, one per
+    axis. Returns (axes, cells) where *axes* is a list with the sorted
+    unique values of each column and *cells* is an integer array with the
+    flat (C order) index of each row in the hypercube spanned by *axes*.
+
+    Raises HFToolsHyperCubeError if a cell of the hypercube is missing or
+    appears more than once. *names* are the axis names used in the error
+    message.
+    """
+    axes = []
+    codes = []
+    for column in columns:
+        axis, code = np.unique(np.asarray(column), return_inverse=True)
+        axes.append(axis)
+        codes.append(code)
+    shape = tuple(len(axis) for axis in axes)
+    cells = np.ravel_multi_index(codes, shape)
+    count = np.bincount(cells, minlength=int(np.prod(shape)))
+    if (count != 1).any():
+        missing = np.flatnonzero(count == 0)
+        duplicate = np.flatnonzero(count > 1)
+        bad = missing[0] if len(missing) else duplicate[0]
+        coord = tuple(axis[i] for axis, i in
+                      zip(axes, np.unravel_index(bad, shape)))
+        msg = ("Could not make a hypercube with indices %r.\n"
+               " %d cells are missing and %d are duplicated, e.g. %r" %
+               (names, len(missing), len(duplicate), coord))
+        raise HFToolsHyperCubeError(msg)
+    return axes, cells
+
+
 def chop(x, rtol=1e-9, atol=1e-15):
     """Set small numbers to zero.
 